@@ -0,0 +1,167 @@
+# api_key_pool.py
+import os
+import threading
+import time
+from typing import Optional, Union
+
+STRATEGIES = ("least_loaded", "weighted_round_robin")
+# google-generativeai releases known to send a model's requests through its _client attribute
+TESTED_SDK_VERSIONS = ((0, 7), (0, 8))
+_sdk_version_checked = False
+
+
+def bind_client(model, client):
+    """
+    Makes a genai.GenerativeModel send its requests through the given client.
+
+    The SDK has no public way to give one model its own client: GenerativeModel
+    keeps it in the private _client attribute and only falls back to the global
+    client when that is None. This is the one place that relies on it. A model
+    without the attribute raises instead of silently calling with the global
+    key, and SDK releases outside TESTED_SDK_VERSIONS print a warning once.
+
+    Returns:
+        The model.
+    """
+    global _sdk_version_checked
+    if not _sdk_version_checked:
+        _sdk_version_checked = True
+        from sub_agents.runtime import get_genai
+        version = getattr(get_genai(), "__version__", "")
+        if tuple(int(part) for part in version.split(".")[:2] if part.isdigit()) not in TESTED_SDK_VERSIONS:
+            print(f"Warning: google-generativeai {version or '(unknown version)'} is untested with ApiKeyPool; "
+                  f"check that per-key clients are still used.")
+    if not hasattr(model, "_client"):
+        raise RuntimeError(f"{type(model).__name__} has no _client attribute; this google-generativeai release "
+                           f"cannot use per-key clients. Pin google-generativeai<0.9 or remove the key pool.")
+    model._client = client
+    return model
+
+
+class _KeyState:
+    __slots__ = ("key", "label", "weight", "in_flight", "calls", "quota_errors", "cooldown_until", "current_weight")
+
+    def __init__(self, key: str, weight: float):
+        self.key = key
+        # Never expose whole keys in logs or metrics
+        self.label = f"...{key[-4:]}"
+        self.weight = weight
+        self.in_flight = 0
+        self.calls = 0
+        self.quota_errors = 0
+        self.cooldown_until: dict[str, float] = {}
+        self.current_weight = 0.0
+
+    def cooling_down(self, model_name: str, now: float) -> bool:
+        return self.cooldown_until.get(model_name, 0.0) > now
+
+
+class ApiKeyPool:
+    """
+    Spreads model calls over several API keys (or projects), each with its own quota state.
+
+    Every key gets its own generative client, so keys never share the SDK's
+    global configuration. A key that returns a quota error for a model is
+    skipped for that model for cooldown_seconds and the call is retried on
+    another key; only when every key is exhausted does the error surface (and
+    the router move on to the next fallback model).
+
+    Args:
+        keys: List of keys, or a dict of key -> weight.
+        strategy: "least_loaded" (fewest in-flight calls per unit of weight) or
+            "weighted_round_robin" (smooth weighted rotation).
+        cooldown_seconds: How long a key is avoided for a model after a quota error.
+    """
+    def __init__(self, keys: Union[list[str], dict[str, float]], strategy: str = "least_loaded",
+                 cooldown_seconds: float = 60.0):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"strategy must be one of {STRATEGIES}.")
+        weights = keys if isinstance(keys, dict) else {key: 1.0 for key in keys}
+        if not weights:
+            raise ValueError("ApiKeyPool needs at least one key.")
+        if any(weight <= 0 for weight in weights.values()):
+            raise ValueError("Key weights must be positive.")
+        self.strategy = strategy
+        self.cooldown_seconds = cooldown_seconds
+        self._states = [_KeyState(key, float(weight)) for key, weight in weights.items()]
+        self._clients: dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, **kwargs) -> Optional["ApiKeyPool"]:
+        """
+        Builds a pool from GOOGLE_API_KEYS, a comma-separated list of keys with
+        optional weights ("key1:3,key2:1"). Returns None if the variable is unset.
+        """
+        raw = os.getenv("GOOGLE_API_KEYS", "")
+        keys = {}
+        for item in raw.split(","):
+            item = item.strip()
+            if not item:
+                continue
+            key, _, weight = item.partition(":")
+            keys[key.strip()] = float(weight) if weight.strip() else 1.0
+        return cls(keys, **kwargs) if keys else None
+
+    @property
+    def keys(self) -> list[str]:
+        return [state.key for state in self._states]
+
+    def client(self, key: str):
+        """Returns the generative service client bound to one key, creating it on first use."""
+        with self._lock:
+            if key not in self._clients:
+                from google.ai import generativelanguage as glm
+                self._clients[key] = glm.GenerativeServiceClient(client_options={"api_key": key})
+            return self._clients[key]
+
+    def acquire(self, model_name: str, exclude: set = frozenset()) -> Optional[_KeyState]:
+        """
+        Picks a key for one call and marks it in flight.
+
+        Keys cooling down for this model are skipped unless every remaining key is.
+
+        Returns:
+            The key state to release afterwards, or None if every key is excluded.
+        """
+        with self._lock:
+            now = time.monotonic()
+            candidates = [state for state in self._states if state.key not in exclude]
+            if not candidates:
+                return None
+            candidates = [state for state in candidates if not state.cooling_down(model_name, now)] or candidates
+            if self.strategy == "least_loaded":
+                chosen = min(candidates, key=lambda state: (state.in_flight / state.weight, state.calls / state.weight))
+            else:
+                total = 0.0
+                for state in candidates:
+                    state.current_weight += state.weight
+                    total += state.weight
+                chosen = max(candidates, key=lambda state: state.current_weight)
+                chosen.current_weight -= total
+            chosen.in_flight += 1
+            chosen.calls += 1
+            return chosen
+
+    def release(self, state: _KeyState, model_name: str, quota_error: bool = False) -> None:
+        """Marks a call finished; a quota error puts the key on cooldown for that model."""
+        with self._lock:
+            state.in_flight -= 1
+            if quota_error:
+                state.quota_errors += 1
+                state.cooldown_until[model_name] = time.monotonic() + self.cooldown_seconds
+
+    def snapshot(self) -> dict[str, dict]:
+        """Returns load and quota state per key, labelled by the key's last four characters."""
+        with self._lock:
+            now = time.monotonic()
+            return {
+                state.label: {
+                    "weight": state.weight,
+                    "in_flight": state.in_flight,
+                    "calls": state.calls,
+                    "quota_errors": state.quota_errors,
+                    "cooling_down": sorted(name for name, until in state.cooldown_until.items() if until > now),
+                }
+                for state in self._states
+            }
@@ -1,12 +1,13 @@
 import streamlit as st
 import os
 import json
-from dotenv import load_dotenv, find_dotenv
+import time
+from sub_agents.runtime import load_env
 from main_agent import LinkedInPostGenerator
-from linkedin_post_api import post_as_organization
+from history_store import HistoryStore
 
 # Load environment variables
-load_dotenv(find_dotenv())
+load_env()
 
 # Set page configuration
 st.set_page_config(
@@ -77,6 +78,185 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+HISTORY_PAGE_SIZE = 10
+TONE_OPTIONS = ["Professional", "Conversational", "Enthusiastic", "Informative",
+                "Celebratory", "Thoughtful", "Inspirational", "Educational"]
+
+@st.cache_resource
+def get_history_store():
+    """One SQLite history per server process (HISTORY_DB_PATH, default post_history.db)."""
+    return HistoryStore(os.getenv("HISTORY_DB_PATH", "post_history.db"))
+
+@st.cache_resource
+def get_brand_voice():
+    """Brand voice profiles from BRAND_VOICE_PATH, or None if it is unset."""
+    if not os.getenv("BRAND_VOICE_PATH"):
+        return None
+    from brand_voice import BrandVoiceStore
+    return BrandVoiceStore(os.getenv("BRAND_VOICE_PATH"))
+
+@st.cache_resource
+def get_engagement_predictor():
+    """Trained engagement model from ENGAGEMENT_MODEL_PATH, or None if it is unset."""
+    if not os.getenv("ENGAGEMENT_MODEL_PATH"):
+        return None
+    from sub_agents.engagement_predictor import EngagementPredictor
+    return EngagementPredictor.load(os.getenv("ENGAGEMENT_MODEL_PATH"))
+
+@st.cache_resource
+def get_generator():
+    """
+    Keeps one generator per server process so its memoized stage results survive
+    reruns: changing a single sidebar setting only recomputes the affected stages.
+    PROFILE_SAMPLE_RATE and PROFILE_DUMP_DIR enable background profiling.
+    MIN_ENGAGEMENT_PERCENTILE gates weak drafts when an engagement model is configured.
+    """
+    from profiling import RequestProfiler
+    profiler = RequestProfiler(sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+                               dump_dir=os.getenv("PROFILE_DUMP_DIR"))
+    predictor = get_engagement_predictor()
+    min_percentile = os.getenv("MIN_ENGAGEMENT_PERCENTILE")
+    return LinkedInPostGenerator(profiler=profiler, history_store=get_history_store(),
+                                 brand_voice=get_brand_voice(), engagement_predictor=predictor,
+                                 min_engagement_percentile=float(min_percentile) if predictor and min_percentile else None)
+
+def media_type_for(uploaded_file) -> str:
+    """Maps an uploaded file's MIME type to a LinkedIn media type."""
+    mime = uploaded_file.type or ""
+    if mime.startswith("image/"):
+        return "image"
+    if mime.startswith("video/"):
+        return "video"
+    return "document"
+
+def save_upload(uploaded_file) -> str:
+    """
+    Copies an uploaded file to MEDIA_UPLOAD_DIR in chunks and returns its path.
+    The path is stable per uploaded file, so a failed LinkedIn upload can resume.
+    """
+    import shutil
+    import tempfile
+    directory = os.getenv("MEDIA_UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "linkedin_media"))
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{uploaded_file.file_id}-{os.path.basename(uploaded_file.name)}")
+    if not os.path.exists(path):
+        uploaded_file.seek(0)
+        with open(path, "wb") as f:
+            shutil.copyfileobj(uploaded_file, f, 1024 * 1024)
+    return path
+
+def history_sidebar():
+    """Searchable, paginated list of earlier posts; opening one loads it from the store."""
+    st.markdown('<div class="section-header">History</div>', unsafe_allow_html=True)
+    store = get_history_store()
+    query = st.text_input("Search past posts", placeholder="Words from the topic, post or hashtags")
+    tone_filter = st.selectbox("Filter by tone", ["Any"] + TONE_OPTIONS, index=0)
+    filters = {} if tone_filter == "Any" else {"tone": tone_filter}
+
+    # Reset paging whenever the search changes
+    search_key = (query, tone_filter)
+    if st.session_state.get("history_search") != search_key:
+        st.session_state.history_search = search_key
+        st.session_state.history_pages = 1
+
+    limit = st.session_state.history_pages * HISTORY_PAGE_SIZE
+    entries = store.search(query or None, limit=limit, **filters)
+    total = store.count(query or None, **filters)
+    if not entries:
+        st.caption("No saved posts yet." if not query and not filters else "No matching posts.")
+    for entry in entries:
+        label = f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['created_at']))} · {entry['topic'][:50]}"
+        if st.button(label, key=f"history_{entry['id']}", help=entry["preview"], use_container_width=True):
+            st.session_state.post_details = store.get(entry["id"])
+    if total > len(entries):
+        if st.button(f"Load more ({total - len(entries)} remaining)", use_container_width=True):
+            st.session_state.history_pages += 1
+            st.rerun()
+
+def render_post_text(text):
+    st.markdown('<div class="post-container">', unsafe_allow_html=True)
+    st.markdown(text.replace('\n', '<br>'), unsafe_allow_html=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+def render_hashtags(hashtags):
+    st.markdown('<div class="section-header">Suggested Hashtags</div>', unsafe_allow_html=True)
+    if hashtags:
+        hashtags_html = ""
+        for hashtag in hashtags:
+            hashtags_html += f'<div class="hashtag">{hashtag}</div>'
+        st.markdown(hashtags_html, unsafe_allow_html=True)
+    else:
+        st.info("No hashtags generated")
+
+def render_tags(tags):
+    st.markdown('<div class="section-header">Suggested Tags</div>', unsafe_allow_html=True)
+    if tags:
+        tags_html = ""
+        for tag in tags:
+            tags_html += f'<div class="tag">{tag}</div>'
+        st.markdown(tags_html, unsafe_allow_html=True)
+    else:
+        st.info("No tags suggested")
+
+def render_validation(issues):
+    st.markdown('<div class="section-header">Validation Issues</div>', unsafe_allow_html=True)
+    if issues:
+        issues_html = ""
+        for issue in issues:
+            issues_html += f'<div class="validation-issue">• {issue}</div>'
+        st.markdown(issues_html, unsafe_allow_html=True)
+    else:
+        st.success("No validation issues found")
+
+def render_cta(cta):
+    if cta:
+        st.markdown('<div class="section-header">Suggested Call-to-Action</div>', unsafe_allow_html=True)
+        st.markdown(f'<div class="cta">{cta}</div>', unsafe_allow_html=True)
+
+def live_panels():
+    """
+    Lays out placeholders for the post and its suggestions and returns
+    (container, on_stage). Passed to generate_linkedin_post, on_stage fills each
+    panel as soon as its stage finishes, so the draft shows up long before
+    validation is done. Empty the container once the full result is rendered.
+    """
+    live = st.empty()
+    with live.container():
+        status = st.empty()
+        post_panel = st.empty()
+        col1, col2 = st.columns(2)
+        hashtag_panel, tag_panel = col1.empty(), col2.empty()
+        validation_panel = st.empty()
+        cta_panel = st.empty()
+
+    def show_post(title, text):
+        with post_panel.container():
+            st.markdown(f'<div class="section-header">{title}</div>', unsafe_allow_html=True)
+            render_post_text(text)
+
+    def on_stage(name, outputs):
+        status.caption(f"Finished stage: {name}")
+        if name == "dedup":
+            show_post("Draft", outputs["initial_draft"])
+        elif name == "tone":
+            show_post("Tone Adjusted Draft", outputs["post_draft"])
+        elif name == "format":
+            show_post("Generated LinkedIn Post", outputs["final_post"])
+        elif name == "hashtags":
+            with hashtag_panel.container():
+                render_hashtags(outputs["suggested_hashtags"])
+        elif name == "tags":
+            with tag_panel.container():
+                render_tags(outputs["suggested_tags"])
+        elif name == "validate":
+            with validation_panel.container():
+                render_validation(outputs["validation_issues"])
+        elif name == "cta":
+            with cta_panel.container():
+                render_cta(outputs["suggested_cta"])
+
+    return live, on_stage
+
 def main():
     # Header
     st.markdown('<div class="main-header">LinkedIn Post Generator</div>', unsafe_allow_html=True)
@@ -92,9 +272,7 @@ def main():
                             height=100)
 
         # Tone selection
-        tone_options = ["Professional", "Conversational", "Enthusiastic", "Informative",
-                        "Celebratory", "Thoughtful", "Inspirational", "Educational"]
-        tone = st.selectbox("Tone", tone_options, index=0)
+        tone = st.selectbox("Tone", TONE_OPTIONS, index=0)
 
         # Length preference
         length_options = ["short", "moderate", "long"]
@@ -112,6 +290,13 @@ def main():
         audience_options = ["general", "tech", "marketing", "finance", "healthcare", "education", "startup"]
         audience_type = st.selectbox("Target Audience", audience_options, index=0)
 
+        # Brand voice (only when profiles are configured)
+        tenant = None
+        brand_voice = get_brand_voice()
+        if brand_voice is not None and brand_voice.tenants():
+            tenant = st.selectbox("Brand Voice", ["None"] + brand_voice.tenants(), index=0)
+            tenant = None if tenant == "None" else tenant
+
         # Translation
         enable_translation = st.checkbox("Enable Translation", value=False)
         target_language = None
@@ -122,6 +307,12 @@ def main():
 
         # Generate button
         generate_button = st.button("Generate LinkedIn Post", type="primary", use_container_width=True)
+        regenerate = st.checkbox("Regenerate from scratch", value=False,
+                                 help="Ignore previously computed stages and write a fresh post")
+        profile_request = st.checkbox("Profile this request", value=False,
+                                      help="Attach a timing and memory report to the result")
+
+        history_sidebar()
 
     # Main content area
     if 'post_details' not in st.session_state:
@@ -129,9 +320,11 @@ def main():
 
     if generate_button and topic:
         with st.spinner("Generating your LinkedIn post..."):
+            # Panels fill in as stages finish; the full result replaces them at the end
+            live, on_stage = live_panels()
             try:
-                # Initialize the generator
-                generator = LinkedInPostGenerator()
+                # Reuse the generator (and its memoized stages) across reruns
+                generator = get_generator()
 
                 # Generate the post
                 post_details = generator.generate_linkedin_post(
@@ -141,16 +334,22 @@ def main():
                     num_hashtags=num_hashtags,
                     include_cta=include_cta,
                     target_language=target_language,
-                    audience_type=audience_type
+                    audience_type=audience_type,
+                    refresh=regenerate,
+                    profile=True if profile_request else None,
+                    tenant=tenant,
+                    on_stage=on_stage
                 )
 
                 st.session_state.post_details = post_details
             except Exception as e:
                 st.error(f"Error generating post: {str(e)}")
+            live.empty()
 
     # Display generated post
     if st.session_state.post_details:
         post_details = st.session_state.post_details
+        render_start = time.perf_counter()
 
         # Post content
         st.markdown('<div class="section-header">Generated LinkedIn Post</div>', unsafe_allow_html=True)
@@ -167,9 +366,12 @@ def main():
                         unsafe_allow_html=True)
 
         # Post content in a container
-        st.markdown('<div class="post-container">', unsafe_allow_html=True)
-        st.markdown(post_details['final_post'].replace('\n', '<br>'), unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
+        render_post_text(post_details['final_post'])
+
+        # Translation
+        if post_details.get('translated_post'):
+            with st.expander("Translated Post", expanded=True):
+                st.markdown(post_details['translated_post'].replace('\n', '<br>'), unsafe_allow_html=True)
 
         # Action buttons
         col_copy, col_post = st.columns(2)
@@ -182,6 +384,8 @@ def main():
 
         # Post to LinkedIn button
         with col_post:
+            media_file = st.file_uploader("Attach an image, document or video", key="media_file",
+                                          type=["png", "jpg", "jpeg", "gif", "pdf", "pptx", "docx", "mp4", "mov"])
             linkedin_button = st.button("Post to LinkedIn", use_container_width=True,
                                        help="Post directly to LinkedIn using your API credentials")
 
@@ -203,57 +407,61 @@ def main():
                         ```
                         """)
                 else:
-                    # Post to LinkedIn
-                    with st.spinner("Posting to LinkedIn..."):
-                        result = post_as_organization(post_details['final_post'])
-
-                        if result["success"]:
-                            st.success(f"✅ {result['message']}")
-                        else:
-                            st.error(f"❌ {result['message']}")
-                            if result.get("error"):
-                                with st.expander("Error Details"):
-                                    st.json(result["error"] if isinstance(result["error"], dict) else {"error": result["error"]})
+                    # Post to LinkedIn (the HTTP client is only imported when posting)
+                    from linkedin_post_api import post_as_organization
+                    media = []
+                    if media_file is not None:
+                        from linkedin_media import MediaUploader
+                        progress_bar = st.progress(0.0, text=f"Uploading {media_file.name}...")
+                        upload = MediaUploader().upload(
+                            save_upload(media_file), media_type_for(media_file),
+                            progress=lambda sent, total: progress_bar.progress(
+                                sent / total if total else 1.0, text=f"Uploading {media_file.name}: {sent // 1024}/{total // 1024} KB")
+                        )
+                        progress_bar.empty()
+                        media = [upload]
+                    if media and not media[0]["success"]:
+                        st.error(f"❌ {media[0]['message']} Posting again resumes the upload.")
+                    else:
+                        with st.spinner("Posting to LinkedIn..."):
+                            result = post_as_organization(post_details['final_post'], media=media)
+
+                            if result["success"]:
+                                st.success(f"✅ {result['message']}")
+                            else:
+                                st.error(f"❌ {result['message']}")
+                                if result.get("error"):
+                                    with st.expander("Error Details"):
+                                        st.json(result["error"] if isinstance(result["error"], dict) else {"error": result["error"]})
 
         # Create columns for additional information
         col1, col2 = st.columns(2)
 
         # Hashtags
         with col1:
-            st.markdown('<div class="section-header">Suggested Hashtags</div>', unsafe_allow_html=True)
-            if post_details['suggested_hashtags']:
-                hashtags_html = ""
-                for hashtag in post_details['suggested_hashtags']:
-                    hashtags_html += f'<div class="hashtag">{hashtag}</div>'
-                st.markdown(hashtags_html, unsafe_allow_html=True)
-            else:
-                st.info("No hashtags generated")
+            render_hashtags(post_details['suggested_hashtags'])
 
         # Tags
         with col2:
-            st.markdown('<div class="section-header">Suggested Tags</div>', unsafe_allow_html=True)
-            if post_details['suggested_tags_placeholders']:
-                tags_html = ""
-                for tag in post_details['suggested_tags_placeholders']:
-                    tags_html += f'<div class="tag">{tag}</div>'
-                st.markdown(tags_html, unsafe_allow_html=True)
-            else:
-                st.info("No tags suggested")
+            render_tags(post_details['suggested_tags_placeholders'])
 
         # Validation issues
-        st.markdown('<div class="section-header">Validation Issues</div>', unsafe_allow_html=True)
-        if post_details['validation_issues']:
-            issues_html = ""
-            for issue in post_details['validation_issues']:
-                issues_html += f'<div class="validation-issue">• {issue}</div>'
-            st.markdown(issues_html, unsafe_allow_html=True)
-        else:
-            st.success("No validation issues found")
+        render_validation(post_details['validation_issues'])
 
         # Call to Action
-        if post_details['suggested_cta']:
-            st.markdown('<div class="section-header">Suggested Call-to-Action</div>', unsafe_allow_html=True)
-            st.markdown(f'<div class="cta">{post_details["suggested_cta"]}</div>', unsafe_allow_html=True)
+        render_cta(post_details['suggested_cta'])
+
+        # Local engagement prediction, as a percentile of past posts
+        if post_details.get('predicted_engagement') and post_details['predicted_engagement']['draft']:
+            draft_engagement = post_details['predicted_engagement']['draft']
+            st.caption(f"Predicted engagement: {draft_engagement['percentile']:.0%} percentile of past posts"
+                       f" ({draft_engagement['redrafts']} redraft(s))")
+
+        # Profiling report, with the time spent rendering the sections above
+        if post_details.get('profile'):
+            with st.expander("Profile"):
+                st.markdown(f"Rendering: {time.perf_counter() - render_start:.3f}s")
+                st.json(post_details['profile'])
 
     # Instructions if no post has been generated yet
     elif not generate_button:
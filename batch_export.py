@@ -0,0 +1,239 @@
+# batch_export.py
+import csv
+import os
+import time
+from typing import TYPE_CHECKING, Callable, Iterable, Optional
+
+if TYPE_CHECKING:
+    from main_agent import LinkedInPostGenerator
+
+# generate_linkedin_post parameters stored with each record
+PARAM_FIELDS = ("tone", "length_preference", "num_hashtags", "include_cta", "target_language", "audience_type", "tenant")
+
+
+class PostRecord:
+    """
+    One generated post, flattened for columnar export.
+
+    Stage timings and token usage are kept as lists of tuples rather than
+    the nested dicts of the generator's output, and the totals are
+    precomputed so the common cost queries read scalar columns.
+    """
+    __slots__ = ("topic", "tone", "length_preference", "num_hashtags", "include_cta", "target_language",
+                 "audience_type", "tenant", "final_post", "character_count", "is_within_limit", "hashtags",
+                 "tags", "cta", "validation_issues", "translated_post", "stage_timings", "token_usage",
+                 "cached_stages", "total_seconds", "prompt_tokens", "output_tokens", "generated_at", "error")
+
+    def __init__(self, topic: str, params: Optional[dict] = None):
+        params = params or {}
+        self.topic = topic
+        for name in PARAM_FIELDS:
+            setattr(self, name, params.get(name))
+        self.final_post = None
+        self.character_count = None
+        self.is_within_limit = None
+        self.hashtags: list[str] = []
+        self.tags: list[str] = []
+        self.cta = None
+        self.validation_issues: list[str] = []
+        self.translated_post = None
+        self.stage_timings: list[tuple] = []  # (stage, seconds)
+        self.token_usage: list[tuple] = []  # (stage, model, calls, prompt_tokens, output_tokens)
+        self.cached_stages: list[str] = []
+        self.total_seconds = 0.0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.generated_at = time.time()
+        self.error = None
+
+    @classmethod
+    def from_output(cls, topic: str, params: dict, output: dict, seconds: float = 0.0) -> "PostRecord":
+        """Builds a record from a generate_linkedin_post result."""
+        record = cls(topic, params)
+        record.final_post = output["final_post"]
+        record.character_count = output["character_count"]
+        record.is_within_limit = output["is_within_limit"]
+        record.hashtags = list(output["suggested_hashtags"])
+        record.tags = list(output["suggested_tags_placeholders"])
+        record.cta = output["suggested_cta"] or None
+        record.validation_issues = list(output["validation_issues"])
+        record.translated_post = output["translated_post"] or None
+        record.stage_timings = list(output.get("stage_timings", {}).items())
+        record.token_usage = [(stage, usage["model"], usage["calls"], usage["prompt_tokens"], usage["output_tokens"])
+                              for stage, usage in output.get("token_usage", {}).items()]
+        record.cached_stages = list(output.get("cached_stages", []))
+        record.total_seconds = seconds
+        record.prompt_tokens = sum(usage[3] for usage in record.token_usage)
+        record.output_tokens = sum(usage[4] for usage in record.token_usage)
+        return record
+
+    @classmethod
+    def failed(cls, topic: str, params: dict, error: Exception, seconds: float = 0.0) -> "PostRecord":
+        record = cls(topic, params)
+        record.error = str(error)
+        record.total_seconds = seconds
+        return record
+
+
+def _schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("topic", pa.string()),
+        ("tone", pa.string()),
+        ("length_preference", pa.string()),
+        ("num_hashtags", pa.int32()),
+        ("include_cta", pa.bool_()),
+        ("target_language", pa.string()),
+        ("audience_type", pa.string()),
+        ("tenant", pa.string()),
+        ("final_post", pa.string()),
+        ("character_count", pa.int32()),
+        ("is_within_limit", pa.bool_()),
+        ("hashtags", pa.list_(pa.string())),
+        ("tags", pa.list_(pa.string())),
+        ("cta", pa.string()),
+        ("validation_issues", pa.list_(pa.string())),
+        ("translated_post", pa.string()),
+        ("stage_timings", pa.list_(pa.struct([("stage", pa.string()), ("seconds", pa.float64())]))),
+        ("token_usage", pa.list_(pa.struct([("stage", pa.string()), ("model", pa.string()), ("calls", pa.int32()),
+                                            ("prompt_tokens", pa.int64()), ("output_tokens", pa.int64())]))),
+        ("cached_stages", pa.list_(pa.string())),
+        ("total_seconds", pa.float64()),
+        ("prompt_tokens", pa.int64()),
+        ("output_tokens", pa.int64()),
+        ("generated_at", pa.timestamp("ms", tz="UTC")),
+        ("error", pa.string()),
+    ])
+
+
+class BatchResultWriter:
+    """
+    Streams PostRecords to a Parquet file (or an Arrow IPC file for .arrow/.feather paths).
+
+    Records are buffered until row_group_size of them are collected and then
+    written as one row group, so memory stays flat however many posts a
+    campaign run produces. Timings and token usage are nested columns
+    (list of struct), and total_seconds, prompt_tokens and output_tokens are
+    plain columns, so tools such as DuckDB, Polars or pyarrow can aggregate
+    costs without materializing the rows. Requires pyarrow.
+
+    Args:
+        path: Output file.
+        row_group_size: Records per row group (and per Arrow record batch).
+        compression: Parquet compression codec.
+    """
+    def __init__(self, path: str, row_group_size: int = 1000, compression: str = "zstd"):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("pyarrow is required to export batch results. Install it with `pip install pyarrow`.") from e
+        self._pa = pa
+        self.path = path
+        self.row_group_size = row_group_size
+        self.schema = _schema()
+        self.rows_written = 0
+        self._buffer: list[PostRecord] = []
+        if os.path.splitext(path)[1].lower() in (".arrow", ".feather", ".ipc"):
+            self._writer = pa.ipc.new_file(path, self.schema)
+        else:
+            self._writer = pq.ParquetWriter(path, self.schema, compression=compression)
+
+    def write(self, record: PostRecord) -> None:
+        self._buffer.append(record)
+        if len(self._buffer) >= self.row_group_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes the buffered records as one row group."""
+        if not self._buffer:
+            return
+        columns = {}
+        for field in self.schema:
+            values = [getattr(record, field.name) for record in self._buffer]
+            if field.name == "generated_at":
+                values = [int(value * 1000) for value in values]
+            columns[field.name] = values
+        batch = self._pa.RecordBatch.from_pydict(columns, schema=self.schema)
+        if isinstance(self._writer, self._pa.ipc.RecordBatchFileWriter):
+            self._writer.write_batch(batch)
+        else:
+            self._writer.write_batch(batch, row_group_size=len(self._buffer))
+        self.rows_written += len(self._buffer)
+        self._buffer = []
+
+    def close(self) -> None:
+        self.flush()
+        self._writer.close()
+
+    def __enter__(self) -> "BatchResultWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def run_batch(generator: "LinkedInPostGenerator", requests: Iterable[dict], writer: BatchResultWriter,
+              progress: Optional[Callable[[int, PostRecord], None]] = None) -> int:
+    """
+    Generates a post per request and streams the results to writer.
+
+    Requests run one after another, so records are written in input order;
+    each record carries the token usage of its own request only.
+    A failed request is written as a record with its error and does not stop the batch.
+
+    Args:
+        generator: The post generator.
+        requests: Dicts of generate_linkedin_post arguments, each with a "topic".
+        writer: Where records are written.
+        progress: Called as progress(requests_done, record) after each request.
+
+    Returns:
+        The number of requests processed.
+    """
+    count = 0
+    for request in requests:
+        request = dict(request)
+        topic = request.pop("topic")
+        params = {name: request[name] for name in PARAM_FIELDS if name in request}
+        started = time.perf_counter()
+        try:
+            output = generator.generate_linkedin_post(topic, **request)
+            record = PostRecord.from_output(topic, params, output, time.perf_counter() - started)
+        except Exception as e:
+            print(f"Warning: Generation failed for topic '{topic}': {e}")
+            record = PostRecord.failed(topic, params, e, time.perf_counter() - started)
+        writer.write(record)
+        count += 1
+        if progress is not None:
+            progress(count, record)
+    return count
+
+
+def read_requests(path: str) -> Iterable[dict]:
+    """
+    Reads batch requests from a CSV file with a topic column and optional
+    columns named after generate_linkedin_post parameters.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            request = {name: value for name, value in row.items() if value not in (None, "")}
+            if "num_hashtags" in request:
+                request["num_hashtags"] = int(request["num_hashtags"])
+            if "include_cta" in request:
+                request["include_cta"] = request["include_cta"].strip().lower() in ("1", "true", "yes")
+            yield request
+
+
+# Example usage: python batch_export.py topics.csv results.parquet
+if __name__ == '__main__':
+    import sys
+    from main_agent import LinkedInPostGenerator
+
+    generator = LinkedInPostGenerator()
+    with BatchResultWriter(sys.argv[2]) as writer:
+        total = run_batch(generator, read_requests(sys.argv[1]), writer,
+                          progress=lambda done, record: print(f"[{done}] {record.topic}: "
+                                                              f"{record.prompt_tokens}+{record.output_tokens} tokens, "
+                                                              f"{record.total_seconds:.2f}s"))
+    print(f"Wrote {total} results to {sys.argv[2]}")
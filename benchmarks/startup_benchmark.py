@@ -0,0 +1,87 @@
+# benchmarks/startup_benchmark.py
+"""
+Measures cold-start cost of the generator for CLI runs and worker processes.
+
+Each measurement runs in a fresh interpreter so module caches never hide import
+cost. Two numbers are reported per target:
+
+* wall time (median of several runs) to import the module and, for main_agent,
+  construct a LinkedInPostGenerator;
+* the slowest imports from `python -X importtime`, which shows what is still
+  loaded eagerly.
+
+Usage:
+    python benchmarks/startup_benchmark.py [--runs 10] [--top 15]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = {
+    "import main_agent": "import main_agent",
+    "construct generator": "import main_agent; main_agent.LinkedInPostGenerator(api_key='benchmark')",
+    "import linkedin_post_api": "import linkedin_post_api",
+}
+
+
+def _run(code: str, importtime: bool = False) -> subprocess.CompletedProcess:
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += ["-c", code]
+    return subprocess.run(command, cwd=REPO_ROOT, capture_output=True, text=True)
+
+
+def measure_wall(code: str, runs: int) -> list[float]:
+    """Returns wall-clock seconds for each fresh-interpreter run of the code."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = _run(code)
+        timings.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            raise RuntimeError(f"Benchmark target failed:\n{result.stderr}")
+    return timings
+
+
+def slowest_imports(code: str, top: int) -> list[tuple[int, int, str]]:
+    """
+    Parses `-X importtime` output.
+
+    Returns:
+        The top (cumulative_us, self_us, module) rows, slowest first.
+    """
+    rows = []
+    for line in _run(code, importtime=True).stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, module = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((int(cumulative_us), int(self_us), module))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="fresh interpreter runs per target")
+    parser.add_argument("--top", type=int, default=15, help="number of slowest imports to list")
+    args = parser.parse_args()
+
+    baseline = statistics.median(measure_wall("pass", args.runs))
+    print(f"Interpreter baseline: {baseline * 1000:.1f} ms (subtracted below)\n")
+
+    for name, code in TARGETS.items():
+        timings = measure_wall(code, args.runs)
+        median = statistics.median(timings) - baseline
+        print(f"{name}: median {median * 1000:.1f} ms, max {(max(timings) - baseline) * 1000:.1f} ms over {args.runs} runs")
+        for cumulative_us, self_us, module in slowest_imports(code, args.top):
+            print(f"    {cumulative_us / 1000:8.1f} ms cumulative  {self_us / 1000:7.1f} ms self  {module}")
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+# brand_voice.py
+import json
+import threading
+from typing import Optional, Union
+
+from sub_agents.text_vectorizer import HashingVectorizer, cosine
+
+# Exemplars closer than this to an already selected one add little and are skipped
+REDUNDANCY_THRESHOLD = 0.9
+# Added to the relevance of exemplars written in the requested tone
+TONE_BONUS = 0.1
+
+
+class BrandVoiceProfile:
+    """One tenant's exemplar posts with their precomputed vectors."""
+    def __init__(self, tenant: str, guidelines: str = ""):
+        self.tenant = tenant
+        self.guidelines = guidelines
+        self.exemplars: list[dict] = []  # {"text", "tone", "vector"}
+
+    def to_dict(self) -> dict:
+        return {
+            "tenant": self.tenant,
+            "guidelines": self.guidelines,
+            # JSON object keys must be strings, so sparse vectors are stored as pairs
+            "exemplars": [dict(e, vector=list(e["vector"].items())) for e in self.exemplars],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BrandVoiceProfile":
+        profile = cls(data["tenant"], data.get("guidelines", ""))
+        profile.exemplars = [dict(e, vector={int(b): w for b, w in e["vector"]}) for e in data["exemplars"]]
+        return profile
+
+
+class BrandVoiceStore:
+    """
+    Per-tenant brand voice profiles for few-shot drafting.
+
+    Each tenant's exemplar posts are embedded once, when they are added,
+    with the local HashingVectorizer, and the profiles (vectors included)
+    are kept in memory and saved to JSON, so selecting examples needs no
+    model call and no re-embedding. For a topic, select() ranks the
+    exemplars by cosine similarity (with a bonus for the requested tone),
+    skips near-duplicates of examples already chosen and stops at k
+    examples or the token budget, so the draft prompt only carries the few
+    examples that matter.
+
+    Args:
+        path: Optional JSON file the profiles are loaded from and saved to.
+        token_budget: Default maximum tokens of examples per prompt.
+        k: Default maximum number of examples per prompt.
+    """
+    def __init__(self, path: Optional[str] = None, token_budget: int = 600, k: int = 3,
+                 vectorizer: Optional[HashingVectorizer] = None):
+        self.path = path
+        self.token_budget = token_budget
+        self.k = k
+        self.vectorizer = vectorizer or HashingVectorizer()
+        self._profiles: dict[str, BrandVoiceProfile] = {}
+        self._lock = threading.Lock()
+        if path:
+            try:
+                self._load(path)
+            except FileNotFoundError:
+                pass
+
+    def add_exemplars(self, tenant: str, posts: list[Union[str, dict]], guidelines: Optional[str] = None) -> None:
+        """
+        Adds exemplar posts to a tenant's profile.
+
+        Args:
+            tenant: Tenant (brand) the posts belong to.
+            posts: Post texts, or dicts with "text" and optionally "tone".
+            guidelines: Optional short voice description sent with the examples.
+        """
+        exemplars = []
+        for post in posts:
+            post = {"text": post} if isinstance(post, str) else post
+            text = post["text"].strip()
+            if text:
+                exemplars.append({"text": text, "tone": post.get("tone"), "vector": self.vectorizer.transform(text)})
+        with self._lock:
+            profile = self._profiles.setdefault(tenant, BrandVoiceProfile(tenant))
+            profile.exemplars.extend(exemplars)
+            if guidelines is not None:
+                profile.guidelines = guidelines
+
+    def tenants(self) -> list[str]:
+        with self._lock:
+            return sorted(self._profiles)
+
+    def select(self, tenant: str, topic: str, tone: Optional[str] = None, k: Optional[int] = None,
+               token_budget: Optional[int] = None, chars_per_token: float = 4.0) -> list[str]:
+        """
+        Picks the most relevant exemplars of a tenant for a topic.
+
+        Args:
+            tenant: Tenant whose profile to use.
+            topic: Topic of the post being drafted.
+            tone: Requested tone; exemplars labelled with it rank higher.
+            k: Maximum number of examples (defaults to the store's k).
+            token_budget: Maximum estimated tokens of all examples together.
+            chars_per_token: Used to estimate example tokens.
+
+        Returns:
+            Example post texts, most relevant first (empty for unknown tenants).
+        """
+        k = self.k if k is None else k
+        token_budget = self.token_budget if token_budget is None else token_budget
+        with self._lock:
+            profile = self._profiles.get(tenant)
+            exemplars = list(profile.exemplars) if profile else []
+        if not exemplars or k <= 0:
+            return []
+
+        query = self.vectorizer.transform(topic)
+        wanted_tone = tone.lower() if tone else None
+
+        def relevance(exemplar: dict) -> float:
+            bonus = TONE_BONUS if wanted_tone and (exemplar["tone"] or "").lower() == wanted_tone else 0.0
+            return cosine(query, exemplar["vector"]) + bonus
+
+        ranked = sorted(exemplars, key=relevance, reverse=True)
+        selected, used_tokens = [], 0.0
+        for exemplar in ranked:
+            tokens = len(exemplar["text"]) / chars_per_token
+            if used_tokens + tokens > token_budget:
+                continue
+            if any(cosine(exemplar["vector"], chosen["vector"]) >= REDUNDANCY_THRESHOLD for chosen in selected):
+                continue
+            selected.append(exemplar)
+            used_tokens += tokens
+            if len(selected) == k:
+                break
+        return [exemplar["text"] for exemplar in selected]
+
+    def guidelines(self, tenant: str) -> str:
+        with self._lock:
+            profile = self._profiles.get(tenant)
+            return profile.guidelines if profile else ""
+
+    def prompt_block(self, tenant: str, examples: list[str]) -> str:
+        """Formats a tenant's guidelines and selected examples for the draft prompt."""
+        if not examples:
+            return ""
+        parts = []
+        guidelines = self.guidelines(tenant)
+        if guidelines:
+            parts.append(f"Brand voice: {guidelines}")
+        parts.append("Match the voice and style of these example posts (not their content):")
+        parts.extend(f"--- Example {i} ---\n{example}" for i, example in enumerate(examples, 1))
+        return "\n".join(parts)
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Writes all profiles, with their vectors, to a JSON file."""
+        path = path or self.path
+        if not path:
+            raise ValueError("No path given to save the brand voice profiles to.")
+        with self._lock:
+            data = [profile.to_dict() for profile in self._profiles.values()]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+    def _load(self, path: str) -> None:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        with self._lock:
+            for item in data:
+                profile = BrandVoiceProfile.from_dict(item)
+                self._profiles[profile.tenant] = profile
+
+
+# Example usage (for testing)
+if __name__ == '__main__':
+    store = BrandVoiceStore(k=2)
+    store.add_exemplars("acme", [
+        {"text": "Big news, team! Our AI helpdesk just answered its millionth question. Thank you for trusting us.", "tone": "Celebratory"},
+        "Three lessons from scaling our support team: hire for empathy, automate the boring parts, measure what matters.",
+        "We're hiring engineers who love hard problems and kind teammates. Come build with us.",
+    ], guidelines="Warm, direct, no jargon, short sentences.")
+    examples = store.select("acme", "Launch of our new AI-powered customer support tool", tone="Celebratory")
+    print(store.prompt_block("acme", examples))
@@ -0,0 +1,129 @@
+# circuit_breaker.py
+import threading
+import time
+from typing import Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a backend whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open circuit breaker for one pipeline stage.
+
+    After failure_threshold consecutive failures the breaker opens and calls
+    fail immediately with CircuitOpenError, so the caller can use its local
+    fallback without waiting on a degraded backend. After recovery_timeout it
+    lets up to half_open_max_calls trial calls through: a success closes it
+    again, a failure reopens it.
+    """
+    def __init__(self, name: str, failure_threshold: int = 3, recovery_timeout: float = 30.0,
+                 half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self._lock = threading.Lock()
+        self.total_failures = 0
+        self.total_short_circuits = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = HALF_OPEN
+            self._half_open_calls = 0
+        return self._state
+
+    def allow_request(self) -> bool:
+        """Checks whether a call may go to the backend right now."""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1
+                return True
+            self.total_short_circuits += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self.total_failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self.times_opened += 1
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def check(self) -> None:
+        """Raises CircuitOpenError if the call should be short-circuited."""
+        if not self.allow_request():
+            raise CircuitOpenError(f"Circuit for stage '{self.name}' is open; using local fallback.")
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "consecutive_failures": self._failures,
+                "total_failures": self.total_failures,
+                "short_circuited_calls": self.total_short_circuits,
+                "times_opened": self.times_opened,
+            }
+
+
+class BreakerRegistry:
+    """
+    Shared health view over the circuit breakers of all stages.
+
+    Breakers are created on first use with the registry defaults; individual
+    stages can be tuned through overrides, e.g. {"draft": {"failure_threshold": 5}}.
+    """
+    def __init__(self, failure_threshold: int = 3, recovery_timeout: float = 30.0,
+                 half_open_max_calls: int = 1, overrides: Optional[dict[str, dict]] = None):
+        self.defaults = {
+            "failure_threshold": failure_threshold,
+            "recovery_timeout": recovery_timeout,
+            "half_open_max_calls": half_open_max_calls,
+        }
+        self.overrides = overrides or {}
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> CircuitBreaker:
+        with self._lock:
+            if name not in self._breakers:
+                settings = dict(self.defaults, **self.overrides.get(name, {}))
+                self._breakers[name] = CircuitBreaker(name, **settings)
+            return self._breakers[name]
+
+    def open_stages(self) -> list[str]:
+        """Returns the stages whose breakers are currently open."""
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return [b.name for b in breakers if b.state == OPEN]
+
+    def snapshot(self) -> dict[str, dict]:
+        """Returns the state and counters of every breaker."""
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {b.name: b.snapshot() for b in breakers}
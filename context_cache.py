@@ -0,0 +1,161 @@
+# context_cache.py
+import datetime
+import hashlib
+import threading
+import time
+
+from sub_agents.prompting import POST_CONTEXT_INSTRUCTION
+from sub_agents.runtime import get_genai
+
+
+class _ContextEntry:
+    __slots__ = ("name", "model", "expires_at", "tokens")
+
+    def __init__(self, name, model, expires_at, tokens):
+        self.name = name
+        self.model = model
+        self.expires_at = expires_at
+        self.tokens = tokens
+
+
+class ContextCacheManager:
+    """
+    Manages Gemini cached-content handles for post text shared by several stages.
+
+    The first stage that needs a post on a given model uploads it (with the
+    shared POST_CONTEXT_INSTRUCTION) as cached content; later stages on the
+    same model reuse the handle until it expires, paying only for their short
+    task prompt. Handles are tracked locally with their TTL, refreshed before
+    they lapse, and deleted by clear().
+
+    Gemini only caches contents above a minimum size (1,024 tokens on the Flash
+    models, more on larger ones), which a single LinkedIn post rarely reaches.
+    Posts estimated below min_tokens are served inline instead, and so are
+    posts whose upload failed, until failure_cooldown has passed and the upload
+    is retried (so a transient 429 or 5xx does not disable caching for good).
+
+    Args:
+        ttl_seconds: Lifetime of a cached post on the server.
+        min_tokens: Smallest estimated size worth caching (the API minimum for your model).
+        chars_per_token: Ratio used to estimate token counts locally.
+        refresh_margin: Handles expiring within this many seconds are recreated.
+        failure_cooldown: Seconds a post and model are served inline after a failed upload.
+    """
+    def __init__(self, ttl_seconds: float = 300.0, min_tokens: int = 1024, chars_per_token: float = 4.0,
+                 refresh_margin: float = 15.0, failure_cooldown: float = 60.0):
+        self.ttl_seconds = ttl_seconds
+        self.min_tokens = min_tokens
+        self.chars_per_token = chars_per_token
+        self.refresh_margin = refresh_margin
+        self.failure_cooldown = failure_cooldown
+        self._entries: dict[str, _ContextEntry] = {}
+        self._retry_after: dict[str, float] = {}  # key -> monotonic time a failed upload may be retried
+        self._key_locks: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.created = 0
+        self.below_threshold = 0
+        self.failures = 0
+
+    @staticmethod
+    def _key(model_name: str, post: str) -> str:
+        return hashlib.sha256(f"{model_name}\x00{post}".encode("utf-8")).hexdigest()
+
+    def estimate_tokens(self, post: str) -> int:
+        return int((len(POST_CONTEXT_INSTRUCTION) + len(post)) / self.chars_per_token)
+
+    def acquire(self, model_name: str, post: str):
+        """
+        Returns a model bound to the cached post, creating the cache on first use.
+
+        Returns:
+            A genai.GenerativeModel built from the cached content, or None if the
+            post should be sent inline.
+        """
+        tokens = self.estimate_tokens(post)
+        if tokens < self.min_tokens:
+            with self._lock:
+                self.below_threshold += 1
+            return None
+
+        key = self._key(model_name, post)
+        with self._lock:
+            if self._cooling_down(key):
+                return None
+            lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # One upload per post and model, even when several stages ask at once
+        with lock:
+            with self._lock:
+                # Stages that waited on a failed upload do not retry it straight away
+                if self._cooling_down(key):
+                    return None
+                entry = self._entries.get(key)
+                if entry is not None and entry.expires_at - self.refresh_margin > time.monotonic():
+                    self.hits += 1
+                    return entry.model
+            try:
+                genai = get_genai()
+                cached = genai.caching.CachedContent.create(
+                    model=model_name,
+                    system_instruction=POST_CONTEXT_INSTRUCTION,
+                    contents=[f"Post Content:\n{post}"],
+                    ttl=datetime.timedelta(seconds=self.ttl_seconds),
+                )
+                model = genai.GenerativeModel.from_cached_content(cached_content=cached)
+            except Exception as e:
+                print(f"Warning: Could not cache post context for '{model_name}' ({e}). Sending the post inline.")
+                with self._lock:
+                    self.failures += 1
+                    self._retry_after[key] = time.monotonic() + self.failure_cooldown
+                    self._key_locks.pop(key, None)
+                    self._evict_expired()
+                return None
+            with self._lock:
+                self._entries[key] = _ContextEntry(cached.name, model, time.monotonic() + self.ttl_seconds, tokens)
+                self.created += 1
+                self._evict_expired()
+            return model
+
+    def _cooling_down(self, key: str) -> bool:
+        """Checks (under self._lock) whether a failed upload for the key is still in its cooldown."""
+        retry_after = self._retry_after.get(key)
+        if retry_after is None:
+            return False
+        if retry_after > time.monotonic():
+            return True
+        del self._retry_after[key]
+        return False
+
+    def _evict_expired(self) -> None:
+        # The server drops expired caches itself; only local bookkeeping is removed here
+        now = time.monotonic()
+        for key in [k for k, entry in self._entries.items() if entry.expires_at <= now]:
+            del self._entries[key]
+            self._key_locks.pop(key, None)
+        for key in [k for k, retry_after in self._retry_after.items() if retry_after <= now]:
+            del self._retry_after[key]
+
+    def clear(self) -> None:
+        """Deletes every live cached post from the server and forgets all handles."""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+            self._retry_after.clear()
+            self._key_locks.clear()
+        now = time.monotonic()
+        for entry in entries:
+            if entry.expires_at <= now:
+                continue
+            try:
+                get_genai().caching.CachedContent.get(entry.name).delete()
+            except Exception as e:
+                print(f"Warning: Could not delete cached content '{entry.name}': {e}")
+
+    def stats(self) -> dict:
+        """Returns cache counters and the number of live handles."""
+        with self._lock:
+            now = time.monotonic()
+            active = sum(1 for entry in self._entries.values() if entry.expires_at > now)
+            return {"active": active, "hits": self.hits, "created": self.created,
+                    "below_threshold": self.below_threshold, "failures": self.failures}
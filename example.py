@@ -21,7 +21,7 @@ def main():
         length_preference="moderate",
         num_hashtags=5,
         include_cta=True,
-        audience_type_for_timing="tech"
+        audience_type="tech"
     )
     
     print("\n=== Generated Post ===")
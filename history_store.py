@@ -0,0 +1,177 @@
+# history_store.py
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    id INTEGER PRIMARY KEY,
+    post_id TEXT,
+    created_at REAL NOT NULL,
+    topic TEXT NOT NULL,
+    tone TEXT,
+    length_preference TEXT,
+    audience_type TEXT,
+    target_language TEXT,
+    num_hashtags INTEGER,
+    include_cta INTEGER,
+    draft TEXT,
+    final_post TEXT,
+    hashtags TEXT,
+    result_json TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS posts_created ON posts(created_at);
+CREATE INDEX IF NOT EXISTS posts_tone ON posts(tone, created_at);
+CREATE INDEX IF NOT EXISTS posts_audience ON posts(audience_type, created_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+    topic, final_post, draft, hashtags, content='posts', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS posts_ai AFTER INSERT ON posts BEGIN
+    INSERT INTO posts_fts(rowid, topic, final_post, draft, hashtags)
+    VALUES (new.id, new.topic, new.final_post, new.draft, new.hashtags);
+END;
+CREATE TRIGGER IF NOT EXISTS posts_ad AFTER DELETE ON posts BEGIN
+    INSERT INTO posts_fts(posts_fts, rowid, topic, final_post, draft, hashtags)
+    VALUES ('delete', old.id, old.topic, old.final_post, old.draft, old.hashtags);
+END;
+"""
+
+# Parameters that can be filtered on exactly
+FILTERS = ("tone", "length_preference", "audience_type", "target_language")
+
+
+def _fts_query(text: str) -> Optional[str]:
+    """Turns free text into an FTS5 query: every word must match, the last one as a prefix."""
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+class HistoryStore:
+    """
+    Persistent SQLite history of generated posts with full-text search.
+
+    Every result is stored with its parameters and the full result as JSON.
+    Topic, draft, final post and hashtags are indexed with FTS5, and the
+    parameters have B-tree indexes, so search() returns a page of lightweight
+    summaries and get() loads a full result only when it is opened.
+
+    Args:
+        path: SQLite database file (":memory:" for a temporary store).
+    """
+    def __init__(self, path: str = "post_history.db"):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+    def add(self, result: dict, topic: str, **params) -> int:
+        """
+        Stores a generation result.
+
+        Args:
+            result: The dict returned by LinkedInPostGenerator.generate_linkedin_post.
+            topic: The topic the post was generated for.
+            **params: The generation parameters (tone, length_preference, ...).
+
+        Returns:
+            The id of the stored entry.
+        """
+        row = (
+            result.get("post_id"),
+            time.time(),
+            topic,
+            params.get("tone"),
+            params.get("length_preference"),
+            params.get("audience_type"),
+            params.get("target_language"),
+            params.get("num_hashtags"),
+            int(bool(params.get("include_cta"))),
+            result.get("draft", ""),
+            result.get("final_post", ""),
+            " ".join(result.get("suggested_hashtags") or []),
+            json.dumps(dict(result, topic=topic, parameters=params), default=str),
+        )
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO posts (post_id, created_at, topic, tone, length_preference, audience_type,"
+                " target_language, num_hashtags, include_cta, draft, final_post, hashtags, result_json)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+            return cursor.lastrowid
+
+    def _where(self, query: Optional[str], filters: dict) -> tuple[str, list]:
+        clauses, args = [], []
+        match = _fts_query(query) if query else None
+        if match:
+            clauses.append("posts.id IN (SELECT rowid FROM posts_fts WHERE posts_fts MATCH ?)")
+            args.append(match)
+        for name in FILTERS:
+            if filters.get(name) is not None:
+                clauses.append(f"posts.{name} = ?")
+                args.append(filters[name])
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", args
+
+    def search(self, query: Optional[str] = None, limit: int = 20, offset: int = 0, **filters) -> list[dict]:
+        """
+        Returns one page of matching entries, newest first.
+
+        Args:
+            query: Free text matched against topic, post, draft and hashtags.
+            limit: Page size.
+            offset: Number of entries to skip.
+            **filters: Exact matches on tone, length_preference, audience_type or target_language.
+
+        Returns:
+            Summaries with id, created_at, topic, tone, audience_type, target_language and a preview.
+        """
+        unknown = set(filters) - set(FILTERS)
+        if unknown:
+            raise ValueError(f"Unknown filters: {sorted(unknown)}. Valid filters: {FILTERS}")
+        where, args = self._where(query, filters)
+        sql = ("SELECT id, created_at, topic, tone, audience_type, target_language,"
+               " substr(final_post, 1, 160) AS preview FROM posts" + where +
+               " ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?")
+        with self._lock:
+            rows = self._conn.execute(sql, args + [limit, offset]).fetchall()
+        return [dict(row) for row in rows]
+
+    def count(self, query: Optional[str] = None, **filters) -> int:
+        """Returns the number of entries matching a search."""
+        where, args = self._where(query, filters)
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM posts" + where, args).fetchone()[0]
+
+    def get(self, entry_id: int) -> Optional[dict]:
+        """Loads the full stored result for an entry, or None if it does not exist."""
+        with self._lock:
+            row = self._conn.execute("SELECT result_json FROM posts WHERE id = ?", (entry_id,)).fetchone()
+        return dict(json.loads(row["result_json"]), history_id=entry_id) if row else None
+
+    def delete(self, entry_id: int) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM posts WHERE id = ?", (entry_id,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# Example usage (for testing)
+if __name__ == '__main__':
+    store = HistoryStore(":memory:")
+    store.add({"final_post": "Our new AI support tool is live.", "suggested_hashtags": ["#AI"]},
+              "AI support launch", tone="Professional", audience_type="tech")
+    store.add({"final_post": "Celebrating five years as a team!", "suggested_hashtags": ["#Milestone"]},
+              "Team anniversary", tone="Celebratory", audience_type="general")
+    print(f"Search 'support': {store.search('support')}")
+    print(f"Celebratory posts: {store.count(tone='Celebratory')}")
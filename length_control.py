@@ -0,0 +1,158 @@
+# length_control.py
+import math
+import re
+import threading
+from typing import Optional
+
+# Target character range of the post body per length preference
+LENGTH_TIERS = {
+    "short": (300, 500),
+    "moderate": (1000, 1500),
+    "long": (1800, 2500),
+}
+DEFAULT_CHARS_PER_TOKEN = 4.0
+AVERAGE_WORD_CHARS = 6.0  # including the following space
+# Models that spend output tokens on thinking before answering
+THINKING_MODEL_HINTS = ("2.5", "thinking")
+DEFAULT_THINKING_TOKENS = 1024
+_SENTENCE_END = re.compile(r"[.!?][\"')\]]*(?=\s|$)|\n")
+
+
+def drop_partial_sentence(text: str) -> str:
+    """Cuts a draft that hit the token cap back to its last complete sentence (if that keeps most of it)."""
+    ends = [match.end() for match in _SENTENCE_END.finditer(text)]
+    if ends and ends[-1] >= len(text) * 0.6:
+        return text[:ends[-1]].rstrip()
+    return text.rstrip()
+
+
+class LengthController:
+    """
+    Turns a length preference into a character target and an output-token cap,
+    and tracks how well drafts hit their targets.
+
+    Chars-per-token is measured from the drafts actually produced (per model,
+    as an exponential moving average), so the cap follows the model and
+    language in use instead of a fixed guess. The target leaves room for the
+    CTA and hashtags appended after drafting, so the finished post fits
+    max_chars without the trim call.
+
+    Args:
+        max_chars: Hard post limit (LinkedIn: 3000).
+        tiers: Character range per length preference.
+        cap_margin: Token cap as a multiple of the tokens the target needs.
+        thinking_tokens: Added to the cap for thinking models, whose reasoning counts
+            against max_output_tokens. Defaults to 1024 for model names containing
+            "2.5" or "thinking" and 0 otherwise.
+        smoothing: Weight of a new measurement in the moving averages.
+    """
+    def __init__(self, max_chars: int = 3000, tiers: Optional[dict[str, tuple[int, int]]] = None,
+                 cap_margin: float = 1.2, thinking_tokens: Optional[int] = None, smoothing: float = 0.2):
+        self.max_chars = max_chars
+        self.tiers = tiers or LENGTH_TIERS
+        self.cap_margin = cap_margin
+        self.thinking_tokens = thinking_tokens
+        self.smoothing = smoothing
+        self._chars_per_token: dict[str, float] = {}
+        self._cta_chars = 100.0
+        self._hashtag_chars = 14.0
+        self._tier_stats: dict[str, dict] = {}
+        self._formatted = 0
+        self._trims = 0
+        self._lock = threading.Lock()
+
+    def _ewma(self, current: float, value: float) -> float:
+        return (1 - self.smoothing) * current + self.smoothing * value
+
+    def chars_per_token(self, model_name: Optional[str] = None) -> float:
+        with self._lock:
+            if model_name in self._chars_per_token:
+                return self._chars_per_token[model_name]
+            if self._chars_per_token:
+                return sum(self._chars_per_token.values()) / len(self._chars_per_token)
+            return DEFAULT_CHARS_PER_TOKEN
+
+    def reserved_chars(self, include_cta: bool, num_hashtags: int) -> int:
+        """Characters kept free for the CTA and hashtags appended to the draft."""
+        with self._lock:
+            reserve = 0.0
+            if include_cta:
+                reserve += 2 + self._cta_chars  # blank line + CTA
+            if num_hashtags > 0:
+                reserve += 2 + num_hashtags * (self._hashtag_chars + 1)
+        return int(math.ceil(reserve))
+
+    def target(self, length_preference: str, include_cta: bool = True, num_hashtags: int = 0) -> dict:
+        """
+        Returns the character target for a length preference.
+
+        Returns:
+            A dict with "tier", "min_chars" and "max_chars" (target range for the body).
+        """
+        tier = length_preference.lower() if length_preference.lower() in self.tiers else "moderate"
+        low, high = self.tiers[tier]
+        high = min(high, self.max_chars - self.reserved_chars(include_cta, num_hashtags))
+        return {"tier": tier, "min_chars": low if low < high else int(high * 0.7), "max_chars": high}
+
+    def token_cap(self, target: dict, model_name: Optional[str] = None) -> int:
+        """Returns max_output_tokens for a target, from the measured chars-per-token of the model."""
+        tokens = target["max_chars"] / self.chars_per_token(model_name)
+        return int(math.ceil(tokens * self.cap_margin)) + self._thinking_allowance(model_name)
+
+    def _thinking_allowance(self, model_name: Optional[str]) -> int:
+        if self.thinking_tokens is not None:
+            return self.thinking_tokens
+        if model_name and any(hint in model_name for hint in THINKING_MODEL_HINTS):
+            return DEFAULT_THINKING_TOKENS
+        return 0
+
+    def instruction(self, target: dict) -> str:
+        """Prompt sentence stating the target length in characters and words."""
+        words = (int(target["min_chars"] / AVERAGE_WORD_CHARS), int(target["max_chars"] / AVERAGE_WORD_CHARS))
+        return (f"Write between {target['min_chars']} and {target['max_chars']} characters "
+                f"(about {words[0]}-{words[1]} words). Do not exceed {target['max_chars']} characters.")
+
+    def observe_draft(self, target: dict, text: str, output_tokens: int = 0, model_name: Optional[str] = None) -> None:
+        """Records a produced draft: its chars-per-token and whether it overshot the target."""
+        with self._lock:
+            if output_tokens > 0 and text:
+                key = model_name or "default"
+                ratio = len(text) / output_tokens
+                self._chars_per_token[key] = self._ewma(self._chars_per_token.get(key, ratio), ratio)
+            stats = self._tier_stats.setdefault(target["tier"], {"drafts": 0, "overshoots": 0, "fill_sum": 0.0})
+            stats["drafts"] += 1
+            stats["fill_sum"] += len(text) / target["max_chars"]
+            if len(text) > target["max_chars"]:
+                stats["overshoots"] += 1
+
+    def observe_appendix(self, cta: str = "", hashtags: Optional[list[str]] = None) -> None:
+        """Updates the expected CTA and hashtag lengths used for the reserve."""
+        with self._lock:
+            if cta:
+                self._cta_chars = self._ewma(self._cta_chars, len(cta))
+            for hashtag in hashtags or []:
+                self._hashtag_chars = self._ewma(self._hashtag_chars, len(hashtag))
+
+    def observe_format(self, trimmed: bool) -> None:
+        with self._lock:
+            self._formatted += 1
+            self._trims += int(trimmed)
+
+    def stats(self) -> dict:
+        """Returns measured chars-per-token, overshoot rate per tier and trim rate."""
+        with self._lock:
+            tiers = {
+                tier: {
+                    "drafts": s["drafts"],
+                    "overshoot_rate": round(s["overshoots"] / s["drafts"], 3),
+                    "mean_fill": round(s["fill_sum"] / s["drafts"], 3),
+                }
+                for tier, s in self._tier_stats.items() if s["drafts"]
+            }
+            return {
+                "chars_per_token": {name: round(value, 3) for name, value in self._chars_per_token.items()},
+                "tiers": tiers,
+                "formatted_posts": self._formatted,
+                "trims": self._trims,
+                "trim_rate": round(self._trims / self._formatted, 3) if self._formatted else 0.0,
+            }
@@ -0,0 +1,249 @@
+# linkedin_media.py
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Optional
+
+from linkedin_post_api import _credentials, api_base_url
+
+# Register-upload recipe and ugcPosts shareMediaCategory per media type
+MEDIA_TYPES = {
+    "image": {"recipe": "urn:li:digitalmediaRecipe:feedshare-image", "category": "IMAGE"},
+    "video": {"recipe": "urn:li:digitalmediaRecipe:feedshare-video", "category": "VIDEO"},
+    "document": {"recipe": "urn:li:digitalmediaRecipe:feedshare-document", "category": "NATIVE_DOCUMENT"},
+}
+SINGLE_UPLOAD = "com.linkedin.digitalmedia.uploading.MediaUploadHttpRequest"
+MULTIPART_UPLOAD = "com.linkedin.digitalmedia.uploading.MultipartUpload"
+
+ProgressCallback = Callable[[int, int], None]
+
+
+class FileSlice:
+    """
+    Read-only file-like view of a byte range of a file.
+
+    requests streams file-like bodies in blocks and takes the Content-Length
+    from len(), so a part is sent straight from disk without being buffered.
+    on_read is called with the size of every block read.
+    """
+    def __init__(self, path: str, offset: int, length: int, on_read: Optional[Callable[[int], None]] = None):
+        self._file = open(path, "rb")
+        self._file.seek(offset)
+        self._remaining = length
+        self._length = length
+        self._on_read = on_read
+
+    def __len__(self) -> int:
+        return self._length
+
+    def read(self, size: int = -1) -> bytes:
+        if self._remaining <= 0:
+            return b""
+        size = self._remaining if size is None or size < 0 else min(size, self._remaining)
+        block = self._file.read(size)
+        self._remaining -= len(block)
+        if self._on_read is not None and block:
+            self._on_read(len(block))
+        return block
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class MediaUploader:
+    """
+    Uploads images, documents and videos through LinkedIn's register-upload flow.
+
+    A file is registered with POST /assets?action=registerUpload, then sent to
+    the returned upload URL. Files at or above multipart_threshold are
+    registered for multipart upload: the parts LinkedIn assigns are streamed
+    from disk concurrently and the upload is completed with the parts'
+    ETags. Files are never read into memory as a whole.
+
+    Progress is kept in a JSON state file next to the media file, so an
+    interrupted upload resumes with the same asset and only re-sends the
+    parts that did not finish. The state is discarded when the file changes.
+
+    Args:
+        http: Optional requests-compatible client (see post_as_organization).
+        max_workers: Concurrent part uploads.
+        multipart_threshold: Size in bytes from which multipart upload is requested.
+        base_url: API base URL; defaults to LINKEDIN_API_BASE_URL (for a local stub server) or LinkedIn.
+        state_dir: Directory for resume state files (defaults to the media file's directory).
+    """
+    def __init__(self, http=None, max_workers: int = 4, multipart_threshold: int = 200 * 1024 * 1024,
+                 base_url: Optional[str] = None, state_dir: Optional[str] = None):
+        if http is None:
+            import requests as http
+        self.http = http
+        self.max_workers = max_workers
+        self.multipart_threshold = multipart_threshold
+        self.base_url = (base_url or api_base_url()).rstrip("/")
+        self.state_dir = state_dir
+
+    def _headers(self, access_token: str, json_body: bool = True) -> dict:
+        headers = {"Authorization": f"Bearer {access_token}", "X-Restli-Protocol-Version": "2.0.0"}
+        if json_body:
+            headers["Content-Type"] = "application/json"
+        return headers
+
+    def _state_path(self, path: str) -> str:
+        directory = self.state_dir or os.path.dirname(os.path.abspath(path))
+        digest = hashlib.sha256(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(directory, f".{os.path.basename(path)}.{digest}.upload.json")
+
+    def _load_state(self, path: str, fingerprint: dict) -> Optional[dict]:
+        try:
+            with open(self._state_path(path), encoding="utf-8") as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return state if state.get("file") == fingerprint else None
+
+    def _save_state(self, path: str, state: dict) -> None:
+        state_path = self._state_path(path)
+        with open(state_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(state_path + ".tmp", state_path)
+
+    def _register(self, media_type: str, size: int, owner: str, access_token: str) -> dict:
+        request = {
+            "recipes": [MEDIA_TYPES[media_type]["recipe"]],
+            "owner": owner,
+            "serviceRelationships": [{"relationshipType": "OWNER", "identifier": "urn:li:userGeneratedContent"}],
+        }
+        if size >= self.multipart_threshold:
+            request["supportedUploadMechanism"] = ["MULTIPART_UPLOAD"]
+            request["fileSize"] = size
+        response = self.http.post(f"{self.base_url}/assets?action=registerUpload",
+                                  headers=self._headers(access_token), json={"registerUploadRequest": request})
+        if response.status_code not in (200, 201):
+            raise RuntimeError(f"registerUpload failed: {response.status_code} {response.text}")
+        value = response.json()["value"]
+        mechanism = value["uploadMechanism"]
+        if MULTIPART_UPLOAD in mechanism:
+            multipart = mechanism[MULTIPART_UPLOAD]
+            parts = [{"url": part["url"], "headers": part.get("headers", {}),
+                      "first": part["byteRange"]["firstByte"], "last": part["byteRange"]["lastByte"]}
+                     for part in multipart["parts"]]
+            return {"asset": value["asset"], "media_artifact": value.get("mediaArtifact"),
+                    "metadata": multipart.get("metadata"), "parts": parts, "done": {}}
+        single = mechanism[SINGLE_UPLOAD]
+        return {"asset": value["asset"], "upload_url": single["uploadUrl"], "headers": single.get("headers", {})}
+
+    def upload(self, path: str, media_type: str, progress: Optional[ProgressCallback] = None,
+               owner: Optional[str] = None) -> dict:
+        """
+        Uploads a media file and returns its asset URN for post_as_organization.
+
+        Args:
+            path: File to upload.
+            media_type: "image", "document" or "video".
+            progress: Called as progress(bytes_sent, total_bytes), always from the calling thread.
+            owner: Owner URN (defaults to LINKEDIN_ORG_URN).
+
+        Returns:
+            dict: "success", "message" and, on success, "asset" and "media_type".
+        """
+        if media_type not in MEDIA_TYPES:
+            raise ValueError(f"Unknown media type '{media_type}'. Valid types: {tuple(MEDIA_TYPES)}")
+        access_token, org_urn = _credentials()
+        stat = os.stat(path)
+        fingerprint = {"path": os.path.abspath(path), "size": stat.st_size, "mtime": stat.st_mtime,
+                       "media_type": media_type}
+        try:
+            state = self._load_state(path, fingerprint)
+            if state is None:
+                state = dict(self._register(media_type, stat.st_size, owner or org_urn, access_token),
+                             file=fingerprint)
+                self._save_state(path, state)
+            else:
+                print(f"Resuming upload of {os.path.basename(path)} as {state['asset']}.")
+            if "parts" in state:
+                self._upload_parts(path, state, access_token, progress)
+                self._complete_multipart(state, access_token)
+            else:
+                self._upload_single(path, state, access_token, progress)
+        except Exception as e:
+            return {"success": False, "message": f"Error uploading {os.path.basename(path)}: {e}", "error": str(e)}
+        os.remove(self._state_path(path))
+        return {"success": True, "message": "Media uploaded.", "asset": state["asset"], "media_type": media_type}
+
+    def _upload_single(self, path: str, state: dict, access_token: str, progress: Optional[ProgressCallback]) -> None:
+        size = state["file"]["size"]
+        sent = [0]
+
+        def on_read(count: int) -> None:
+            sent[0] += count
+            if progress is not None:
+                progress(sent[0], size)
+
+        body = FileSlice(path, 0, size, on_read)
+        try:
+            headers = dict(self._headers(access_token, json_body=False), **state["headers"])
+            response = self.http.put(state["upload_url"], headers=headers, data=body)
+        finally:
+            body.close()
+        if response.status_code not in (200, 201):
+            raise RuntimeError(f"upload failed: {response.status_code} {response.text}")
+
+    def _upload_parts(self, path: str, state: dict, access_token: str, progress: Optional[ProgressCallback]) -> None:
+        size = state["file"]["size"]
+        lock = threading.Lock()
+        sent = [sum(part["last"] - part["first"] + 1 for i, part in enumerate(state["parts"]) if str(i) in state["done"])]
+
+        def on_read(count: int) -> None:
+            with lock:
+                sent[0] += count
+
+        def send(index: int) -> tuple[int, str]:
+            part = state["parts"][index]
+            body = FileSlice(path, part["first"], part["last"] - part["first"] + 1, on_read)
+            try:
+                response = self.http.put(part["url"], headers=part["headers"], data=body)
+            finally:
+                body.close()
+            if response.status_code not in (200, 201):
+                raise RuntimeError(f"part {index} failed: {response.status_code} {response.text}")
+            return index, (getattr(response, "headers", None) or {}).get("ETag", "")
+
+        pending = [i for i in range(len(state["parts"])) if str(i) not in state["done"]]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(send, index) for index in pending}
+            try:
+                while futures:
+                    # Wake up regularly so progress is reported from the caller's thread
+                    finished, futures = wait(futures, timeout=0.2, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        index, etag = future.result()
+                        state["done"][str(index)] = etag
+                        self._save_state(path, state)
+                    if progress is not None:
+                        with lock:
+                            progress(min(sent[0], size), size)
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                raise
+
+    def _complete_multipart(self, state: dict, access_token: str) -> None:
+        responses = [{"headers": {"ETag": state["done"][str(i)]}, "httpStatusCode": 200}
+                     for i in range(len(state["parts"]))]
+        request = {"mediaArtifact": state["media_artifact"], "metadata": state["metadata"],
+                   "partUploadResponses": responses}
+        response = self.http.post(f"{self.base_url}/assets?action=completeMultiPartUpload",
+                                  headers=self._headers(access_token),
+                                  json={"completeMultipartUploadRequest": request})
+        if response.status_code not in (200, 201):
+            raise RuntimeError(f"completeMultiPartUpload failed: {response.status_code} {response.text}")
+
+
+# Example usage (for testing)
+if __name__ == "__main__":
+    import sys
+    uploader = MediaUploader()
+    result = uploader.upload(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else "image",
+                             progress=lambda sent, total: print(f"\r{sent}/{total} bytes", end=""))
+    print(f"\n{result}")
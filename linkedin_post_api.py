@@ -1,33 +1,55 @@
-import requests
 import os
-from dotenv import load_dotenv
 
-load_dotenv()
+from sub_agents.runtime import load_env
 
-# Load from .env or replace directly here
-ACCESS_TOKEN = os.getenv("LINKEDIN_ACCESS_TOKEN")
-ORG_URN = os.getenv("LINKEDIN_ORG_URN")  # e.g., "urn:li:organization:107290150"
+DEFAULT_API_BASE_URL = "https://api.linkedin.com/v2"
 
-def post_as_organization(text: str):
+
+def _credentials() -> tuple:
+    """Reads the LinkedIn credentials from the environment (.env is loaded once per process)."""
+    load_env()
+    # Load from .env or replace directly here
+    access_token = os.getenv("LINKEDIN_ACCESS_TOKEN")
+    org_urn = os.getenv("LINKEDIN_ORG_URN")  # e.g., "urn:li:organization:107290150"
+    return access_token, org_urn
+
+
+def api_base_url() -> str:
+    """The LinkedIn API base URL; LINKEDIN_API_BASE_URL overrides it, e.g. for a local stub server."""
+    load_env()
+    return os.getenv("LINKEDIN_API_BASE_URL", DEFAULT_API_BASE_URL).rstrip("/")
+
+
+def post_as_organization(text: str, http=None, media: list = None):
     """
     Posts content to LinkedIn as an organization.
     
     Args:
         text: The text content to post
+        http: Optional requests-compatible client, e.g. a traffic_recorder.RecordingSession
+            or ReplaySession. Defaults to the requests module.
+        media: Optional uploaded media, the results of linkedin_media.MediaUploader.upload
+            (dicts with "asset" and "media_type", optionally "title"). All items must have
+            the same media type.
         
     Returns:
         dict: Response information including success status and any error messages
     """
-    url = "https://api.linkedin.com/v2/ugcPosts"
+    if http is None:
+        # Imported here so importing this module (e.g. from app.py) stays cheap
+        import requests as http
+
+    access_token, org_urn = _credentials()
+    url = f"{api_base_url()}/ugcPosts"
 
     headers = {
-        "Authorization": f"Bearer {ACCESS_TOKEN}",
+        "Authorization": f"Bearer {access_token}",
         "X-Restli-Protocol-Version": "2.0.0",
         "Content-Type": "application/json"
     }
 
     payload = {
-        "author": ORG_URN,
+        "author": org_urn,
         "lifecycleState": "PUBLISHED",
         "specificContent": {
             "com.linkedin.ugc.ShareContent": {
@@ -42,8 +64,22 @@ def post_as_organization(text: str):
         }
     }
 
+    if media:
+        # Imported here so text-only posts do not load the upload code
+        from linkedin_media import MEDIA_TYPES
+        categories = {MEDIA_TYPES[item["media_type"]]["category"] for item in media}
+        if len(categories) > 1:
+            raise ValueError("All media of a post must have the same type.")
+        share = payload["specificContent"]["com.linkedin.ugc.ShareContent"]
+        share["shareMediaCategory"] = categories.pop()
+        share["media"] = [
+            dict({"status": "READY", "media": item["asset"]},
+                 **({"title": {"text": item["title"]}} if item.get("title") else {}))
+            for item in media
+        ]
+
     try:
-        response = requests.post(url, headers=headers, json=payload)
+        response = http.post(url, headers=headers, json=payload)
         
         if response.status_code == 201:
             return {
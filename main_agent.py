@@ -1,56 +1,291 @@
 # main_agent.py
 
-import google.generativeai as genai
 import os
-from dotenv import load_dotenv, find_dotenv
-from typing import Optional, Dict, List, Any, Union
+import dataclasses
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Optional, Dict, List, Any, Union, Callable
+
+from sub_agents.prompting import generate_about_post
+from sub_agents.structured_output import StructuredOutputError, json_generation_config, parse_structured
+from sub_agents.runtime import fallback_scope, load_env, note_fallback
+from length_control import LengthController, drop_partial_sentence
+from model_router import ModelRouter
+from pipeline_dag import StageGraph
+
+# Sub-agents and optional components are imported on first use to keep startup fast
+if TYPE_CHECKING:
+    from sub_agents.engagement_history import EngagementHistory
+    from sub_agents.hashtag_index import HashtagIndex
+    from sub_agents.connections_directory import ConnectionsDirectory
+    from sub_agents.duplicate_detector import DuplicateDetector
+    from semantic_cache import SemanticCache
+    from traffic_recorder import TrafficRecorder, TrafficReplay
+    from context_cache import ContextCacheManager
+    from api_key_pool import ApiKeyPool
+    from profiling import RequestProfiler
+    from history_store import HistoryStore
+    from translation_memory import TranslationMemory
+    from brand_voice import BrandVoiceStore
+    from sub_agents.engagement_predictor import EngagementPredictor
+
+# Returned in place of a draft when the draft model fails
+DRAFT_ERROR = "[Error generating initial draft.]"
+
+DRAFT_SYSTEM_INSTRUCTION = """
+You draft LinkedIn posts.
+Focus on creating engaging content relevant to a professional audience.
+Follow the requested topic, tone and length.
+"""
+
+TRANSLATION_SYSTEM_INSTRUCTION = """
+You translate LinkedIn posts.
+Maintain the professional tone and formatting of the original post.
+Return only the translation.
+"""
+
+SEGMENT_TRANSLATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "translations": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"id": {"type": "integer"}, "text": {"type": "string"}},
+                "required": ["id", "text"],
+            },
+        },
+    },
+    "required": ["translations"],
+}
+
 
-# Import our sub-agents
-from sub_agents.tone_style_selector import ToneStyleSelector
-from sub_agents.hashtag_generator import HashtagGenerator
-from sub_agents.charachter_formater import CharacterFormatter
-from sub_agents.engagement_optimizer import EngagementOptimiser
-from sub_agents.content_validator import ContentValidator
-from sub_agents.tagging_assist import TaggingAssist
+def _hit_token_cap(candidate) -> bool:
+    """True if generation stopped at max_output_tokens (FinishReason.MAX_TOKENS)."""
+    reason = getattr(candidate, "finish_reason", None)
+    return getattr(reason, "name", reason) in ("MAX_TOKENS", 2)
 
-load_dotenv(find_dotenv())
 
 class LinkedInPostGenerator:
     """
     Orchestrates various sub-agents to generate and refine a LinkedIn post.
+
+    Sub-agents (and the Gemini SDK behind them) are created lazily the first
+    time a stage needs them, so constructing a generator is cheap.
     """
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None,
+                 engagement_history: Optional["EngagementHistory"] = None,
+                 hashtag_index: Optional["HashtagIndex"] = None,
+                 duplicate_detector: Optional["DuplicateDetector"] = None,
+                 dedup_action: str = "regenerate",
+                 max_dedup_retries: int = 1,
+                 semantic_cache: Optional["SemanticCache"] = None,
+                 model_router: Optional[ModelRouter] = None,
+                 max_workers: int = 4,
+                 recorder: Optional["TrafficRecorder"] = None,
+                 replay: Optional["TrafficReplay"] = None,
+                 context_cache: Optional["ContextCacheManager"] = None,
+                 speculative_enrichment: bool = False,
+                 speculation_threshold: float = 0.5,
+                 key_pool: Optional["ApiKeyPool"] = None,
+                 profiler: Optional["RequestProfiler"] = None,
+                 history_store: Optional["HistoryStore"] = None,
+                 auto_repair: bool = False,
+                 length_controller: Optional[LengthController] = None,
+                 variants: bool = False,
+                 connections_directory: Optional["ConnectionsDirectory"] = None,
+                 rerank_tags: bool = False,
+                 translation_memory: Optional["TranslationMemory"] = None,
+                 brand_voice: Optional["BrandVoiceStore"] = None,
+                 engagement_predictor: Optional["EngagementPredictor"] = None,
+                 min_engagement_percentile: Optional[float] = None,
+                 max_engagement_redrafts: int = 1,
+                 cta_replace_margin: float = 0.15):
+        load_env()
         if api_key is None:
             api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key:
+        # Per-stage model routing: light stages go to a fast model, drafting to the strong one
+        self.router = model_router or ModelRouter(api_key=api_key, key_pool=key_pool)
+        if key_pool is not None:
+            self.router.key_pool = key_pool
+        if not api_key and replay is None and self.router.key_pool is None:
             raise ValueError("GOOGLE_API_KEY not found. Please set it or pass it.")
-        genai.configure(api_key=api_key)
-
-        # Initialize the main generative model for initial drafting
-        llm = os.getenv("MODEL_NAME")
-        self.main_model = genai.GenerativeModel(llm)
-
-        # Initialize sub-agents
-        self.tone_selector = ToneStyleSelector(api_key=api_key)
-        self.hashtag_gen = HashtagGenerator(api_key=api_key)
-        self.formatter = CharacterFormatter(api_key=api_key) # LinkedIn default limit
-        self.engagement_opt = EngagementOptimiser(api_key=api_key)
-        self.validator = ContentValidator(api_key=api_key)
-        self.tagging_assist = TaggingAssist(api_key=api_key)
-
-    def generate_initial_draft(self, topic: str, tone: str = "Professional", length_preference: str = "moderate") -> str:
-        """Generates an initial draft of the LinkedIn post using the main model."""
-        length_instruction = {
-            "short": "Keep it concise, under 500 characters.",
-            "moderate": "Write a moderate length post, aiming for 1000-1500 characters.",
-            "long": "Write a detailed post, potentially up to 2500 characters."
-        }.get(length_preference.lower(), "Write a moderate length post.")
+
+        self.router.api_key = self.router.api_key or api_key
+        # Traffic recording/replay hooks in at the router, which every model call goes through
+        self.recorder = recorder
+        if recorder is not None:
+            self.router.recorder = recorder
+        if replay is not None:
+            self.router.replay = replay
+        # Stages that read the same post share one cached copy of it when it is large enough
+        if context_cache is not None:
+            self.router.context_cache = context_cache
+        self.main_model = self.router.for_stage("draft", DRAFT_SYSTEM_INSTRUCTION)
+        self.translation_model = self.router.for_stage("translate", TRANSLATION_SYSTEM_INSTRUCTION)
+
+        # Sub-agents are built on first access (see the properties below)
+        self._engagement_history = engagement_history
+        self._hashtag_index = hashtag_index
+        # Tags come from matching connections locally; the model only re-ranks them if rerank_tags is set
+        self._connections_directory = connections_directory
+        self.rerank_tags = rerank_tags
+        self._agents: dict[str, Any] = {}
+        self._agents_lock = threading.Lock()
+
+        # Near-duplicate detection against recent/published posts.
+        # dedup_action is "regenerate" (redraft with a fresh angle) or "flag" (report only).
+        if dedup_action not in ("regenerate", "flag"):
+            raise ValueError("dedup_action must be 'regenerate' or 'flag'.")
+        self.duplicate_detector = duplicate_detector
+        self.dedup_action = dedup_action
+        self.max_dedup_retries = max_dedup_retries
+
+        # Reuses results for near-identical topics generated with the same parameters
+        self.semantic_cache = semantic_cache
+
+        # Speculative mode starts validation, hashtags, tags and CTA on the draft while the tone
+        # pass runs, and keeps those results if the rewrite stays close enough to the draft
+        self.speculative_enrichment = speculative_enrichment
+        self.speculation_threshold = speculation_threshold
+        self._vectorizer = None
+
+        # Opt-in per-request profiling (all or a sampled fraction of requests)
+        self.profiler = profiler
+
+        # Persistent, searchable history of generated posts
+        self.history_store = history_store
+
+        # Sentence-level translation reuse; only segments not in the memory go to the model
+        self.translation_memory = translation_memory
+
+        # Few-shot examples of a tenant's brand voice, picked per topic within a token budget
+        self.brand_voice = brand_voice
+
+        # Repair located validation issues sentence by sentence before formatting
+        self.auto_repair = auto_repair
+
+        # Sizes drafts from measured chars-per-token so the finished post rarely needs trimming
+        self.length_control = length_controller or LengthController()
+
+        # Also produce comment and headline variants of the finished post (one extra call)
+        self.variants = variants
+
+        # Local engagement model: ranks CTA and hashtag candidates and, with min_engagement_percentile,
+        # redrafts drafts predicted to do worse than that share of past posts before enrichment runs
+        if min_engagement_percentile is not None and engagement_predictor is None:
+            raise ValueError("min_engagement_percentile needs an engagement_predictor.")
+        self.engagement_predictor = engagement_predictor
+        self.min_engagement_percentile = min_engagement_percentile
+        self.max_engagement_redrafts = max_engagement_redrafts
+        # The topic-specific CTA is only swapped for a common one predicted this much higher (in percentile points)
+        self.cta_replace_margin = cta_replace_margin
+        # Extra hashtag candidates requested so the predictor has a choice
+        self.hashtag_shortlist_extra = 3
+
+        # Declarative, memoized stage graph; independent stages run concurrently
+        self.pipeline = self._build_pipeline(max_workers)
+
+    def _agent(self, name: str, factory):
+        """Returns the named sub-agent, building it with factory() on first use."""
+        agent = self._agents.get(name)
+        if agent is None:
+            with self._agents_lock:
+                agent = self._agents.get(name)
+                if agent is None:
+                    agent = self._agents[name] = factory()
+        return agent
+
+    @property
+    def tone_selector(self):
+        def build():
+            from sub_agents.tone_style_selector import ToneStyleSelector
+            return ToneStyleSelector(model=self.router.for_stage("tone"))
+        return self._agent("tone_selector", build)
+
+    @property
+    def hashtag_gen(self):
+        def build():
+            from sub_agents.hashtag_generator import HashtagGenerator
+            index = self._hashtag_index
+            if index is None and os.getenv("HASHTAG_INDEX_PATH"):
+                from sub_agents.hashtag_index import HashtagIndex
+                index = HashtagIndex.load(os.getenv("HASHTAG_INDEX_PATH"))
+            return HashtagGenerator(index=index, model=self.router.for_stage("hashtags"))
+        return self._agent("hashtag_gen", build)
+
+    @property
+    def formatter(self):
+        def build():
+            from sub_agents.charachter_formater import CharacterFormatter
+            return CharacterFormatter(model=self.router.for_stage("trim")) # LinkedIn default limit
+        return self._agent("formatter", build)
+
+    @property
+    def engagement_opt(self):
+        def build():
+            from sub_agents.engagement_optimizer import EngagementOptimiser
+            history = self._engagement_history
+            if history is None and os.getenv("ENGAGEMENT_HISTORY_PATH"):
+                from sub_agents.engagement_history import EngagementHistory
+                history = EngagementHistory.from_file(os.getenv("ENGAGEMENT_HISTORY_PATH"))
+            return EngagementOptimiser(history=history, model=self.router.for_stage("cta"))
+        return self._agent("engagement_opt", build)
+
+    @property
+    def validator(self):
+        def build():
+            from sub_agents.content_validator import ContentValidator
+            return ContentValidator(model=self.router.for_stage("validate"))
+        return self._agent("validator", build)
+
+    @property
+    def span_repairer(self):
+        def build():
+            from sub_agents.span_repair import SpanRepairer
+            return SpanRepairer(model=self.router.for_stage("repair"), rule_checker=self.validator.rule_issues)
+        return self._agent("span_repairer", build)
+
+    @property
+    def tagging_assist(self):
+        def build():
+            from sub_agents.tagging_assist import TaggingAssist
+            directory = self._connections_directory
+            if directory is None and os.getenv("CONNECTIONS_PATH"):
+                from sub_agents.connections_directory import ConnectionsDirectory
+                directory = ConnectionsDirectory.load(os.getenv("CONNECTIONS_PATH"))
+            return TaggingAssist(model=self.router.for_stage("tags"), directory=directory, rerank=self.rerank_tags)
+        return self._agent("tagging_assist", build)
+
+    @property
+    def variant_gen(self):
+        def build():
+            from sub_agents.variant_generator import VariantGenerator
+            return VariantGenerator(model=self.router.for_stage("variants"), formatter=self.formatter)
+        return self._agent("variant_gen", build)
+
+    def generate_initial_draft(self, topic: str, tone: str = "Professional", length_preference: str = "moderate",
+                               extra_instructions: str = "", length_target: Optional[dict] = None,
+                               voice_examples: str = "") -> str:
+        """
+        Generates an initial draft of the LinkedIn post using the main model.
+
+        length_target (from LengthController.target) defaults to the target for
+        length_preference with a CTA and no hashtags. voice_examples is an optional
+        brand voice block (see BrandVoiceStore.prompt_block).
+        """
+        if length_target is None:
+            length_target = self.length_control.target(length_preference)
+        length_instruction = self.length_control.instruction(length_target)
 
         prompt = f"""
         Draft a LinkedIn post about the following topic: "{topic}".
         The desired tone is: {tone}.
         {length_instruction}
-        Focus on creating engaging content relevant to a professional audience.
+        {extra_instructions}
+        {voice_examples}
         """
 
         # Configure generation parameters for better quality
@@ -58,7 +293,7 @@ class LinkedInPostGenerator:
             "temperature": 0.7,
             "top_p": 0.95,
             "top_k": 40,
-            "max_output_tokens": 2048,
+            "max_output_tokens": self.length_control.token_cap(length_target, self.main_model.model_name),
         }
 
         # Safety settings to ensure appropriate content
@@ -91,12 +326,92 @@ class LinkedInPostGenerator:
                 #  print("----------------------------------------")
                 #  print("".join([part.text for part in response.candidates[0].content.parts]).strip())
                 #  print("----------------------------------------")
-                 return "".join([part.text for part in response.candidates[0].content.parts]).strip()
+                 draft = "".join([part.text for part in response.candidates[0].content.parts]).strip()
+                 self._observe_draft(response, draft, length_target)
+                 # A draft cut off by the token cap ends mid-sentence; drop the fragment
+                 if _hit_token_cap(response.candidates[0]):
+                     draft = drop_partial_sentence(draft)
+                 return draft
             else:
-                 return "[Error generating initial draft.]"
+                 note_fallback("empty draft response")
+                 return DRAFT_ERROR
         except Exception as e:
             print(f"Error generating initial draft: {e}")
-            return "[Error generating initial draft.]"
+            return DRAFT_ERROR
+
+    def _observe_draft(self, response, draft: str, length_target: dict) -> None:
+        """Feeds the draft's length and token count back into the length controller."""
+        usage = getattr(response, "usage_metadata", None)
+        output_tokens = getattr(usage, "candidates_token_count", 0) or 0
+        model_name = self.router.served_models().get("draft", self.main_model.model_name)
+        self.length_control.observe_draft(length_target, draft, output_tokens, model_name)
+
+    def _check_duplicates(self, post_draft: str, topic: str, tone: str, length_preference: str,
+                          length_target: Optional[dict] = None, voice_examples: str = "") -> tuple[str, list]:
+        """
+        Checks the draft against the duplicate index and redrafts if configured to.
+
+        Returns:
+            A tuple: (draft to continue with, near-duplicate matches for that draft).
+        """
+        if self.duplicate_detector is None:
+            return post_draft, []
+
+        near_duplicates = self._find_duplicates(post_draft)
+        retries = 0
+        while near_duplicates and self.dedup_action == "regenerate" and retries < self.max_dedup_retries:
+            retries += 1
+            print(f"Draft is a near-duplicate of {list(near_duplicates)}. Redrafting ({retries}/{self.max_dedup_retries}).")
+            post_draft = self.generate_initial_draft(
+                topic, tone, length_preference,
+                extra_instructions="Take a clearly different angle, opening and structure from earlier posts on this topic.",
+                length_target=length_target, voice_examples=voice_examples
+            )
+            near_duplicates = self._find_duplicates(post_draft)
+
+        if near_duplicates:
+            print(f"Warning: Draft is a near-duplicate of {list(near_duplicates)}.")
+        return post_draft, [{"post_id": post_id, "similarity": score} for post_id, score in near_duplicates.items()]
+
+    def _find_duplicates(self, text: str) -> dict[str, float]:
+        """Returns the best similarity per indexed post, folding draft entries into their post."""
+        matches = {}
+        for post_id, score in self.duplicate_detector.find_duplicates(text):
+            post_id = post_id.removesuffix(":draft")
+            matches[post_id] = max(score, matches.get(post_id, 0.0))
+        return matches
+
+    def _gate_engagement(self, post_draft: str, topic: str, tone: str, length_preference: str,
+                         length_target: Optional[dict] = None, voice_examples: str = "") -> tuple[str, Optional[dict]]:
+        """
+        Scores the draft with the local engagement predictor and, below min_engagement_percentile,
+        redrafts up to max_engagement_redrafts times, keeping the best-scoring draft.
+
+        Returns:
+            A tuple: (draft to continue with, its predicted "score", "percentile" and "redrafts").
+        """
+        predictor = self.engagement_predictor
+        if predictor is None:
+            return post_draft, None
+
+        best_draft, best_score = post_draft, predictor.predict(post_draft)
+        redrafts = 0
+        while (self.min_engagement_percentile is not None and redrafts < self.max_engagement_redrafts
+               and predictor.percentile(best_score) < self.min_engagement_percentile):
+            redrafts += 1
+            print(f"Draft is predicted at the {predictor.percentile(best_score):.0%} percentile of past posts. "
+                  f"Redrafting ({redrafts}/{self.max_engagement_redrafts}).")
+            candidate = self.generate_initial_draft(
+                topic, tone, length_preference,
+                extra_instructions="Open with a stronger hook, keep sentences short and end by inviting responses.",
+                length_target=length_target, voice_examples=voice_examples
+            )
+            score = predictor.predict(candidate)
+            if score > best_score:
+                best_draft, best_score = candidate, score
+        report = {"score": round(best_score, 5), "percentile": predictor.percentile(best_score), "redrafts": redrafts}
+        print(f"\n--- Predicted engagement: {report['score']:.4f} ({report['percentile']:.0%} percentile) ---")
+        return best_draft, report
 
     def translate_text(self, text: str, target_language: str) -> str:
         """
@@ -112,15 +427,12 @@ class LinkedInPostGenerator:
         if not text or not target_language:
             return ""
 
-        prompt = f"""
-        Translate the following LinkedIn post to {target_language}.
-        Maintain the professional tone and formatting of the original post.
-
-        Original Post:
-        {text}
+        if self.translation_memory is not None:
+            translated = self._translate_segments(text, target_language)
+            if translated is not None:
+                return translated
 
-        {target_language} Translation:
-        """
+        task = f"Translate the LinkedIn post to {target_language}."
 
         generation_config = {
             "temperature": 0.2,
@@ -130,19 +442,354 @@ class LinkedInPostGenerator:
         }
 
         try:
-            response = self.main_model.generate_content(
-                prompt,
+            response = generate_about_post(
+                self.translation_model, task, text,
                 generation_config=generation_config
             )
             if response and response.candidates and response.candidates[0].content and response.candidates[0].content.parts:
                  return "".join([part.text for part in response.candidates[0].content.parts]).strip()
             else:
                  print("Warning: LLM response empty for translation. Returning empty string.")
+                 note_fallback("empty translation response")
                  return ""
         except Exception as e:
             print(f"Error translating text: {e}")
             return ""
 
+    def _translate_segments(self, text: str, target_language: str) -> Optional[str]:
+        """
+        Translates text segment by segment through the translation memory: stored
+        translations are reused and the remaining segments go to the model in one call.
+
+        Returns:
+            The translation, or None if the batched call failed (the caller then
+            translates the whole post).
+        """
+        from translation_memory import is_translatable, split_segments
+        memory = self.translation_memory
+        segments = split_segments(text)
+        targets: dict[int, str] = {}
+        novel: dict[int, Optional[dict]] = {}  # segment index -> hint from a similar stored segment
+        reused_ids = []
+        exact = fuzzy = 0
+        for i, (segment, _) in enumerate(segments):
+            if not is_translatable(segment):
+                targets[i] = segment
+                continue
+            match = memory.lookup(segment, target_language)
+            if match is not None and match["reusable"]:
+                targets[i] = match["target"]
+                reused_ids.append(match["id"])
+                exact += match["score"] == 1.0
+                fuzzy += match["score"] < 1.0
+            else:
+                novel[i] = match
+
+        if novel:
+            lines = []
+            for i, hint in novel.items():
+                line = f"[{i}] {segments[i][0]}"
+                if hint is not None:
+                    line += f"\n(Earlier translation of a similar sentence: \"{hint['source']}\" -> \"{hint['target']}\")"
+                lines.append(line)
+            prompt = (f"Translate each numbered segment of a LinkedIn post to {target_language}, "
+                      "in order and consistent with each other. Return every segment by its id.\n\n" + "\n".join(lines))
+            # Translations can run longer than the source; leave room for JSON and ids
+            max_output_tokens = sum(len(segments[i][0]) for i in novel) // 2 + 16 * len(novel) + 64
+            try:
+                response = self.translation_model.generate_content(
+                    prompt,
+                    generation_config=json_generation_config(SEGMENT_TRANSLATION_SCHEMA, max_output_tokens)
+                )
+                translations = {item["id"]: item["text"].strip()
+                                for item in parse_structured(response, SEGMENT_TRANSLATION_SCHEMA)["translations"]}
+            except StructuredOutputError as e:
+                print(f"Warning: Unusable segment translation response ({e}). Translating the whole post.")
+                return None
+            except Exception as e:
+                print(f"Error translating segments: {e}. Translating the whole post.")
+                return None
+            missing = [i for i in novel if not translations.get(i)]
+            if missing:
+                print(f"Warning: Segments {missing} were not translated. Translating the whole post.")
+                return None
+            for i in novel:
+                targets[i] = translations[i]
+                memory.add(segments[i][0], translations[i], target_language)
+
+        memory.mark_used(reused_ids)
+        memory.record(exact=exact, fuzzy=fuzzy, translated=len(novel))
+        print(f"\n--- Translation memory: {exact} exact, {fuzzy} fuzzy, {len(novel)} translated ---")
+        return "".join(targets[i] + separator for i, (_, separator) in enumerate(segments)).strip()
+
+    def get_metrics(self) -> dict:
+        """
+        Returns operational metrics for this generator.
+
+        Returns:
+            A dict with circuit breaker state per stage, length control stats (chars per token,
+            overshoot and trim rates) and, if enabled, semantic and context cache stats,
+            translation memory reuse and per-key load and quota state.
+        """
+        metrics = {"circuit_breakers": self.router.breakers.snapshot(),
+                   "length_control": self.length_control.stats()}
+        if self.semantic_cache is not None:
+            metrics["semantic_cache"] = self.semantic_cache.stats()
+        if self.router.context_cache is not None:
+            metrics["context_cache"] = self.router.context_cache.stats()
+        if self.translation_memory is not None:
+            metrics["translation_memory"] = self.translation_memory.stats()
+        if self.router.key_pool is not None:
+            metrics["api_keys"] = self.router.key_pool.snapshot()
+        return metrics
+
+    def _build_pipeline(self, max_workers: int) -> StageGraph:
+        """
+        Declares the generation pipeline as a stage graph.
+
+        Each stage is memoized by its inputs, so changing e.g. num_hashtags only
+        reruns the hashtag stage, and independent stages (validation, hashtags,
+        tags, CTA, timing) run concurrently.
+
+        In speculative mode those four model stages also run on the initial
+        draft, concurrently with the tone pass; the "speculation" stage then
+        compares draft and rewrite locally and the final stages either keep the
+        speculative results or recompute them on the rewrite.
+        """
+        if self.speculative_enrichment:
+            # The tone pass and four speculative calls must be able to run at once
+            max_workers = max(max_workers, 5)
+        graph = StageGraph(max_workers=max_workers, fallback_scope=fallback_scope)
+        # Local stages reading state that changes between requests (the length EWMAs, the brand voice
+        # store, the engagement history) are cheap, so they rerun instead of being memoized. The model
+        # stages that read the hashtag index and connections directory get their versions as inputs.
+        graph.add_stage("length_target", self._stage_length_target, ["length_preference", "include_cta", "num_hashtags"], ["length_target"], memoize=False)
+        if self.brand_voice is not None:
+            graph.add_stage("voice_examples", self._stage_voice_examples, ["topic", "tone", "tenant"], ["voice_examples"], memoize=False)
+            graph.add_stage("draft", self._stage_draft, ["topic", "tone", "length_preference", "length_target", "voice_examples"], ["raw_draft"])
+            graph.add_stage("dedup", self._stage_dedup, ["raw_draft", "topic", "tone", "length_preference", "length_target", "voice_examples"], ["initial_draft", "near_duplicates", "draft_engagement"])
+        else:
+            graph.add_stage("draft", self._stage_draft, ["topic", "tone", "length_preference", "length_target"], ["raw_draft"])
+            graph.add_stage("dedup", self._stage_dedup, ["raw_draft", "topic", "tone", "length_preference", "length_target"], ["initial_draft", "near_duplicates", "draft_engagement"])
+        graph.add_stage("tone", self._stage_tone, ["initial_draft", "tone"], ["post_draft"])
+        if self.speculative_enrichment:
+            # Speculative stages depend only on the draft, so they run alongside the tone pass
+            graph.add_stage("spec_validate", self._stage_spec_validate, ["initial_draft", "tone"], ["speculative_issues"])
+            graph.add_stage("spec_hashtags", self._stage_spec_hashtags, ["initial_draft", "num_hashtags", "hashtag_index_version"], ["speculative_hashtags"])
+            graph.add_stage("spec_tags", self._stage_spec_tags, ["initial_draft", "connections_version"], ["speculative_tags"])
+            graph.add_stage("spec_cta", self._stage_spec_cta, ["initial_draft", "include_cta"], ["speculative_cta"])
+            graph.add_stage("speculation", self._stage_speculation, ["initial_draft", "post_draft"], ["speculation"])
+            graph.add_stage("validate", self._stage_validate, ["post_draft", "tone", "speculation", "speculative_issues"], ["validation_issues", "validation_records"])
+            graph.add_stage("hashtags", self._stage_hashtags, ["post_draft", "num_hashtags", "hashtag_index_version", "speculation", "speculative_hashtags"], ["suggested_hashtags"])
+            graph.add_stage("tags", self._stage_tags, ["post_draft", "connections_version", "speculation", "speculative_tags"], ["suggested_tags"])
+            graph.add_stage("cta", self._stage_cta, ["post_draft", "include_cta", "speculation", "speculative_cta"], ["suggested_cta"])
+        else:
+            graph.add_stage("validate", self._stage_validate, ["post_draft", "tone"], ["validation_issues", "validation_records"])
+            graph.add_stage("hashtags", self._stage_hashtags, ["post_draft", "num_hashtags", "hashtag_index_version"], ["suggested_hashtags"])
+            graph.add_stage("tags", self._stage_tags, ["post_draft", "connections_version"], ["suggested_tags"])
+            graph.add_stage("cta", self._stage_cta, ["post_draft", "include_cta"], ["suggested_cta"])
+        if self.auto_repair:
+            # Fix only the sentences with located issues, then format the repaired post
+            graph.add_stage("repair", self._stage_repair, ["post_draft", "validation_records"], ["repaired_draft", "repairs"])
+            graph.add_stage("format", self._stage_format_repaired, ["repaired_draft", "suggested_cta"], ["final_post", "character_count"])
+        else:
+            graph.add_stage("format", self._stage_format, ["post_draft", "suggested_cta"], ["final_post", "character_count"])
+        if self.variants:
+            graph.add_stage("variants", self._stage_variants, ["final_post", "suggested_hashtags", "suggested_tags", "validation_records"], ["variants"])
+        graph.add_stage("translate", self._stage_translate, ["final_post", "target_language"], ["translated_post"])
+        graph.add_stage("timing", self._stage_timing, ["audience_type"], ["timing_advice"], memoize=False)
+        return graph
+
+    def _store_versions(self) -> dict:
+        """Versions of the mutable stores read by memoized stages, passed to them as inputs."""
+        index = self.hashtag_gen.index
+        directory = self.tagging_assist.directory
+        return {
+            "hashtag_index_version": index.version if index is not None else 0,
+            "connections_version": directory.version if directory is not None else 0,
+        }
+
+    def _stage_length_target(self, length_preference: str, include_cta: bool, num_hashtags: int) -> dict:
+        # Leave room for the CTA and hashtags that are appended after drafting
+        return self.length_control.target(length_preference, include_cta, num_hashtags)
+
+    def _stage_voice_examples(self, topic: str, tone: str, tenant: Optional[str]) -> str:
+        if not tenant:
+            return ""
+        examples = self.brand_voice.select(tenant, topic, tone,
+                                           chars_per_token=self.length_control.chars_per_token(self.main_model.model_name))
+        print(f"\n--- Brand voice: {len(examples)} example(s) for '{tenant}' ---")
+        return self.brand_voice.prompt_block(tenant, examples)
+
+    def _stage_draft(self, topic: str, tone: str, length_preference: str, length_target: dict,
+                     voice_examples: str = "") -> str:
+        post_draft = self.generate_initial_draft(topic, tone, length_preference, length_target=length_target,
+                                                 voice_examples=voice_examples)
+        print(f"\n--- Initial Draft ---\n{post_draft}")
+        return post_draft
+
+    def _stage_dedup(self, raw_draft: str, topic: str, tone: str, length_preference: str, length_target: dict,
+                     voice_examples: str = "") -> dict:
+        # Check for near-duplicates of recent/published posts and weak drafts before the expensive stages
+        initial_draft, near_duplicates = self._check_duplicates(raw_draft, topic, tone, length_preference,
+                                                                length_target, voice_examples)
+        initial_draft, draft_engagement = self._gate_engagement(initial_draft, topic, tone, length_preference,
+                                                                length_target, voice_examples)
+        return {"initial_draft": initial_draft, "near_duplicates": near_duplicates, "draft_engagement": draft_engagement}
+
+    def _stage_tone(self, initial_draft: str, tone: str) -> str:
+        # Tone adjustment (optional, the initial draft prompt already included tone)
+        post_draft = self.tone_selector.apply_tone_style(initial_draft, tone)
+        print(f"\n--- Tone Adjusted Draft ---\n{post_draft}") # Might not look different if initial draft was good
+        return post_draft
+
+    def _stage_validate(self, post_draft: str, tone: str, speculation: Optional[dict] = None,
+                        speculative_issues: Optional[list] = None) -> dict:
+        # Speculative issues only stand if every quoted span survived the tone rewrite
+        if (speculation and speculation["reused"]
+                and all(issue.quote in post_draft for issue in speculative_issues if issue.quote)):
+            from sub_agents.content_validator import locate_quote
+            # Re-anchor the spans to the rewritten post
+            records = [dataclasses.replace(issue, start=start, end=end)
+                       for issue in speculative_issues
+                       for start, end in [locate_quote(post_draft, issue.quote)]]
+        else:
+            records = self.validator.check_post(post_draft, tone)
+        validation_issues = [str(issue) for issue in records]
+        if validation_issues:
+            print("\n--- Validation Issues Found ---\n" + "\n".join(f"- {issue}" for issue in validation_issues))
+        else:
+            print("\n--- Validation: No major issues found. ---")
+        return {"validation_issues": validation_issues, "validation_records": records}
+
+    def _stage_repair(self, post_draft: str, validation_records: list) -> dict:
+        if not any(issue.has_span for issue in validation_records):
+            return {"repaired_draft": post_draft, "repairs": []}
+        repaired_draft, repairs = self.span_repairer.repair(post_draft, validation_records)
+        fixed = sum(1 for repair in repairs if repair["resolved"])
+        print(f"\n--- Repaired {fixed}/{len(repairs)} sentences with validation issues ---")
+        return {"repaired_draft": repaired_draft, "repairs": repairs}
+
+    def _stage_spec_validate(self, initial_draft: str, tone: str) -> list:
+        return self.validator.check_post(initial_draft, tone)
+
+    # hashtag_index_version and connections_version only key the memo
+    def _stage_spec_hashtags(self, initial_draft: str, num_hashtags: int, hashtag_index_version: int = 0) -> list[str]:
+        return self._generate_hashtags(initial_draft, num_hashtags)
+
+    def _stage_spec_tags(self, initial_draft: str, connections_version: int = 0) -> list[str]:
+        return self.tagging_assist.suggest_tags(initial_draft)
+
+    def _stage_spec_cta(self, initial_draft: str, include_cta: bool) -> str:
+        if not include_cta:
+            return ""
+        return self.engagement_opt.suggest_cta(initial_draft)
+
+    def _stage_speculation(self, initial_draft: str, post_draft: str) -> dict:
+        # Local check: did the tone pass keep the draft's content, or drift far enough to redo enrichment?
+        if self._vectorizer is None:
+            from sub_agents.text_vectorizer import HashingVectorizer
+            self._vectorizer = HashingVectorizer()
+        from sub_agents.text_vectorizer import cosine
+        similarity = cosine(self._vectorizer.transform(initial_draft), self._vectorizer.transform(post_draft))
+        reused = similarity >= self.speculation_threshold
+        print(f"\n--- Speculative enrichment {'kept' if reused else 'discarded'} (similarity {similarity:.2f}) ---")
+        return {"similarity": round(similarity, 4), "reused": reused}
+
+    def _stage_hashtags(self, post_draft: str, num_hashtags: int, hashtag_index_version: int = 0,
+                        speculation: Optional[dict] = None, speculative_hashtags: Optional[list[str]] = None) -> list[str]:
+        if speculation and speculation["reused"]:
+            suggested_hashtags = speculative_hashtags
+        else:
+            suggested_hashtags = self._generate_hashtags(post_draft, num_hashtags)
+        self.length_control.observe_appendix(hashtags=suggested_hashtags)
+        print(f"\n--- Suggested Hashtags: {suggested_hashtags} ---")
+        return suggested_hashtags
+
+    def _generate_hashtags(self, text: str, num_hashtags: int) -> list[str]:
+        """Generates hashtags; with a predictor, a few extra candidates are scored and the best kept."""
+        if self.engagement_predictor is None or num_hashtags <= 0:
+            return self.hashtag_gen.generate_hashtags(text, num_hashtags)
+        candidates = self.hashtag_gen.generate_hashtags(text, num_hashtags + self.hashtag_shortlist_extra)
+        ranked = self.engagement_predictor.rank([{"text": text, "hashtags": [hashtag]} for hashtag in candidates])
+        # Keep the generator's relevance order among the chosen hashtags
+        return [candidates[i] for i in sorted(i for i, _ in ranked[:num_hashtags])]
+
+    def _rank_cta(self, post_draft: str, suggested_cta: str) -> str:
+        """
+        Keeps the suggested CTA unless the engagement predictor places a common CTA
+        at least cta_replace_margin percentile points above it.
+        """
+        if self.engagement_predictor is None:
+            return suggested_cta
+        predictor = self.engagement_predictor
+        candidates = [cta for cta in self.engagement_opt.common_ctas if cta != suggested_cta]
+        if not candidates:
+            return suggested_cta
+        best, best_score = max(((cta, predictor.predict(post_draft, cta=cta)) for cta in candidates), key=lambda item: item[1])
+        suggested_percentile = predictor.percentile(predictor.predict(post_draft, cta=suggested_cta))
+        if predictor.percentile(best_score) - suggested_percentile >= self.cta_replace_margin:
+            print(f"Replacing suggested CTA with a common one predicted to engage better: '{best}'")
+            return best
+        return suggested_cta
+
+    def _stage_tags(self, post_draft: str, connections_version: int = 0, speculation: Optional[dict] = None,
+                    speculative_tags: Optional[list[str]] = None) -> list[str]:
+        if speculation and speculation["reused"]:
+            suggested_tags = speculative_tags
+        else:
+            suggested_tags = self.tagging_assist.suggest_tags(post_draft)
+        print(f"\n--- Suggested Tag Placeholders: {suggested_tags} ---") # Remember these are placeholders
+        return suggested_tags
+
+    def _stage_cta(self, post_draft: str, include_cta: bool, speculation: Optional[dict] = None,
+                   speculative_cta: str = "") -> str:
+        if not include_cta:
+            return ""
+        if speculation and speculation["reused"]:
+            suggested_cta = speculative_cta
+        else:
+            suggested_cta = self.engagement_opt.suggest_cta(post_draft)
+        suggested_cta = self._rank_cta(post_draft, suggested_cta)
+        self.length_control.observe_appendix(cta=suggested_cta)
+        print(f"\n--- Suggested CTA: {suggested_cta} ---")
+        return suggested_cta
+
+    def _stage_format_repaired(self, repaired_draft: str, suggested_cta: str) -> dict:
+        return self._stage_format(repaired_draft, suggested_cta)
+
+    def _stage_format(self, post_draft: str, suggested_cta: str) -> dict:
+        # Append the CTA (if any) with a line break before formatting and the length check
+        if post_draft and suggested_cta:
+            post_draft += f"\n\n{suggested_cta}"
+        elif suggested_cta:
+            post_draft = suggested_cta # If draft generation failed, just use CTA? probably not ideal.
+
+        formatted_post = self.formatter.format_text(post_draft)
+        is_within_limit, char_count = self.formatter.check_length(formatted_post)
+        self.length_control.observe_format(trimmed=not is_within_limit)
+        if is_within_limit:
+            print(f"\n--- Post length is within limit ({char_count}/{self.formatter.max_chars}). ---")
+            return {"final_post": formatted_post, "character_count": char_count}
+
+        print(f"\nWarning: Post exceeds character limit ({char_count}/{self.formatter.max_chars}). Trimming.")
+        final_post = self.formatter.trim_text(formatted_post)
+        print(f"Trimmed post length: {len(final_post)}")
+        return {"final_post": final_post, "character_count": len(final_post)}
+
+    def _stage_variants(self, final_post: str, suggested_hashtags: list[str], suggested_tags: list[str],
+                        validation_records: list) -> dict:
+        variants = self.variant_gen.generate_variants(final_post, suggested_hashtags, suggested_tags, validation_records)
+        print("\n--- Variants: " + ", ".join(f"{surface} {v['character_count']}/{v['limit']}" for surface, v in variants.items()) + " ---")
+        return variants
+
+    def _stage_translate(self, final_post: str, target_language: Optional[str]) -> str:
+        if not target_language:
+            return ""
+        return self.translate_text(final_post, target_language)
+
+    def _stage_timing(self, audience_type: str) -> str:
+        return self.engagement_opt.get_timing_advice(audience_type)
 
     def generate_linkedin_post(self,
                                topic: str,
@@ -151,10 +798,17 @@ class LinkedInPostGenerator:
                                num_hashtags: int = 5,
                                include_cta: bool = True,
                                target_language: str = None,
-                               audience_type: str = "general") -> dict:
+                               audience_type: str = "general",
+                               refresh: bool = False,
+                               profile: Optional[bool] = None,
+                               tenant: Optional[str] = None,
+                               on_stage: Optional[Callable[[str, dict], Any]] = None) -> dict:
         """
         Generates a LinkedIn post by orchestrating sub-agents.
 
+        Stage results are memoized per generator, so calling this again with one
+        changed parameter only recomputes the stages that depend on it.
+
         Args:
             topic: The main subject of the post.
             tone: The desired tone (e.g., "Professional", "Conversational").
@@ -162,86 +816,111 @@ class LinkedInPostGenerator:
             num_hashtags: Number of hashtags to suggest.
             include_cta: Whether to include a call-to-action suggestion.
             target_language: Optional language for translation (e.g., "Spanish").
-            audience_type: Type of audience.
+            audience_type: Type of audience, used for timing advice.
+            refresh: Ignore memoized stage results and cached posts and regenerate everything.
+            profile: Force (True) or skip (False) profiling of this request; by default the
+                generator's profiler samples requests at its sample_rate.
+            tenant: Brand whose voice examples guide the draft (needs a brand_voice store).
+            on_stage: Optional callback, called as on_stage(stage_name, outputs) on the calling
+                thread as each pipeline stage finishes, e.g. to render the draft, hashtags, tags,
+                CTA and validation as they arrive. Not called when the semantic cache answers.
 
         Returns:
             A dictionary containing the generated post and other suggestions.
         """
-        print(f"Generating LinkedIn post about '{topic}' with '{tone}' tone...")
-
-        # 1. Generate Initial Draft
-        post_draft = self.generate_initial_draft(topic, tone, length_preference)
-        print("\n--- Initial Draft ---")
-        print(post_draft)
-
-        # --- Refine and Augment Draft using Sub-Agents ---
-
-        # Tone adjustment (optional, the initial draft prompt already included tone)
-        post_draft = self.tone_selector.apply_tone_style(post_draft, tone)
-        print("\n--- Tone Adjusted Draft ---")
-        print(post_draft) # Might not look different if initial draft was good
-
-        # 2. Validate Content
-        print("\n--- Running Validation ---")
-        validation_issues = self.validator.validate_post(post_draft, tone)
-        if validation_issues:
-            print("Validation Issues Found:")
-            for issue in validation_issues:
-                print(f"- {issue}")
-            # Decide how to handle issues: either stop, report, or attempt auto-correction
-            # For this example, we'll just report. A real agent might try to fix.
-        else:
-            print("Validation: No major issues found.")
-
-        # 3. Generate Hashtags
-        print("\n--- Generating Hashtags ---")
-        suggested_hashtags = self.hashtag_gen.generate_hashtags(post_draft, num_hashtags)
-        print(f"Suggested Hashtags: {suggested_hashtags}")
-
-        # 4. Suggest Tags
-        print("\n--- Suggesting Tags ---")
-        suggested_tags = self.tagging_assist.suggest_tags(post_draft)
-        print(f"Suggested Tag Placeholders: {suggested_tags}") # Remember these are placeholders
-
-        # 5. Add CTA (Optional)
-        suggested_cta = ""
-        if include_cta:
-            print("\n--- Suggesting Call-to-Action ---")
-            suggested_cta = self.engagement_opt.suggest_cta(post_draft)
-            print(f"Suggested CTA: {suggested_cta}")
-            # Optionally append CTA to the post draft
-            if post_draft and suggested_cta:
-                 # Add a line break before CTA
-                 post_draft += f"\n\n{suggested_cta}"
-            elif suggested_cta:
-                 post_draft = suggested_cta # If draft generation failed, just use CTA? probably not ideal.
-
-        # 6. Format and Check Character Count (after potentially adding CTA)
-        print("\n--- Formatting & Length Check ---")
-        formatted_post = self.formatter.format_text(post_draft)
-        is_within_limit, char_count = self.formatter.check_length(formatted_post)
+        cache_params = {
+            "tone": tone,
+            "length_preference": length_preference,
+            "num_hashtags": num_hashtags,
+            "include_cta": include_cta,
+            "target_language": target_language,
+            "audience_type": audience_type,
+            "tenant": tenant,
+        }
+        profile_session = self.profiler.session(profile) if self.profiler is not None else nullcontext()
+        with profile_session as session:
+            output = self._generate(topic, cache_params, refresh, session.stage if session else None, on_stage)
+        if session is not None:
+            output["profile"] = session.report
+        return output
 
-        if not is_within_limit:
-            print(f"Warning: Post exceeds character limit ({char_count}/{self.formatter.max_chars}). Trimming.")
-            final_post = self.formatter.trim_text(formatted_post)
-            final_char_count = len(final_post)
-            print(f"Trimmed post length: {final_char_count}")
-        else:
-            print(f"Post length is within limit ({char_count}/{self.formatter.max_chars}).")
-            final_post = formatted_post
-            final_char_count = char_count
+    def _generate(self, topic: str, cache_params: dict, refresh: bool, observer=None, on_stage=None) -> dict:
+        tone = cache_params["tone"]
+        if self.semantic_cache is not None and not refresh:
+            cached = self.semantic_cache.lookup(topic, **cache_params)
+            if cached is not None:
+                match = cached["semantic_cache"]
+                print(f"Reusing result for similar topic '{match['matched_topic']}' (similarity {match['similarity']:.2f}).")
+                return cached
 
+        print(f"Generating LinkedIn post about '{topic}' with '{tone}' tone...")
+        if self.recorder is not None:
+            request_started = self.recorder.offset()
+            request_start = time.perf_counter()
+
+        # Served models and token usage are tracked per run, since the generator may serve several sessions at once
+        with self.router.track_run() as run:
+            values, stage_report = self.pipeline.run(
+                dict(cache_params, topic=topic, **self._store_versions()), use_memo=not refresh, observer=observer,
+                on_stage=(lambda name, outputs, _: on_stage(name, outputs)) if on_stage else None
+            )
+        recomputed = [name for name, report in stage_report.items() if not report["cached"]]
+        print(f"\n--- Recomputed stages: {recomputed or 'none'} ---")
 
         # --- Compile Final Output ---
+        final_post = values["final_post"]
         output = {
             "final_post": final_post,
-            "character_count": final_char_count,
-            "is_within_limit": final_char_count <= self.formatter.max_chars, # Re-check after trimming
-            "suggested_hashtags": suggested_hashtags,
-            "suggested_tags_placeholders": suggested_tags, # User needs to manually add/replace
-            "suggested_cta": suggested_cta,
-            "validation_issues": validation_issues,
+            "draft": values["initial_draft"],
+            "character_count": values["character_count"],
+            "is_within_limit": values["character_count"] <= self.formatter.max_chars, # Re-check after trimming
+            "suggested_hashtags": values["suggested_hashtags"],
+            "suggested_tags_placeholders": values["suggested_tags"], # User needs to manually add/replace
+            "suggested_cta": values["suggested_cta"],
+            "validation_issues": values["validation_issues"],
+            "translated_post": values["translated_post"],
+            "timing_advice": values["timing_advice"],
+            "near_duplicates": values["near_duplicates"],
+            "models_used": run.served_models(),
+            "token_usage": run.token_usage(),
+            "stage_timings": {name: report["seconds"] for name, report in stage_report.items()},
+            "cached_stages": [name for name, report in stage_report.items() if report["cached"]],
+            "degraded_stages": self.router.breakers.open_stages(),
+            "fallback_stages": [name for name, report in stage_report.items() if report["degraded"]],
         }
+        if self.speculative_enrichment:
+            output["speculation"] = values["speculation"]
+        if self.auto_repair:
+            output["repairs"] = values["repairs"]
+        if self.variants:
+            output["variants"] = values["variants"]
+        if self.engagement_predictor is not None:
+            output["predicted_engagement"] = {
+                "draft": values["draft_engagement"],
+                "final_post": round(self.engagement_predictor.predict(final_post, values["suggested_hashtags"]), 5),
+            }
+
+        # A post assembled from fallbacks or an error placeholder is not a real result:
+        # keep it out of the cache, the history and the duplicate index so a retry regenerates it.
+        usable = not output["fallback_stages"] and DRAFT_ERROR not in values["initial_draft"]
+        if not usable:
+            print(f"Warning: Not storing this post; stages fell back: {output['fallback_stages'] or ['draft']}")
+
+        if usable and self.duplicate_detector is not None and not stage_report["dedup"]["cached"]:
+            # Index the raw draft too: later drafts are compared before the tone pass rewrites them.
+            output["post_id"] = uuid.uuid4().hex
+            self.duplicate_detector.add(output["post_id"], final_post)
+            self.duplicate_detector.add(f"{output['post_id']}:draft", values["initial_draft"])
+
+        if usable and self.semantic_cache is not None:
+            self.semantic_cache.store(topic, output, **cache_params)
+
+        if usable and self.history_store is not None:
+            output["history_id"] = self.history_store.add(output, topic, **cache_params)
+
+        if self.recorder is not None:
+            self.recorder.record_request(dict(cache_params, topic=topic, refresh=refresh),
+                                         request_started, time.perf_counter() - request_start)
 
         print("\n--- Generation Complete ---")
         return output
@@ -0,0 +1,343 @@
+# model_router.py
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Iterator, Optional
+
+from circuit_breaker import BreakerRegistry, CircuitOpenError
+from sub_agents.runtime import get_genai, load_env, note_fallback
+
+if TYPE_CHECKING:
+    from api_key_pool import ApiKeyPool
+    from context_cache import ContextCacheManager
+    from traffic_recorder import TrafficRecorder, TrafficReplay
+
+STAGES = ("draft", "tone", "validate", "repair", "hashtags", "tags", "cta", "trim", "translate", "variants")
+# Short extraction-style stages that do not need the strongest model
+LIGHT_STAGES = ("hashtags", "tags", "cta")
+# Stages that all read the same tone-adjusted post and can share one cached copy of it
+CONTEXT_STAGES = ("validate", "hashtags", "tags", "cta")
+DEFAULT_FAST_MODEL = "gemini-2.0-flash"
+
+
+class RunUsage:
+    """Models served and tokens used per stage during one generation run."""
+    def __init__(self):
+        self.served: dict[str, str] = {}
+        self.usage: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, name: str, response) -> None:
+        """Records the model that served a stage and adds the response's prompt and output tokens."""
+        usage = getattr(response, "usage_metadata", None)
+        with self._lock:
+            self.served[stage] = name
+            entry = self.usage.setdefault(stage, {"model": name, "calls": 0, "prompt_tokens": 0, "output_tokens": 0})
+            entry["model"] = name
+            entry["calls"] += 1
+            entry["prompt_tokens"] += getattr(usage, "prompt_token_count", 0) or 0
+            entry["output_tokens"] += getattr(usage, "candidates_token_count", 0) or 0
+
+    def served_models(self) -> dict[str, str]:
+        with self._lock:
+            return dict(self.served)
+
+    def token_usage(self) -> dict[str, dict]:
+        with self._lock:
+            return {stage: dict(entry) for stage, entry in self.usage.items()}
+
+
+# The run being tracked in this context (see ModelRouter.track_run); pipeline stages inherit it
+_current_run: ContextVar[Optional[RunUsage]] = ContextVar("current_run", default=None)
+
+
+def is_quota_error(error: Exception) -> bool:
+    """Checks whether an exception signals rate limiting or exhausted quota."""
+    try:
+        from google.api_core import exceptions as api_exceptions
+        if isinstance(error, (api_exceptions.ResourceExhausted, api_exceptions.TooManyRequests)):
+            return True
+    except ImportError:
+        pass
+    message = str(error).lower()
+    return "429" in message or "quota" in message or "resource exhausted" in message or "rate limit" in message
+
+
+class RoutedModel:
+    """
+    Drop-in stand-in for genai.GenerativeModel bound to one pipeline stage.
+
+    Calls go to the stage's preferred model and move down its fallback chain
+    when a model returns quota errors. The model that actually served each
+    call is recorded on the router. The stage's circuit breaker is checked
+    first, so an open breaker fails fast with CircuitOpenError and the
+    sub-agent drops straight to its local fallback.
+    """
+    def __init__(self, router: "ModelRouter", stage: str, model_names: list[str],
+                 system_instruction: Optional[str] = None):
+        self.router = router
+        self.stage = stage
+        self.model_names = model_names
+        self.system_instruction = system_instruction
+
+    @property
+    def model_name(self) -> str:
+        return self.model_names[0]
+
+    def with_system_instruction(self, instruction: str) -> "RoutedModel":
+        """Returns a copy of this routed model whose models carry a stable system instruction."""
+        return RoutedModel(self.router, self.stage, self.model_names, instruction)
+
+    def generate_content(self, *args, **kwargs):
+        return self._call(lambda name: self._invoke(name, lambda model: model.generate_content(*args, **kwargs)), kwargs)
+
+    def generate_about_post(self, task: str, post: str, **kwargs):
+        """
+        Runs a task about a post. On stages that share the post (see
+        ModelRouter.context_stages) the post is served from the router's context
+        cache when it is large enough to cache; otherwise it is sent inline.
+        """
+        from sub_agents.prompting import post_request
+        # Cached content belongs to one project, so it is not shared across a key pool
+        shared = (self.router.context_cache is not None and self.router.replay is None
+                  and self.router.key_pool is None and self.stage in self.router.context_stages())
+
+        def call(name):
+            cached_model = self.router.context_cache.acquire(name, post) if shared else None
+            if cached_model is None:
+                return self._invoke(name, lambda model: model.generate_content(post_request(task, post), **kwargs))
+            # The cached content carries the shared instruction and the post; the stage instruction travels with the task
+            contents = [self.system_instruction, task] if self.system_instruction else [task]
+            return self._wrap(cached_model, name).generate_content(contents, **kwargs)
+
+        return self._call(call, kwargs)
+
+    def _invoke(self, name: str, fn):
+        """Runs fn(model) for a model name, spreading calls over the router's key pool if it has one."""
+        pool = self.router.key_pool
+        if self.router.replay is not None:
+            # Replayed responses are looked up per stage
+            return fn(self._wrap(self.router.replay.model(name, self.stage), name))
+        if pool is None:
+            return fn(self._wrap(self.router.get_model(name, self.system_instruction), name))
+        tried = set()
+        last_error = None
+        while True:
+            state = pool.acquire(name, exclude=tried)
+            if state is None:
+                # Every key hit its quota; let the caller fall back to the next model
+                raise last_error
+            try:
+                response = fn(self._wrap(self.router.get_model(name, self.system_instruction, state.key), name))
+            except Exception as e:
+                quota_error = is_quota_error(e)
+                pool.release(state, name, quota_error=quota_error)
+                if not quota_error:
+                    raise
+                print(f"Warning: Quota pressure on key {state.label} for '{name}': {e}. Trying another key.")
+                tried.add(state.key)
+                last_error = e
+                continue
+            pool.release(state, name)
+            return response
+
+    def _wrap(self, model, name: str):
+        if self.router.recorder is not None:
+            from traffic_recorder import RecordingModel
+            return RecordingModel(model, name, self.router.recorder, self.stage)
+        return model
+
+    def _call(self, call, kwargs: dict):
+        breaker = self.router.breakers.get(self.stage)
+        try:
+            breaker.check()
+        except CircuitOpenError as e:
+            note_fallback(str(e))
+            raise
+        if self.router.request_timeout is not None:
+            kwargs.setdefault("request_options", {"timeout": self.router.request_timeout})
+        try:
+            response = self._generate_with_fallback(call)
+        except Exception as e:
+            breaker.record_failure()
+            # The sub-agent answers with its local fallback; keep that result out of caches
+            note_fallback(f"{self.stage}: {e}")
+            raise
+        breaker.record_success()
+        return response
+
+    def _generate_with_fallback(self, call):
+        available = [name for name in self.model_names if not self.router.is_cooling_down(name)]
+        # If every model is cooling down, still try them all rather than fail outright
+        candidates = available or self.model_names
+        last_error = None
+        for name in candidates:
+            try:
+                response = call(name)
+                self.router.record_usage(self.stage, name, response)
+                return response
+            except Exception as e:
+                if not is_quota_error(e):
+                    raise
+                print(f"Warning: Quota pressure on '{name}' for stage '{self.stage}': {e}. Trying next model.")
+                self.router.mark_quota_pressure(name)
+                last_error = e
+        raise last_error
+
+
+class ModelRouter:
+    """
+    Chooses which Gemini model serves each pipeline stage.
+
+    Resolution order per stage:
+      1. stage_models argument, e.g. {"hashtags": "gemini-2.0-flash-lite"}
+      2. MODEL_NAME_<STAGE> environment variable, e.g. MODEL_NAME_HASHTAGS
+      3. FAST_MODEL_NAME for light stages (hashtags, tags, cta), MODEL_NAME otherwise
+
+    Models that return quota errors are skipped for cooldown_seconds and the
+    stage falls back to the next model in FALLBACK_MODEL_NAMES (comma separated,
+    defaults to the fast model).
+
+    Every stage also has a circuit breaker in the shared breakers registry, and
+    request_timeout (seconds, MODEL_REQUEST_TIMEOUT) bounds each model call.
+
+    Token counts reported by each response's usage_metadata are summed per
+    stage (token_usage()) alongside the served models (served_models()). Both
+    belong to the run opened with track_run(), so concurrent requests sharing
+    the router each see only their own calls.
+
+    The SDK is imported and configured with api_key only when the first model
+    is actually needed.
+
+    With a context_cache, stages that share the same post on the same model
+    read it from one Gemini cached-content handle instead of resending it.
+
+    With a key_pool (or GOOGLE_API_KEYS in the environment), calls are spread
+    over several API keys, each with its own client and quota state, instead of
+    the SDK's global configuration.
+
+    With a recorder, every underlying model call is appended to its traffic
+    log; with a replay, models answer from a recorded log instead of the API.
+    """
+    def __init__(self, stage_models: Optional[dict[str, str]] = None,
+                 fallback_models: Optional[list[str]] = None,
+                 cooldown_seconds: float = 60.0,
+                 breakers: Optional[BreakerRegistry] = None,
+                 request_timeout: Optional[float] = None,
+                 api_key: Optional[str] = None,
+                 recorder: Optional["TrafficRecorder"] = None,
+                 replay: Optional["TrafficReplay"] = None,
+                 context_cache: Optional["ContextCacheManager"] = None,
+                 key_pool: Optional["ApiKeyPool"] = None):
+        load_env()
+        self.api_key = api_key
+        self.recorder = recorder
+        self.replay = replay
+        self.context_cache = context_cache
+        if key_pool is None and os.getenv("GOOGLE_API_KEYS"):
+            from api_key_pool import ApiKeyPool
+            key_pool = ApiKeyPool.from_env()
+        self.key_pool = key_pool
+        self.strong_model = os.getenv("MODEL_NAME")
+        self.fast_model = os.getenv("FAST_MODEL_NAME", DEFAULT_FAST_MODEL)
+        if fallback_models is None:
+            env_fallbacks = os.getenv("FALLBACK_MODEL_NAMES", "")
+            fallback_models = [name.strip() for name in env_fallbacks.split(",") if name.strip()] or [self.fast_model]
+        self.fallback_models = fallback_models
+        self.cooldown_seconds = cooldown_seconds
+        self.breakers = breakers or BreakerRegistry()
+        if request_timeout is None and os.getenv("MODEL_REQUEST_TIMEOUT"):
+            request_timeout = float(os.getenv("MODEL_REQUEST_TIMEOUT"))
+        self.request_timeout = request_timeout
+
+        stage_models = stage_models or {}
+        unknown = set(stage_models) - set(STAGES)
+        if unknown:
+            raise ValueError(f"Unknown stages in stage_models: {sorted(unknown)}. Valid stages: {STAGES}")
+        self.stage_models = {}
+        for stage in STAGES:
+            default = self.fast_model if stage in LIGHT_STAGES else self.strong_model
+            self.stage_models[stage] = stage_models.get(stage) or os.getenv(f"MODEL_NAME_{stage.upper()}") or default
+
+        self._models: dict[tuple, object] = {}
+        self._configured = False
+        self._cooldown_until: dict[str, float] = {}
+        # Calls made outside track_run()
+        self._untracked = RunUsage()
+        self._lock = threading.Lock()
+
+    def get_model(self, name: str, system_instruction: Optional[str] = None, api_key: Optional[str] = None):
+        """
+        Returns the genai.GenerativeModel for a model name and system instruction, creating it on first use.
+        With an api_key from the key pool, the model uses that key's own client.
+        """
+        key = (name, system_instruction, api_key)
+        with self._lock:
+            if key not in self._models:
+                if self.replay is not None:
+                    self._models[key] = self.replay.model(name)
+                    return self._models[key]
+                genai = get_genai()
+                if api_key is not None:
+                    from api_key_pool import bind_client
+                    model = genai.GenerativeModel(name, system_instruction=system_instruction)
+                    self._models[key] = bind_client(model, self.key_pool.client(api_key))
+                    return self._models[key]
+                if not self._configured:
+                    genai.configure(api_key=self.api_key or os.getenv("GOOGLE_API_KEY"))
+                    self._configured = True
+                self._models[key] = genai.GenerativeModel(name, system_instruction=system_instruction)
+            return self._models[key]
+
+    def for_stage(self, stage: str, system_instruction: Optional[str] = None) -> RoutedModel:
+        """Returns a model object for the stage, with its fallback chain attached."""
+        if stage not in self.stage_models:
+            raise ValueError(f"Unknown stage '{stage}'. Valid stages: {STAGES}")
+        chain = [self.stage_models[stage]]
+        chain.extend(name for name in self.fallback_models if name not in chain)
+        return RoutedModel(self, stage, chain, system_instruction)
+
+    def context_stages(self) -> tuple[str, ...]:
+        """
+        Returns the context stages whose preferred model is shared with another
+        context stage; caching a post read by a single stage would cost more than it saves.
+        """
+        models = [self.stage_models[stage] for stage in CONTEXT_STAGES]
+        return tuple(stage for stage, name in zip(CONTEXT_STAGES, models) if models.count(name) > 1)
+
+    def is_cooling_down(self, name: str) -> bool:
+        return self._cooldown_until.get(name, 0.0) > time.monotonic()
+
+    def mark_quota_pressure(self, name: str) -> None:
+        with self._lock:
+            self._cooldown_until[name] = time.monotonic() + self.cooldown_seconds
+
+    @contextmanager
+    def track_run(self) -> Iterator[RunUsage]:
+        """
+        Opens a run: model calls made in this context (and in threads that copy
+        it, such as pipeline stages) are recorded on the yielded RunUsage.
+        """
+        run = RunUsage()
+        token = _current_run.set(run)
+        try:
+            yield run
+        finally:
+            _current_run.reset(token)
+
+    def _run(self) -> RunUsage:
+        return _current_run.get() or self._untracked
+
+    def record_usage(self, stage: str, name: str, response) -> None:
+        """Records the serving model and the response's token counts on the current run."""
+        self._run().record(stage, name, response)
+
+    def served_models(self) -> dict[str, str]:
+        """Returns the model that served the most recent call of each stage in the current run."""
+        return self._run().served_models()
+
+    def token_usage(self) -> dict[str, dict]:
+        """Returns calls, prompt and output tokens (and the last serving model) per stage in the current run."""
+        return self._run().token_usage()
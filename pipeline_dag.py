@@ -0,0 +1,192 @@
+# pipeline_dag.py
+import contextvars
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, ContextManager, Iterable, Optional
+
+
+class Stage:
+    """
+    A pipeline node with declared inputs and outputs.
+
+    The function is called with the declared inputs as keyword arguments. A
+    stage with one output returns the value itself; a stage with several
+    outputs returns a dict keyed by output name. A stage that is not
+    memoized runs every time, e.g. one that reads mutable state its inputs
+    do not capture.
+    """
+    __slots__ = ("name", "func", "inputs", "outputs", "memoize")
+
+    def __init__(self, name: str, func: Callable[..., Any], inputs: Iterable[str], outputs: Iterable[str],
+                 memoize: bool = True):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.memoize = memoize
+
+    def execute(self, values: dict) -> dict:
+        result = self.func(**{name: values[name] for name in self.inputs})
+        if len(self.outputs) == 1:
+            return {self.outputs[0]: result}
+        missing = set(self.outputs) - set(result)
+        if missing:
+            raise ValueError(f"Stage '{self.name}' did not produce outputs: {sorted(missing)}")
+        return {name: result[name] for name in self.outputs}
+
+
+def _fingerprint(stage: Stage, values: dict) -> str:
+    payload = json.dumps([stage.name, [values[name] for name in stage.inputs]], sort_keys=True, default=repr)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class StageGraph:
+    """
+    Runs stages as a dependency graph with per-stage memoization.
+
+    Each stage result is cached by a hash of its input values, so a rerun
+    with one changed parameter only recomputes the stages downstream of it.
+    Stages whose inputs are ready run concurrently on a thread pool, each in
+    a copy of the caller's context (so context variables set around run()
+    are visible to the stages).
+
+    A result is not memoized when the stage reports it as degraded, i.e. a
+    local fallback produced while a backend was failing: the next run
+    computes the stage again instead of serving the fallback.
+
+    Args:
+        max_workers: Maximum number of stages running at once.
+        memo_size: Number of cached results kept per stage.
+        fallback_scope: Optional factory of context managers entered around each
+            executing stage; a non-empty value yielded by it marks the result as degraded.
+    """
+    def __init__(self, max_workers: int = 4, memo_size: int = 32,
+                 fallback_scope: Optional[Callable[[], ContextManager[list]]] = None):
+        self.max_workers = max_workers
+        self.memo_size = memo_size
+        self.fallback_scope = fallback_scope
+        self._stages: "OrderedDict[str, Stage]" = OrderedDict()
+        self._producers: dict[str, str] = {}
+        self._memo: dict[str, "OrderedDict[str, dict]"] = {}
+        self._lock = threading.Lock()
+
+    def add_stage(self, name: str, func: Callable[..., Any], inputs: Iterable[str], outputs: Iterable[str],
+                  memoize: bool = True) -> None:
+        """
+        Registers a stage. Output names must be unique across the graph.
+
+        Pass memoize=False for cheap stages whose result depends on state outside
+        their inputs; stages downstream of them are still memoized by their outputs.
+        """
+        if name in self._stages:
+            raise ValueError(f"Stage '{name}' is already registered.")
+        stage = Stage(name, func, inputs, outputs, memoize)
+        for output in stage.outputs:
+            if output in self._producers:
+                raise ValueError(f"Output '{output}' is already produced by stage '{self._producers[output]}'.")
+            self._producers[output] = name
+        self._stages[name] = stage
+        self._memo[name] = OrderedDict()
+
+    @property
+    def stages(self) -> list[str]:
+        return list(self._stages)
+
+    def dependencies(self, name: str) -> set[str]:
+        """Returns the stages that produce inputs of the given stage."""
+        return {self._producers[i] for i in self._stages[name].inputs if i in self._producers}
+
+    def clear_memo(self, stage: Optional[str] = None) -> None:
+        """Drops memoized results for one stage or for all stages."""
+        with self._lock:
+            for name in ([stage] if stage else self._stages):
+                self._memo[name].clear()
+
+    def _validate(self, initial: dict) -> None:
+        for stage in self._stages.values():
+            missing = [i for i in stage.inputs if i not in self._producers and i not in initial]
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' is missing inputs: {missing}")
+
+    def _lookup(self, stage: Stage, key: str) -> Optional[dict]:
+        with self._lock:
+            memo = self._memo[stage.name]
+            if key in memo:
+                memo.move_to_end(key)
+                return memo[key]
+        return None
+
+    def _store(self, stage: Stage, key: str, outputs: dict) -> None:
+        with self._lock:
+            memo = self._memo[stage.name]
+            memo[key] = outputs
+            while len(memo) > self.memo_size:
+                memo.popitem(last=False)
+
+    def _run_stage(self, stage: Stage, values: dict, use_memo: bool,
+                   observer: Optional[Callable[[str], Any]] = None) -> tuple[dict, dict]:
+        key = _fingerprint(stage, values)
+        if use_memo and stage.memoize:
+            cached = self._lookup(stage, key)
+            if cached is not None:
+                return cached, {"cached": True, "seconds": 0.0, "degraded": False}
+        start = time.perf_counter()
+        with observer(stage.name) if observer else nullcontext():
+            with self.fallback_scope() if self.fallback_scope else nullcontext([]) as fallbacks:
+                outputs = stage.execute(values)
+        elapsed = time.perf_counter() - start
+        if stage.memoize and not fallbacks:
+            self._store(stage, key, outputs)
+        return outputs, {"cached": False, "seconds": elapsed, "degraded": bool(fallbacks)}
+
+    def run(self, initial: dict, use_memo: bool = True,
+            observer: Optional[Callable[[str], Any]] = None,
+            on_stage: Optional[Callable[[str, dict, dict], Any]] = None) -> tuple[dict, dict]:
+        """
+        Executes the graph.
+
+        Args:
+            initial: Values for inputs that no stage produces.
+            use_memo: Whether memoized stage results may be reused.
+            observer: Optional factory of context managers, called with the stage
+                name and entered around each stage that actually executes.
+            on_stage: Optional callback, called as on_stage(name, outputs, stage_report) as
+                soon as each stage finishes (memoized ones included). It runs on the calling
+                thread, in completion order, while later stages keep running.
+
+        Returns:
+            A tuple: (all values by name, per-stage report with "cached", "seconds" and "degraded").
+        """
+        self._validate(initial)
+        values = dict(initial)
+        report: dict[str, dict] = {}
+        pending = {name: self.dependencies(name) for name in self._stages}
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                ready = [name for name, deps in pending.items() if not deps - set(report)]
+                for name in ready:
+                    del pending[name]
+                    stage = self._stages[name]
+                    # Snapshot the inputs so concurrent stages never see a dict being written
+                    stage_values = {i: values[i] for i in stage.inputs}
+                    context = contextvars.copy_context()
+                    running[executor.submit(context.run, self._run_stage, stage, stage_values, use_memo, observer)] = name
+                if not running:
+                    raise ValueError(f"Stages {sorted(pending)} have unresolvable (cyclic) dependencies.")
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    outputs, stage_report = future.result()
+                    values.update(outputs)
+                    report[name] = stage_report
+                    if on_stage is not None:
+                        on_stage(name, outputs, stage_report)
+        return values, report
@@ -0,0 +1,217 @@
+# profiling.py
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from typing import Optional
+
+# tracemalloc and the sampler are process-wide, so only one request is profiled at a time
+_active_lock = threading.Lock()
+
+
+class _StackSampler:
+    """
+    Statistical profiler in the style of pyinstrument: a background thread
+    samples the stacks of the threads running pipeline stages every interval.
+
+    Unlike cProfile it sees every worker thread (stages run concurrently) and
+    its overhead does not grow with the number of Python calls.
+    """
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.threads: dict[int, str] = {}
+        self.self_samples: Counter = Counter()
+        self.total_samples: Counter = Counter()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id, stage in list(self.threads.items()):
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self._record(stage, frame)
+
+    def _record(self, stage: str, frame) -> None:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        stack.reverse()
+        self.samples += 1
+        self.self_samples[stack[-1]] += 1
+        for name in set(stack):
+            self.total_samples[name] += 1
+        self.stacks[";".join([stage] + stack)] += 1
+
+
+class ProfileSession:
+    """Collects timings, stack samples and allocations for one request."""
+    def __init__(self, profiler: "RequestProfiler"):
+        self.profiler = profiler
+        self.id = uuid.uuid4().hex[:12]
+        self.stages: dict[str, dict] = {}
+        self.report: Optional[dict] = None
+        self._lock = threading.Lock()
+        self._sampler = _StackSampler(profiler.sample_interval) if profiler.sample_stacks else None
+        self._started_tracemalloc = False
+
+    def start(self) -> None:
+        if self.profiler.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracemalloc = True
+            tracemalloc.reset_peak()
+            self._memory_before = tracemalloc.get_traced_memory()[0]
+        if self._sampler is not None:
+            self._sampler.start()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Wraps one stage execution; records its wall and CPU (thread) time."""
+        thread_id = threading.get_ident()
+        if self._sampler is not None:
+            self._sampler.threads[thread_id] = name
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.thread_time() - cpu_start
+            if self._sampler is not None:
+                self._sampler.threads.pop(thread_id, None)
+            with self._lock:
+                # Time not spent on CPU in the stage's thread is mostly waiting on the model API
+                self.stages[name] = {"wall_seconds": round(wall, 4), "cpu_seconds": round(cpu, 4),
+                                     "wait_seconds": round(max(wall - cpu, 0.0), 4)}
+
+    def stop(self) -> dict:
+        wall = time.perf_counter() - self._wall_start
+        cpu = time.process_time() - self._cpu_start
+        report = {
+            "id": self.id,
+            "wall_seconds": round(wall, 4),
+            "cpu_seconds": round(cpu, 4),
+            "stages": dict(self.stages),
+        }
+        if self.profiler.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            ))
+            report["memory"] = {
+                "allocated_kb": round((current - self._memory_before) / 1024, 1),
+                "peak_kb": round(peak / 1024, 1),
+                "top_allocations": [
+                    {"location": f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+                     "kb": round(stat.size / 1024, 1), "count": stat.count}
+                    for stat in snapshot.statistics("lineno")[:self.profiler.top_n]
+                ],
+            }
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+        if self._sampler is not None:
+            self._sampler.stop()
+            samples = max(self._sampler.samples, 1)
+            report["hotspots"] = [
+                {"function": name, "self_pct": round(100 * self._sampler.self_samples[name] / samples, 1),
+                 "total_pct": round(100 * count / samples, 1)}
+                for name, count in self._sampler.self_samples.most_common(self.profiler.top_n)
+            ]
+            report["samples"] = self._sampler.samples
+        self.report = report
+        if self.profiler.dump_dir:
+            self.dump(self.profiler.dump_dir)
+        return report
+
+    def dump(self, directory: str) -> str:
+        """
+        Writes the report as JSON plus the sampled stacks in folded format
+        (one "stage;frame;frame count" line per stack, readable by flamegraph tools).
+
+        Returns:
+            The path of the JSON report.
+        """
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f"profile-{time.strftime('%Y%m%d-%H%M%S')}-{self.id}")
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump(self.report, f, indent=2)
+        if self._sampler is not None and self._sampler.stacks:
+            with open(base + ".folded", "w", encoding="utf-8") as f:
+                for stack, count in self._sampler.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+        return base + ".json"
+
+
+class RequestProfiler:
+    """
+    Opt-in profiling for LinkedInPostGenerator requests.
+
+    A profiled request gets a "profile" entry in its result with wall vs CPU
+    time per stage (the difference is mostly model latency), allocations and
+    peak memory from tracemalloc and the hottest functions from a sampling
+    profiler. Profiling is process-wide, so concurrent requests are not
+    profiled while one already is.
+
+    Args:
+        sample_rate: Fraction of requests to profile (0-1).
+        sample_stacks: Run the stack sampler.
+        trace_memory: Trace allocations with tracemalloc (slows allocation-heavy code).
+        sample_interval: Seconds between stack samples.
+        top_n: Number of hotspots and allocation sites to report.
+        dump_dir: If set, every report is also written to this directory.
+    """
+    def __init__(self, sample_rate: float = 1.0, sample_stacks: bool = True, trace_memory: bool = True,
+                 sample_interval: float = 0.005, top_n: int = 10, dump_dir: Optional[str] = None):
+        self.sample_rate = sample_rate
+        self.sample_stacks = sample_stacks
+        self.trace_memory = trace_memory
+        self.sample_interval = sample_interval
+        self.top_n = top_n
+        self.dump_dir = dump_dir
+
+    def should_profile(self, force: Optional[bool] = None) -> bool:
+        """Decides whether to profile a request; force overrides sampling."""
+        if force is not None:
+            return force
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    @contextmanager
+    def session(self, force: Optional[bool] = None):
+        """
+        Profiles the enclosed request, yielding a ProfileSession (or None if the
+        request is not sampled or another request is already being profiled).
+        """
+        if not self.should_profile(force) or not _active_lock.acquire(blocking=False):
+            yield None
+            return
+        try:
+            session = ProfileSession(self)
+            session.start()
+            try:
+                yield session
+            finally:
+                session.stop()
+        finally:
+            _active_lock.release()
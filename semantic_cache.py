@@ -0,0 +1,162 @@
+# semantic_cache.py
+import copy
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from sub_agents.text_vectorizer import HashingVectorizer, cosine
+
+NUMBER_PATTERN = re.compile(r"\d+(?:[.,]\d+)*")
+EVICTION_POLICIES = ("lru", "lfu", "fifo")
+
+
+class _CacheEntry:
+    __slots__ = ("topic", "params", "numbers", "vector", "result", "created_at", "hits")
+
+    def __init__(self, topic, params, numbers, vector, result):
+        self.topic = topic
+        self.params = params
+        self.numbers = numbers
+        self.vector = vector
+        self.result = result
+        self.created_at = time.monotonic()
+        self.hits = 0
+
+
+class SemanticCache:
+    """
+    Reuses generation results for near-identical topics.
+
+    Topics are embedded with a local HashingVectorizer and compared by cosine
+    similarity. Only entries generated with exactly the same parameters (tone,
+    length, audience, ...) are considered, and topics must mention the same
+    numbers, so "results for 2024" never answers "results for 2025".
+
+    Args:
+        threshold: Minimum cosine similarity (0-1) for a hit.
+        capacity: Maximum number of cached results.
+        eviction: "lru", "lfu" or "fifo".
+        ttl_seconds: Optional lifetime of an entry.
+    """
+    def __init__(self, threshold: float = 0.85, capacity: int = 512, eviction: str = "lru",
+                 ttl_seconds: Optional[float] = None, vectorizer: Optional[HashingVectorizer] = None):
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError(f"eviction must be one of {EVICTION_POLICIES}.")
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1.")
+        self.threshold = threshold
+        self.capacity = capacity
+        self.eviction = eviction
+        self.ttl_seconds = ttl_seconds
+        self.vectorizer = vectorizer or HashingVectorizer()
+        self._entries: "OrderedDict[int, _CacheEntry]" = OrderedDict()
+        self._partitions: dict[tuple, set[int]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _partition_key(params: dict) -> tuple:
+        return tuple(sorted((k, str(v).lower() if isinstance(v, str) else v) for k, v in params.items()))
+
+    def _expired(self, entry: _CacheEntry, now: float) -> bool:
+        return self.ttl_seconds is not None and now - entry.created_at > self.ttl_seconds
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        partition = self._partitions[entry.params]
+        partition.discard(entry_id)
+        if not partition:
+            del self._partitions[entry.params]
+
+    def _evict(self) -> None:
+        if self.eviction == "lfu":
+            victim = min(self._entries, key=lambda entry_id: self._entries[entry_id].hits)
+        else:
+            # The OrderedDict is kept in insertion order (fifo) or recency order (lru)
+            victim = next(iter(self._entries))
+        self._remove(victim)
+
+    def lookup(self, topic: str, **params: Any) -> Optional[dict]:
+        """
+        Finds a cached result for a similar topic generated with the same parameters.
+
+        Args:
+            topic: The post topic.
+            **params: The remaining generation parameters.
+
+        Returns:
+            A copy of the cached result with a "semantic_cache" entry describing the match, or None.
+        """
+        vector = self.vectorizer.transform(topic)
+        numbers = frozenset(NUMBER_PATTERN.findall(topic))
+        key = self._partition_key(params)
+        now = time.monotonic()
+
+        with self._lock:
+            best_id, best_score = None, self.threshold
+            for entry_id in list(self._partitions.get(key, ())):
+                entry = self._entries[entry_id]
+                if self._expired(entry, now):
+                    self._remove(entry_id)
+                    continue
+                if entry.numbers != numbers:
+                    continue
+                score = cosine(vector, entry.vector)
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None:
+                self.misses += 1
+                return None
+
+            entry = self._entries[best_id]
+            entry.hits += 1
+            self.hits += 1
+            if self.eviction == "lru":
+                self._entries.move_to_end(best_id)
+            result = copy.deepcopy(entry.result)
+
+        result["semantic_cache"] = {"similarity": best_score, "matched_topic": entry.topic}
+        return result
+
+    def store(self, topic: str, result: dict, **params: Any) -> None:
+        """Caches a result for the topic and parameters."""
+        entry = _CacheEntry(
+            topic,
+            self._partition_key(params),
+            frozenset(NUMBER_PATTERN.findall(topic)),
+            self.vectorizer.transform(topic),
+            copy.deepcopy(result),
+        )
+        with self._lock:
+            while len(self._entries) >= self.capacity:
+                self._evict()
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = entry
+            self._partitions.setdefault(entry.params, set()).add(entry_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._partitions.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters and current size."""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "capacity": self.capacity}
+
+
+# Example usage (for testing)
+if __name__ == '__main__':
+    cache = SemanticCache(threshold=0.85, capacity=2)
+    cache.store("Launch of our new AI support tool", {"final_post": "..."}, tone="Professional")
+    print(f"Similar topic: {cache.lookup('Launching our new AI-powered support tool', tone='Professional')}")
+    print(f"Different tone: {cache.lookup('Launching our new AI-powered support tool', tone='Celebratory')}")
+    print(f"Stats: {cache.stats()}")
@@ -1,26 +1,50 @@
 # sub_agents/character_formatter.py
-import google.generativeai as genai
 import os
-from dotenv import load_dotenv, find_dotenv
+from typing import Optional
+
+from sub_agents.structured_output import StructuredOutputError, json_generation_config, parse_structured
+from sub_agents.prompting import generate_about_post, with_system_instruction
+from sub_agents.runtime import get_genai, load_env
+
+TRIM_SCHEMA = {
+    "type": "object",
+    "properties": {"text": {"type": "string"}},
+    "required": ["text"],
+}
+
+# LinkedIn character limits per surface
+SURFACE_LIMITS = {"post": 3000, "comment": 1250, "headline": 220}
+
+SYSTEM_INSTRUCTION = """
+You condense LinkedIn posts to fit a character limit.
+Summarize and rewrite the post within the limit, making sure you do not miss out any important information.
+Return only the rewritten text as "text".
+"""
 
-load_dotenv(find_dotenv())
 
 class CharacterFormatter:
     """
     Ensures the post is within LinkedIn character limits and optimizes formatting.
     LinkedIn limits: Post body ~3000 chars, Comments ~1250 chars, Headlines ~220 chars.
-    We focus on the main post body limit (~3000).
+    max_chars is the post body limit; fit_surface() fits text to any of the three.
     """
-    def __init__(self, api_key=None, max_chars: int = 3000):
+    def __init__(self, api_key=None, max_chars: int = 3000, model=None):
         self.max_chars = max_chars
         # Initialize the Generative AI model
-        if api_key is None:
-            api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key:
-            raise ValueError("GOOGLE_API_KEY not found. Please set it or pass it.")
-        genai.configure(api_key=api_key)
-        llm = os.getenv("MODEL_NAME")
-        self.model = genai.GenerativeModel(llm)
+        # A preconfigured model (e.g. a routed one) can be injected instead
+        if model is None:
+            load_env()
+            genai = get_genai()
+            if api_key is None:
+                api_key = os.getenv("GOOGLE_API_KEY")
+            if not api_key:
+                raise ValueError("GOOGLE_API_KEY not found. Please set it or pass it.")
+            genai.configure(api_key=api_key)
+            llm = os.getenv("MODEL_NAME")
+            model = genai.GenerativeModel(llm, system_instruction=SYSTEM_INSTRUCTION)
+        else:
+            model = with_system_instruction(model, SYSTEM_INSTRUCTION)
+        self.model = model
         
 
     def check_length(self, text: str) -> (bool, int):
@@ -39,7 +63,8 @@ class CharacterFormatter:
     def trim_text(self, text: str) -> str:
         """
         Trims the text to the maximum character limit if necessary.
-        Attempts to trim gracefully by ending near the last word.
+        Asks the model for a condensed rewrite and falls back to a local
+        sentence/word-boundary trim if the model is unavailable.
 
         Args:
             text: The post content.
@@ -47,26 +72,70 @@ class CharacterFormatter:
         Returns:
             The potentially trimmed text.
         """
-        if len(text) > self.max_chars:
-            prompt = f"""
-            Summarize and rewrite the following text in a {self.max_chars} charachters.
-            make sure you do not miss out any important information while summarizing.
-            make sure you only the converted text content in the output and no additional text.
-
-            Original Text:
-            {text}
-            """
-            try:
-                response = self.model.generate_content(prompt)
-                # Accessing text from Content object response
-                if response and response.candidates and response.candidates[0].content and response.candidates[0].content.parts:
-                    return "".join([part.text for part in response.candidates[0].content.parts])
-                else:
-                    print(f"Warning: LLM response empty for tone adjustment. Returning original text.")
-                    return text
-            except Exception as e:
-                print(f"Error : {e}. Returning original text.")
-                return text
+        if len(text) <= self.max_chars:
+            return text
+
+        task = f"Rewrite the post in at most {self.max_chars} characters."
+        # Roughly 4 characters per token, with headroom for JSON escaping and thinking models
+        max_output_tokens = self.max_chars // 3 + 256
+        try:
+            response = generate_about_post(
+                self.model, task, text,
+                generation_config=json_generation_config(TRIM_SCHEMA, max_output_tokens)
+            )
+            trimmed = parse_structured(response, TRIM_SCHEMA)["text"].strip()
+            if trimmed and len(trimmed) <= self.max_chars:
+                return trimmed
+            print("Warning: LLM trim is empty or still exceeds the limit. Trimming locally.")
+            return self.trim_locally(trimmed or text)
+        except StructuredOutputError as e:
+            print(f"Warning: Unusable trim response ({e}). Trimming locally.")
+            return self.trim_locally(text)
+        except Exception as e:
+            print(f"Error : {e}. Trimming locally.")
+            return self.trim_locally(text)
+
+    def trim_locally(self, text: str, max_chars: Optional[int] = None) -> str:
+        """
+        Trims text without a model call, preferring to end at a sentence or
+        paragraph boundary and otherwise at the last whole word.
+
+        Args:
+            text: The post content.
+            max_chars: Limit to trim to (defaults to self.max_chars).
+
+        Returns:
+            Text no longer than the limit.
+        """
+        max_chars = self.max_chars if max_chars is None else max_chars
+        if len(text) <= max_chars:
+            return text
+        window = text[:max_chars]
+        # Only accept a boundary that keeps most of the allowed length
+        boundary = max(window.rfind(". "), window.rfind("! "), window.rfind("? "), window.rfind("\n"))
+        if boundary >= max_chars * 0.6:
+            return window[:boundary + 1].rstrip()
+        window = text[:max_chars - 1]
+        space = window.rfind(" ")
+        if space > 0:
+            window = window[:space]
+        return window.rstrip(" ,;:-") + "…"
+
+    def fit_surface(self, text: str, surface: str) -> str:
+        """
+        Formats text and trims it locally to a surface's limit (see SURFACE_LIMITS).
+
+        Args:
+            text: The text for the surface.
+            surface: "post", "comment" or "headline".
+
+        Returns:
+            Text no longer than the surface's limit.
+        """
+        if surface not in SURFACE_LIMITS:
+            raise ValueError(f"Unknown surface '{surface}'. Valid surfaces: {tuple(SURFACE_LIMITS)}")
+        limit = self.max_chars if surface == "post" else SURFACE_LIMITS[surface]
+        return self.trim_locally(self.format_text(text), limit)
 
     def format_text(self, text: str) -> str:
         """
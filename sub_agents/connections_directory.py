@@ -0,0 +1,206 @@
+# sub_agents/connections_directory.py
+import csv
+import json
+import math
+import os
+from collections import Counter, defaultdict
+from dataclasses import asdict, dataclass, field
+from typing import Iterable
+
+from sub_agents.text_vectorizer import stem, tokenize
+
+# Draft words and keywords shorter than this are not matched by prefix
+MIN_PREFIX_LENGTH = 4
+# Weight of a keyword reached by prefix (e.g. "analytic" -> "analytics") relative to an exact match
+PREFIX_MATCH_WEIGHT = 0.5
+
+
+@dataclass
+class Connection:
+    """A person that can be tagged in a post."""
+    name: str
+    handle: str = ""
+    urn: str = ""
+    expertise: list[str] = field(default_factory=list)
+
+    @property
+    def mention(self) -> str:
+        """The tag as written in a post, e.g. "@jane-doe" (or "@Jane_Doe" without a handle)."""
+        return "@" + (self.handle.lstrip("@") or self.name.replace(" ", "_"))
+
+
+class _PrefixTrie:
+    """Maps words to values; finds the values stored under a prefix or along a word."""
+    def __init__(self):
+        self._root: dict = {}
+
+    def insert(self, word: str, value) -> None:
+        node = self._root
+        for char in word:
+            node = node.setdefault(char, {})
+        node.setdefault("", set()).add(value)
+
+    def search(self, prefix: str) -> set:
+        node = self._root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return set()
+        found, stack = set(), [node]
+        while stack:
+            node = stack.pop()
+            for char, child in node.items():
+                if char == "":
+                    found.update(child)
+                else:
+                    stack.append(child)
+        return found
+
+    def along(self, word: str, min_length: int = 1) -> set:
+        """Returns the values of stored words that are prefixes of word (and at least min_length long)."""
+        node, found = self._root, set()
+        for depth, char in enumerate(word, 1):
+            node = node.get(char)
+            if node is None:
+                break
+            if depth >= min_length and "" in node:
+                found.update(node[""])
+        return found
+
+
+class ConnectionsDirectory:
+    """
+    Local directory of connections for tag suggestions, queried without a model call.
+
+    Expertise keywords are stemmed and stored in an inverted index
+    (keyword -> {connection: idf weight}), so matching a draft only touches
+    the keywords it contains. A prefix trie over the keywords also matches
+    draft words to keywords they start or extend ("cyber" -> "cybersecurity",
+    "businesses" -> "business"), and a second trie over names and handles
+    backs complete() for autocompletion.
+
+    Scores are the idf-weighted share of a connection's expertise that the
+    draft covers (0.0 - 1.0), usable as a confidence.
+    """
+    def __init__(self, connections: Iterable[Connection] = ()):
+        self._connections: list[Connection] = []
+        self._terms: list[Counter] = []
+        self._doc_freq: Counter = Counter()
+        self._inverted: dict[str, dict[int, float]] = {}
+        self._norms: list[float] = []
+        self._keyword_trie = _PrefixTrie()
+        self._name_trie = _PrefixTrie()
+        self._dirty = False
+        # Bumped on every change, so callers caching match results can tell when they are stale
+        self.version = 0
+        for connection in connections:
+            self.add(connection)
+
+    def __len__(self) -> int:
+        return len(self._connections)
+
+    @staticmethod
+    def _expertise_terms(expertise: Iterable[str]) -> Counter:
+        terms = Counter()
+        for keyword in expertise:
+            terms.update(stem(token) for token in tokenize(keyword))
+        return terms
+
+    def add(self, connection: Connection) -> None:
+        """Adds a connection to the directory."""
+        position = len(self._connections)
+        terms = self._expertise_terms(connection.expertise)
+        self._connections.append(connection)
+        self._terms.append(terms)
+        self._doc_freq.update(terms.keys())
+        for term in terms:
+            self._keyword_trie.insert(term, term)
+        for token in tokenize(f"{connection.name} {connection.handle}", drop_stopwords=False):
+            self._name_trie.insert(token, position)
+        self._dirty = True
+        self.version += 1
+
+    def _build(self) -> None:
+        total = len(self._connections)
+        idf = {term: math.log((1 + total) / (1 + df)) + 1.0 for term, df in self._doc_freq.items()}
+        inverted: dict[str, dict[int, float]] = defaultdict(dict)
+        self._norms = []
+        for position, terms in enumerate(self._terms):
+            for term in terms:
+                inverted[term][position] = idf[term]
+            self._norms.append(sum(idf[term] for term in terms) or 1.0)
+        self._inverted = dict(inverted)
+        self._dirty = False
+
+    def match(self, text: str, top_k: int = 5) -> list[tuple[Connection, float]]:
+        """
+        Ranks connections by how much of their expertise the text mentions.
+
+        Args:
+            text: The post content.
+            top_k: Maximum number of connections to return.
+
+        Returns:
+            A list of (connection, score) tuples, best first.
+        """
+        if self._dirty:
+            self._build()
+        # Per keyword, the strongest way the draft reaches it (exact beats prefix)
+        reached: dict[str, float] = {}
+        for word in set(tokenize(text)):
+            term = stem(word)
+            if term in self._inverted:
+                reached[term] = 1.0
+            if len(word) >= MIN_PREFIX_LENGTH:
+                prefixed = self._keyword_trie.search(term) | self._keyword_trie.along(word, MIN_PREFIX_LENGTH)
+                for keyword in prefixed:
+                    reached.setdefault(keyword, PREFIX_MATCH_WEIGHT)
+        scores: dict[int, float] = defaultdict(float)
+        for keyword, strength in reached.items():
+            for position, weight in self._inverted[keyword].items():
+                scores[position] += strength * weight
+        ranked = sorted(scores.items(), key=lambda item: item[1] / self._norms[item[0]], reverse=True)[:top_k]
+        return [(self._connections[position], round(score / self._norms[position], 4)) for position, score in ranked]
+
+    def complete(self, prefix: str, limit: int = 10) -> list[Connection]:
+        """Returns connections whose name or handle has a word starting with prefix."""
+        words = tokenize(prefix, drop_stopwords=False)
+        if not words:
+            return []
+        positions = set.intersection(*(self._name_trie.search(word) for word in words))
+        return [self._connections[position] for position in sorted(positions)[:limit]]
+
+    @classmethod
+    def load(cls, path: str) -> "ConnectionsDirectory":
+        """
+        Loads connections from a CSV or JSON file.
+
+        CSV files need a "name" column and may have "handle", "urn" and
+        "expertise" columns, with expertise keywords separated by ";".
+        JSON files hold a list of objects with the same fields, expertise as a list.
+        """
+        with open(path, encoding="utf-8", newline="") as f:
+            if os.path.splitext(path)[1].lower() == ".json":
+                rows = json.load(f)
+            else:
+                rows = [dict(row, expertise=[k.strip() for k in (row.get("expertise") or "").split(";") if k.strip()])
+                        for row in csv.DictReader(f)]
+        return cls(Connection(name=row["name"], handle=row.get("handle") or "", urn=row.get("urn") or "",
+                              expertise=list(row.get("expertise") or [])) for row in rows)
+
+    def save(self, path: str) -> None:
+        """Writes the connections to a JSON file readable by load()."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([asdict(connection) for connection in self._connections], f, indent=2)
+
+
+# Example usage (for testing)
+if __name__ == '__main__':
+    directory = ConnectionsDirectory([
+        Connection("Jane Doe", "jane-doe", "urn:li:person:123", ["machine learning", "analytics", "AI"]),
+        Connection("Omar Haddad", "omar-haddad", "urn:li:person:456", ["small business", "retail", "marketing"]),
+        Connection("Lena Fischer", "lena-fischer", "urn:li:person:789", ["cybersecurity", "cloud"]),
+    ])
+    draft = "Excited to share our new AI-powered analytics platform for small businesses. It simplifies data insights."
+    print(f"Matches: {[(c.mention, score) for c, score in directory.match(draft, top_k=3)]}")
+    print(f"Complete 'le': {[c.name for c in directory.complete('le')]}")
@@ -1,27 +1,96 @@
 # sub_agents/content_validator.py
 
-import google.generativeai as genai
 import os
 import re
-from dotenv import load_dotenv, find_dotenv
 
-load_dotenv(find_dotenv())
+from sub_agents.structured_output import (StructuredOutputError, ValidationIssue, json_generation_config,
+                                          parse_structured)
+from sub_agents.prompting import generate_about_post, with_system_instruction
+from sub_agents.runtime import get_genai, load_env
+
+
+ISSUE_CATEGORIES = ["grammar", "spelling", "tone", "professionalism", "sensitivity"]
+
+VALIDATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "issues": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "category": {"type": "string", "enum": ISSUE_CATEGORIES},
+                    "message": {"type": "string"},
+                    "quote": {"type": "string"},
+                },
+                "required": ["category", "message"],
+            },
+        },
+    },
+    "required": ["issues"],
+}
+
+SYSTEM_INSTRUCTION = """
+You review LinkedIn post drafts for potential issues:
+1.  **Grammar and Spelling:** Identify any clear errors.
+2.  **Tone Consistency:** Does the text maintain the expected tone throughout? Point out sections that deviate.
+3.  **Professionalism/Sensitivity:** Are there any phrases, words, or concepts that might be considered unprofessional, overly casual, or sensitive for a public LinkedIn audience?
+
+Report each issue with a category, a concise message, and the exact offending text as "quote".
+Return an empty issues list if no issues are found.
+"""
+
+
+def locate_quote(text: str, quote: str) -> tuple[int, int]:
+    """
+    Finds a quoted span in the text, tolerating case and whitespace differences.
+
+    Returns:
+        (start, end) character offsets, or (-1, -1) if the quote is not found.
+    """
+    quote = quote.strip().strip('"').strip()
+    if not quote:
+        return -1, -1
+    start = text.find(quote)
+    if start >= 0:
+        return start, start + len(quote)
+    pattern = r"\s+".join(re.escape(word) for word in quote.split())
+    match = re.search(pattern, text, re.IGNORECASE)
+    if match:
+        return match.start(), match.end()
+    return -1, -1
+
+
+RULES = [
+    (re.compile(r'\b(lol|lmao|brb)\b', re.IGNORECASE), "Avoid informal abbreviations like 'lol', 'lmao', 'brb'."),
+    (re.compile(r'!!!|\?\?\?|!!!\?\?\?'), "Excessive use of exclamation/question marks can appear unprofessional."),
+]
+
 
 class ContentValidator:
     """
     Checks for grammar, spelling, tone consistency, and potentially sensitive language.
     Leverages LLM for contextual checks (like tone consistency) and basic rules/regex for others.
     """
-    def __init__(self, api_key=None):
-        if api_key is None:
-            api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key:
-            raise ValueError("GOOGLE_API_KEY not found. Please set it or pass it.")
-        genai.configure(api_key=api_key)
-        llm = os.getenv("MODEL_NAME")
-        self.model = genai.GenerativeModel(llm)
-
-    def validate_post(self, text: str, expected_tone: str) -> list[str]:
+    def __init__(self, api_key=None, model=None):
+        # A preconfigured model (e.g. a routed one) can be injected instead
+        if model is None:
+            load_env()
+            genai = get_genai()
+            if api_key is None:
+                api_key = os.getenv("GOOGLE_API_KEY")
+            if not api_key:
+                raise ValueError("GOOGLE_API_KEY not found. Please set it or pass it.")
+            genai.configure(api_key=api_key)
+            llm = os.getenv("MODEL_NAME")
+            model = genai.GenerativeModel(llm, system_instruction=SYSTEM_INSTRUCTION)
+        else:
+            model = with_system_instruction(model, SYSTEM_INSTRUCTION)
+        self.model = model
+        # Issues are short one-liners; headroom is left for models that think before answering
+        self.max_output_tokens = 1024
+
+    def check_post(self, text: str, expected_tone: str) -> list[ValidationIssue]:
         """
         Performs various validation checks on the post content.
 
@@ -30,56 +99,64 @@ class ContentValidator:
             expected_tone: The tone that was intended for the post.
 
         Returns:
-            A list of issues found (empty list if no issues).
+            A list of ValidationIssue objects (empty list if no issues).
         """
-        issues = []
-
         # --- Basic Checks (using Python/regex) ---
-        # Simple placeholder for basic checks - real ones would use libraries like NLTK, SpaCy, or regex patterns
-        if re.search(r'\b(lol|lmao|brb)\b', text, re.IGNORECASE):
-             issues.append("Avoid informal abbreviations like 'lol', 'lmao', 'brb'.")
-        if re.search(r'!!!|\?\?\?|!!!\?\?\?', text):
-             issues.append("Excessive use of exclamation/question marks can appear unprofessional.")
-        # Add checks for repetitive phrases, all caps sections (unless intentional), etc.
+        issues = self.rule_issues(text)
 
         # --- LLM-based Checks (for grammar, spelling, tone, sensitivity) ---
-        prompt = f"""
-        Analyze the following LinkedIn post draft for potential issues:
-        1.  **Grammar and Spelling:** Identify any clear errors.
-        2.  **Tone Consistency:** Does the text maintain a {expected_tone} tone throughout? Point out sections that deviate.
-        3.  **Professionalism/Sensitivity:** Are there any phrases, words, or concepts that might be considered unprofessional, overly casual, or sensitive for a public LinkedIn audience?
-
-        List any identified issues clearly and concisely. If no issues are found, respond with "No issues found.".
-
-        Post Content:
-        {text}
-
-        Analysis:
-        """
+        task = f"Analyze the LinkedIn post draft for potential issues. The expected tone is: {expected_tone}."
         try:
-            response = self.model.generate_content(prompt)
-            if response and response.candidates and response.candidates[0].content and response.candidates[0].content.parts:
-                 analysis_text = "".join([part.text for part in response.candidates[0].content.parts]).strip()
-                 if "no issues found" in analysis_text.lower():
-                     pass # No LLM issues
-                 else:
-                     # Split the analysis into potential issues
-                     llm_issues = [line.strip() for line in analysis_text.split('\n') if line.strip()]
-                     issues.extend(llm_issues)
-            else:
-                print("Warning: LLM response empty for validation.")
-                # Cannot perform LLM-based checks without response
-                if not issues: # If no rule-based issues found either
-                    issues.append("Validation check could not be completed.")
-
+            response = generate_about_post(
+                self.model, task, text,
+                generation_config=json_generation_config(VALIDATION_SCHEMA, self.max_output_tokens)
+            )
+            result = parse_structured(response, VALIDATION_SCHEMA)
+            for item in result["issues"]:
+                if not item["message"].strip():
+                    continue
+                quote = item.get("quote", "").strip()
+                start, end = locate_quote(text, quote)
+                issues.append(ValidationIssue(item["category"], item["message"].strip(), quote, start, end))
+        except StructuredOutputError as e:
+            print(f"Warning: Unusable validation response ({e}).")
+            # Cannot perform LLM-based checks without a usable response
+            if not issues: # If no rule-based issues found either
+                issues.append(ValidationIssue("validation", "Validation check could not be completed."))
         except Exception as e:
             print(f"Error during LLM validation: {e}.")
             if not issues: # If no rule-based issues found either
-                 issues.append("Validation check could not be completed due to an error.")
+                 issues.append(ValidationIssue("validation", "Validation check could not be completed due to an error."))
 
+        return issues
 
+    def rule_issues(self, text: str) -> list[ValidationIssue]:
+        """
+        Runs the local rule checks only (no model call), anchoring each issue to its first match.
+        Cheap enough to re-check repaired sentences.
+        """
+        # Simple placeholder for basic checks - real ones would use libraries like NLTK, SpaCy, or regex patterns
+        # Add checks for repetitive phrases, all caps sections (unless intentional), etc.
+        issues = []
+        for pattern, message in RULES:
+            match = pattern.search(text)
+            if match:
+                issues.append(ValidationIssue("professionalism", message, match.group(0), match.start(), match.end()))
         return issues
 
+    def validate_post(self, text: str, expected_tone: str) -> list[str]:
+        """
+        Performs various validation checks on the post content.
+
+        Args:
+            text: The post content.
+            expected_tone: The tone that was intended for the post.
+
+        Returns:
+            A list of issues found, as display strings (empty list if no issues).
+        """
+        return [str(issue) for issue in self.check_post(text, expected_tone)]
+
 # Example usage (for testing)
 if __name__ == '__main__':
     validator = ContentValidator()
@@ -0,0 +1,155 @@
+# sub_agents/duplicate_detector.py
+import hashlib
+import json
+import random
+from array import array
+from collections import OrderedDict, defaultdict
+from typing import Optional
+
+from sub_agents.text_vectorizer import tokenize
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+
+class DuplicateDetector:
+    """
+    Flags near-duplicate posts using MinHash signatures and an LSH band index.
+
+    A post is reduced to word shingles, and each shingle set to a fixed-size
+    MinHash signature whose agreement rate estimates Jaccard similarity. The
+    signature is split into bands that are hashed into buckets, so a lookup
+    only compares against posts sharing at least one bucket instead of the
+    whole index. This keeps lookups well under a millisecond at 100k+ posts.
+    """
+    def __init__(self, threshold: float = 0.7, num_perm: int = 64, bands: int = 16,
+                 shingle_size: int = 3, max_posts: Optional[int] = None, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands.")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.max_posts = max_posts
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME)) for _ in range(num_perm)]
+        self._signatures: "OrderedDict[str, array]" = OrderedDict()
+        self._buckets: dict[tuple[int, tuple], set[str]] = defaultdict(set)
+
+    def _shingles(self, text: str) -> set[int]:
+        tokens = tokenize(text, drop_stopwords=False)
+        size = min(self.shingle_size, len(tokens)) or 1
+        grams = {" ".join(tokens[i:i + size]) for i in range(max(len(tokens) - size + 1, 1))}
+        return {int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=4).digest(), "little") for g in grams}
+
+    def signature(self, text: str) -> array:
+        """Computes the MinHash signature of the text."""
+        shingles = self._shingles(text)
+        if not shingles:
+            return array("Q", [MAX_HASH] * self.num_perm)
+        return array("Q", [min(((a * s + b) % MERSENNE_PRIME) & MAX_HASH for s in shingles) for a, b in self._perms])
+
+    def _band_keys(self, signature: array):
+        for band in range(self.bands):
+            start = band * self.rows
+            yield band, tuple(signature[start:start + self.rows])
+
+    @staticmethod
+    def similarity(sig_a: array, sig_b: array) -> float:
+        """Estimates Jaccard similarity from two signatures."""
+        return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+    def add(self, post_id: str, text: Optional[str] = None, signature: Optional[array] = None) -> None:
+        """
+        Indexes a post so later drafts are checked against it.
+
+        Args:
+            post_id: Unique identifier of the post.
+            text: The post content (ignored if a signature is given).
+            signature: A precomputed signature, e.g. from find_duplicates' caller.
+        """
+        if signature is None:
+            signature = self.signature(text or "")
+        if post_id in self._signatures:
+            self.remove(post_id)
+        self._signatures[post_id] = signature
+        for key in self._band_keys(signature):
+            self._buckets[key].add(post_id)
+
+        if self.max_posts is not None:
+            while len(self._signatures) > self.max_posts:
+                self.remove(next(iter(self._signatures)))
+
+    def remove(self, post_id: str) -> None:
+        """Removes a post from the index."""
+        signature = self._signatures.pop(post_id, None)
+        if signature is None:
+            return
+        for key in self._band_keys(signature):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(post_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def find_duplicates(self, text: Optional[str] = None, signature: Optional[array] = None) -> list[tuple[str, float]]:
+        """
+        Finds indexed posts that are near-duplicates of the text.
+
+        Args:
+            text: The draft content.
+            signature: A precomputed signature for the draft.
+
+        Returns:
+            A list of (post_id, estimated_similarity) tuples at or above the threshold, most similar first.
+        """
+        if signature is None:
+            signature = self.signature(text or "")
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates.update(self._buckets.get(key, ()))
+
+        matches = []
+        for post_id in candidates:
+            score = self.similarity(signature, self._signatures[post_id])
+            if score >= self.threshold:
+                matches.append((post_id, score))
+        return sorted(matches, key=lambda item: item[1], reverse=True)
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def save(self, path: str) -> None:
+        """Persists signatures to a JSON file. Buckets are rebuilt on load."""
+        data = {
+            "threshold": self.threshold,
+            "num_perm": self.num_perm,
+            "bands": self.bands,
+            "shingle_size": self.shingle_size,
+            "max_posts": self.max_posts,
+            "signatures": {post_id: list(sig) for post_id, sig in self._signatures.items()},
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+    @classmethod
+    def load(cls, path: str) -> "DuplicateDetector":
+        """Loads a detector previously written with save()."""
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        signatures = data.pop("signatures")
+        detector = cls(**data)
+        for post_id, sig in signatures.items():
+            detector.add(post_id, signature=array("Q", sig))
+        return detector
+
+
+# Example usage (for testing)
+if __name__ == '__main__':
+    detector = DuplicateDetector()
+    detector.add("launch-1", "We are thrilled to announce the launch of our new AI-powered customer support tool. It answers questions instantly and learns from every conversation.")
+    near_copy = "We are thrilled to announce the launch of our new AI powered customer support tool! It answers questions instantly and learns from every single conversation."
+    unrelated = "Our team just reached 1 million users on our platform. Thank you to everyone who believed in us."
+    print(f"Near copy matches: {detector.find_duplicates(near_copy)}")
+    print(f"Unrelated matches: {detector.find_duplicates(unrelated)}")
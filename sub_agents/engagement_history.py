@@ -0,0 +1,215 @@
+# sub_agents/engagement_history.py
+import csv
+import os
+from array import array
+from datetime import datetime, timezone
+from typing import Iterable, Optional, Union
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+HOURS_PER_DAY = 24
+SLOTS_PER_WEEK = len(DAYS) * HOURS_PER_DAY
+ALL_AUDIENCES = "all"
+
+
+class EngagementHistory:
+    """
+    Aggregates exported post-performance history into a day-of-week x hour
+    engagement matrix per audience.
+
+    Each audience keeps three flat 168-slot arrays (impressions, reactions and
+    post counts), so new rows are folded in with constant work instead of
+    rescanning history. Ranked windows are cached per audience and only
+    rebuilt after that audience receives new rows.
+
+    Expected columns: timestamp, audience, impressions, reactions.
+    """
+    def __init__(self, prior_impressions: float = 100.0, min_posts: int = 1):
+        # Slots with few impressions are shrunk towards the audience average
+        # so a single lucky post does not dominate the ranking.
+        self.prior_impressions = prior_impressions
+        self.min_posts = min_posts
+        self._impressions: dict[str, array] = {}
+        self._reactions: dict[str, array] = {}
+        self._posts: dict[str, array] = {}
+        self._ranked: dict[tuple[str, int], list[tuple[float, int]]] = {}
+
+    @staticmethod
+    def _normalize_audience(audience: Optional[str]) -> str:
+        return (audience or "general").strip().lower()
+
+    @staticmethod
+    def _parse_timestamp(value: Union[str, int, float, datetime]) -> datetime:
+        if isinstance(value, datetime):
+            return value
+        if isinstance(value, (int, float)):
+            return datetime.fromtimestamp(value, tz=timezone.utc)
+        text = str(value).strip()
+        if text.endswith("Z"):
+            text = text[:-1] + "+00:00"
+        return datetime.fromisoformat(text)
+
+    def _matrix(self, audience: str) -> tuple[array, array, array]:
+        if audience not in self._impressions:
+            self._impressions[audience] = array("d", bytes(8 * SLOTS_PER_WEEK))
+            self._reactions[audience] = array("d", bytes(8 * SLOTS_PER_WEEK))
+            self._posts[audience] = array("l", [0] * SLOTS_PER_WEEK)
+        return self._impressions[audience], self._reactions[audience], self._posts[audience]
+
+    def add_row(self, timestamp, audience: str, impressions: float, reactions: float) -> None:
+        """
+        Folds a single post-performance row into the matrices.
+
+        Args:
+            timestamp: Publish time (ISO string, epoch seconds or datetime).
+            audience: Audience label the post targeted (e.g., "tech").
+            impressions: Number of impressions the post received.
+            reactions: Number of reactions the post received.
+        """
+        published = self._parse_timestamp(timestamp)
+        slot = published.weekday() * HOURS_PER_DAY + published.hour
+        impressions = float(impressions or 0)
+        reactions = float(reactions or 0)
+
+        for key in {self._normalize_audience(audience), ALL_AUDIENCES}:
+            imp, react, posts = self._matrix(key)
+            imp[slot] += impressions
+            react[slot] += reactions
+            posts[slot] += 1
+            self._invalidate(key)
+
+    def add_rows(self, rows: Iterable[dict]) -> int:
+        """
+        Folds an iterable of row dictionaries into the matrices.
+
+        Rows with missing or unparseable values are skipped.
+
+        Returns:
+            The number of rows ingested.
+        """
+        count = 0
+        for row in rows:
+            try:
+                self.add_row(row["timestamp"], row.get("audience"), row.get("impressions"), row.get("reactions"))
+                count += 1
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"Warning: Skipping engagement row {row!r}: {e}")
+        return count
+
+    def ingest_csv(self, path: str) -> int:
+        """Ingests a CSV export. Returns the number of rows ingested."""
+        with open(path, newline="", encoding="utf-8") as f:
+            return self.add_rows(csv.DictReader(f))
+
+    def ingest_parquet(self, path: str, batch_size: int = 65536) -> int:
+        """
+        Ingests a Parquet export batch by batch. Requires pyarrow.
+
+        Returns:
+            The number of rows ingested.
+        """
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("pyarrow is required to read Parquet engagement history. Install it with `pip install pyarrow`.") from e
+
+        columns = ["timestamp", "audience", "impressions", "reactions"]
+        count = 0
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=columns):
+            count += self.add_rows(batch.to_pylist())
+        return count
+
+    def ingest(self, path: str) -> int:
+        """Ingests a CSV or Parquet export, chosen by file extension."""
+        if os.path.splitext(path)[1].lower() in (".parquet", ".pq"):
+            return self.ingest_parquet(path)
+        return self.ingest_csv(path)
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "EngagementHistory":
+        history = cls(**kwargs)
+        history.ingest(path)
+        return history
+
+    def _invalidate(self, audience: str) -> None:
+        for key in [k for k in self._ranked if k[0] == audience]:
+            del self._ranked[key]
+
+    def has_data(self, audience: Optional[str] = None) -> bool:
+        """Checks whether any rows have been ingested for the audience."""
+        key = ALL_AUDIENCES if audience is None else self._normalize_audience(audience)
+        return key in self._posts and sum(self._posts[key]) >= self.min_posts
+
+    def _ranking(self, audience: str, window_hours: int) -> list[tuple[float, int]]:
+        cache_key = (audience, window_hours)
+        ranked = self._ranked.get(cache_key)
+        if ranked is not None:
+            return ranked
+
+        imp, react, posts = self._matrix(audience)
+        total_imp = sum(imp)
+        baseline = sum(react) / total_imp if total_imp else 0.0
+        prior_reactions = baseline * self.prior_impressions
+
+        ranked = []
+        for day in range(len(DAYS)):
+            base = day * HOURS_PER_DAY
+            for hour in range(HOURS_PER_DAY - window_hours + 1):
+                start = base + hour
+                end = start + window_hours
+                window_posts = sum(posts[start:end])
+                if window_posts < self.min_posts:
+                    continue
+                rate = (sum(react[start:end]) + prior_reactions) / (sum(imp[start:end]) + self.prior_impressions)
+                ranked.append((rate, start))
+        ranked.sort(reverse=True)
+        self._ranked[cache_key] = ranked
+        return ranked
+
+    def best_windows(self, audience: str = "general", top_n: int = 3, window_hours: int = 1) -> list[dict]:
+        """
+        Returns the best posting windows for an audience.
+
+        Args:
+            audience: Audience label. Falls back to all audiences if unseen.
+            top_n: Number of windows to return.
+            window_hours: Width of each window in hours (within a single day).
+
+        Returns:
+            A list of dicts with day, start_hour, end_hour, engagement_rate and posts.
+        """
+        key = self._normalize_audience(audience)
+        if not self.has_data(key):
+            key = ALL_AUDIENCES
+        if not self.has_data(key):
+            return []
+
+        window_hours = max(1, min(window_hours, HOURS_PER_DAY))
+        posts = self._posts[key]
+        windows = []
+        for rate, start in self._ranking(key, window_hours)[:top_n]:
+            day, hour = divmod(start, HOURS_PER_DAY)
+            windows.append({
+                "day": DAYS[day],
+                "start_hour": hour,
+                "end_hour": hour + window_hours,
+                "engagement_rate": rate,
+                "posts": sum(posts[start:start + window_hours]),
+            })
+        return windows
+
+    def post_count(self, audience: Optional[str] = None) -> int:
+        """Returns the number of rows ingested for the audience (or overall)."""
+        key = ALL_AUDIENCES if audience is None else self._normalize_audience(audience)
+        return sum(self._posts[key]) if key in self._posts else 0
+
+
+# Example usage (for testing)
+if __name__ == '__main__':
+    history = EngagementHistory()
+    history.add_rows([
+        {"timestamp": "2024-05-07T09:15:00", "audience": "tech", "impressions": 1200, "reactions": 60},
+        {"timestamp": "2024-05-08T16:40:00", "audience": "tech", "impressions": 900, "reactions": 18},
+        {"timestamp": "2024-05-06T07:05:00", "audience": "finance", "impressions": 1500, "reactions": 75},
+    ])
+    print(f"Tech windows: {history.best_windows('tech', top_n=2)}")
+    print(f"Unknown audience falls back to all: {history.best_windows('healthcare', top_n=1)}")
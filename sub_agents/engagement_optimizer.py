@@ -1,25 +1,51 @@
 # sub_agents/engagement_optimiser.py
 
-import google.generativeai as genai
 import os
 import random
-from dotenv import load_dotenv, find_dotenv
+from typing import Optional
+
+from sub_agents.engagement_history import EngagementHistory
+from sub_agents.structured_output import StructuredOutputError, json_generation_config, parse_structured
+from sub_agents.prompting import generate_about_post, with_system_instruction
+from sub_agents.runtime import get_genai, load_env
+
+CTA_SCHEMA = {
+    "type": "object",
+    "properties": {"cta": {"type": "string"}},
+    "required": ["cta"],
+}
+
+SYSTEM_INSTRUCTION = """
+You suggest concise calls-to-action that encourage engagement (comments, likes, shares, connections) on LinkedIn posts.
+Choose a CTA that fits the tone and topic of the post.
+The CTA is a single sentence of at most 150 characters.
+"""
 
-load_dotenv(find_dotenv())
 
 class EngagementOptimiser:
     """
-    Suggests calls-to-action and offers generic timing advice.
-    Note: Timing advice is highly generalized here; real advice needs data.
+    Suggests calls-to-action and offers timing advice.
+    Timing advice is data-driven when an EngagementHistory is supplied and
+    falls back to generic advice otherwise.
     """
-    def __init__(self, api_key=None):
-        if api_key is None:
-            api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key:
-            raise ValueError("GOOGLE_API_KEY not found. Please set it or pass it.")
-        genai.configure(api_key=api_key)
-        llm = os.getenv("MODEL_NAME")
-        self.model = genai.GenerativeModel(llm)
+    def __init__(self, api_key=None, history: Optional[EngagementHistory] = None, model=None):
+        # A preconfigured model (e.g. a routed one) can be injected instead
+        if model is None:
+            load_env()
+            genai = get_genai()
+            if api_key is None:
+                api_key = os.getenv("GOOGLE_API_KEY")
+            if not api_key:
+                raise ValueError("GOOGLE_API_KEY not found. Please set it or pass it.")
+            genai.configure(api_key=api_key)
+            llm = os.getenv("MODEL_NAME")
+            model = genai.GenerativeModel(llm, system_instruction=SYSTEM_INSTRUCTION)
+        else:
+            model = with_system_instruction(model, SYSTEM_INSTRUCTION)
+        self.model = model
+        self.history = history
+        # A CTA is a single short sentence
+        self.max_output_tokens = 64
 
         self.common_ctas = [
             "What are your thoughts on this?",
@@ -45,44 +71,49 @@ class EngagementOptimiser:
             A suggested CTA string.
         """
         # Using LLM to suggest a contextually relevant CTA
-        prompt = f"""
-        Based on the following LinkedIn post content, suggest a concise call-to-action to encourage engagement (comments, likes, shares, connections).
-        Choose a CTA that fits the tone and topic of the post.
-        Provide only the suggested call-to-action text.
-
-        Post Content:
-        {text}
-
-        Suggested Call-to-Action:
-        """
+        task = "Suggest a call-to-action for the LinkedIn post."
         try:
-            response = self.model.generate_content(prompt)
-            if response and response.candidates and response.candidates[0].content and response.candidates[0].content.parts:
-                 cta = "".join([part.text for part in response.candidates[0].content.parts]).strip()
-                 # Simple validation: check if it's too long or nonsensical
-                 if 10 < len(cta) < 150 and '\n' not in cta:
-                     return cta
-                 else:
-                     print("Warning: LLM generated potentially unsuitable CTA. Selecting a common one.")
-                     return random.choice(self.common_ctas)
+            response = generate_about_post(
+                self.model, task, text,
+                generation_config=json_generation_config(CTA_SCHEMA, self.max_output_tokens, temperature=0.7)
+            )
+            cta = parse_structured(response, CTA_SCHEMA)["cta"].strip()
+            # Simple validation: check if it's too long or nonsensical
+            if 10 < len(cta) < 150 and '\n' not in cta:
+                return cta
             else:
-                print("Warning: LLM response empty for CTA suggestion. Selecting a common one.")
+                print("Warning: LLM generated potentially unsuitable CTA. Selecting a common one.")
                 return random.choice(self.common_ctas)
+        except StructuredOutputError as e:
+            print(f"Warning: Unusable CTA response ({e}). Selecting a common one.")
+            return random.choice(self.common_ctas)
         except Exception as e:
             print(f"Error suggesting CTA: {e}. Selecting a common one.")
             return random.choice(self.common_ctas)
 
-    def get_timing_advice(self, audience_type: str = "general") -> str:
+    def get_timing_advice(self, audience_type: str = "general", top_n: int = 3) -> str:
         """
-        Provides generic timing advice for posting on LinkedIn.
-        (Highly generalized - needs actual data for accuracy).
+        Provides timing advice for posting on LinkedIn.
+        Uses the engagement history when one is loaded, otherwise generic advice.
 
         Args:
             audience_type: Type of audience (e.g., "general", "tech", "finance").
+            top_n: Number of best windows to mention when history is available.
 
         Returns:
             A string providing timing advice.
         """
+        if self.history is not None and self.history.has_data():
+            windows = self.history.best_windows(audience_type, top_n=top_n)
+            if windows:
+                slots = ", ".join(
+                    f"{w['day']} {w['start_hour']:02d}:00-{w['end_hour']:02d}:00 ({w['engagement_rate']:.1%} engagement)"
+                    for w in windows
+                )
+                source = audience_type if self.history.has_data(audience_type) else "all audiences"
+                posts = self.history.post_count(audience_type if self.history.has_data(audience_type) else None)
+                return f"Best windows for {source} based on {posts} past posts: {slots}. Note: Times follow the timestamps in your export."
+
         # Disclaimer needed as this is highly variable
         disclaimer = "Note: This is general advice. Optimal timing varies greatly by your specific audience and location."
 
@@ -0,0 +1,256 @@
+# sub_agents/engagement_predictor.py
+import bisect
+import csv
+import hashlib
+import json
+import math
+import re
+from typing import Iterable, Optional
+
+HASHTAG_PATTERN = re.compile(r"#\w+")
+_WORD = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)?")
+_SENTENCE_END = re.compile(r"[.!?]+(?=\s|$)")
+_VOWEL_GROUPS = re.compile(r"[aeiouy]+")
+_URL = re.compile(r"https?://\S+")
+_MENTION = re.compile(r"@\w+")
+
+TEXT_FEATURES = (
+    "log_chars", "log_words", "words_per_sentence", "readability", "line_breaks_per_100_words",
+    "questions", "exclamations", "emoji_density", "hashtags", "mentions", "urls", "has_cta",
+)
+# Hashtags are hashed into a few buckets so the model can learn which ones tend to do well
+HASHTAG_BUCKETS = 32
+FEATURE_NAMES = TEXT_FEATURES + tuple(f"hashtag_{i}" for i in range(HASHTAG_BUCKETS))
+# Quantile points kept from the training predictions, for percentile()
+QUANTILE_POINTS = 101
+
+
+def _syllables(word: str) -> int:
+    word = word.lower()
+    count = len(_VOWEL_GROUPS.findall(word))
+    if word.endswith("e") and count > 1 and not word.endswith("le"):
+        count -= 1
+    return max(count, 1)
+
+
+def _is_emoji(char: str) -> bool:
+    code = ord(char)
+    return 0x1F300 <= code <= 0x1FAFF or 0x2600 <= code <= 0x27BF
+
+
+def _hashtag_bucket(hashtag: str) -> int:
+    digest = hashlib.blake2b(hashtag.lstrip("#").lower().encode("utf-8"), digest_size=4).digest()
+    return int.from_bytes(digest, "little") % HASHTAG_BUCKETS
+
+
+def extract_features(text: str, hashtags: Optional[list[str]] = None, cta: str = "") -> list[float]:
+    """
+    Turns a post into the predictor's feature vector (see FEATURE_NAMES).
+
+    Args:
+        text: The post body.
+        hashtags: Hashtags published with the post; extracted from the text if omitted.
+        cta: The call-to-action appended to the post, if any.
+    """
+    if hashtags is None:
+        hashtags = HASHTAG_PATTERN.findall(text)
+    full = f"{text}\n\n{cta}" if cta else text
+    words = _WORD.findall(full)
+    num_words = max(len(words), 1)
+    sentences = max(len(_SENTENCE_END.findall(full)), 1)
+    syllables = sum(_syllables(word) for word in words)
+    # Flesch reading ease, clamped to its usual 0-100 range
+    readability = 206.835 - 1.015 * (num_words / sentences) - 84.6 * (syllables / num_words)
+    emojis = sum(1 for char in full if _is_emoji(char))
+    last_line = full.rstrip().rsplit("\n", 1)[-1]
+    features = [
+        math.log1p(len(full)),
+        math.log1p(len(words)),
+        num_words / sentences,
+        min(max(readability, 0.0), 100.0),
+        100.0 * full.count("\n") / num_words,
+        float(full.count("?")),
+        float(full.count("!")),
+        1000.0 * emojis / max(len(full), 1),
+        float(len(hashtags)),
+        float(len(_MENTION.findall(full))),
+        float(len(_URL.findall(full))),
+        1.0 if cta or last_line.rstrip().endswith("?") else 0.0,
+    ]
+    buckets = [0.0] * HASHTAG_BUCKETS
+    for hashtag in hashtags:
+        buckets[_hashtag_bucket(hashtag)] = 1.0
+    return features + buckets
+
+
+def _solve(matrix: list[list[float]], vector: list[float]) -> list[float]:
+    """Solves matrix @ x = vector by Gaussian elimination with partial pivoting."""
+    n = len(vector)
+    rows = [row[:] + [value] for row, value in zip(matrix, vector)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(rows[r][col]))
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        if abs(rows[col][col]) < 1e-12:
+            continue
+        for r in range(col + 1, n):
+            factor = rows[r][col] / rows[col][col]
+            if factor:
+                for c in range(col, n + 1):
+                    rows[r][c] -= factor * rows[col][c]
+    solution = [0.0] * n
+    for r in range(n - 1, -1, -1):
+        if abs(rows[r][r]) < 1e-12:
+            continue
+        solution[r] = (rows[r][n] - sum(rows[r][c] * solution[c] for c in range(r + 1, n))) / rows[r][r]
+    return solution
+
+
+class EngagementPredictor:
+    """
+    Local ridge-regression model of a post's engagement rate.
+
+    Trained on historical posts ((reactions + comments + shares) / impressions)
+    from features that are cheap to compute: length, readability, questions,
+    emoji density, hashtag count and which hashtags were used, mentions, URLs
+    and CTA presence. Scoring is a dot product over standardized features, so
+    drafts, hashtag sets and CTAs can be compared in microseconds each
+    without a model call. percentile() places a score among the training
+    posts, which makes thresholds independent of the account's typical rate.
+
+    Args:
+        alpha: Ridge regularization strength.
+    """
+    def __init__(self, alpha: float = 1.0):
+        self.alpha = alpha
+        self.weights: list[float] = []
+        self.intercept = 0.0
+        self.means: list[float] = []
+        self.scales: list[float] = []
+        self.quantiles: list[float] = []
+
+    @property
+    def trained(self) -> bool:
+        return bool(self.weights)
+
+    @staticmethod
+    def target(row: dict) -> float:
+        impressions = float(row.get("impressions") or 0)
+        interactions = sum(float(row.get(name) or 0) for name in ("reactions", "comments", "shares"))
+        return interactions / impressions if impressions > 0 else 0.0
+
+    def fit(self, rows: Iterable[dict]) -> int:
+        """
+        Trains the model on historical posts.
+
+        Args:
+            rows: Dicts with "text" and "impressions" plus any of "reactions", "comments",
+                "shares", "hashtags" (list or space-separated) and "cta".
+
+        Returns:
+            The number of posts used.
+        """
+        features, targets = [], []
+        for row in rows:
+            try:
+                hashtags = row.get("hashtags")
+                if isinstance(hashtags, str):
+                    hashtags = hashtags.split()
+                features.append(extract_features(row["text"], hashtags, row.get("cta") or ""))
+                targets.append(self.target(row))
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"Warning: Skipping engagement row: {e}")
+        if len(features) < 2:
+            raise ValueError("At least two posts are needed to train the engagement predictor.")
+
+        n, dims = len(features), len(FEATURE_NAMES)
+        self.means = [sum(x[j] for x in features) / n for j in range(dims)]
+        self.scales = []
+        for j in range(dims):
+            variance = sum((x[j] - self.means[j]) ** 2 for x in features) / n
+            self.scales.append(math.sqrt(variance) or 1.0)
+        standardized = [[(x[j] - self.means[j]) / self.scales[j] for j in range(dims)] for x in features]
+        self.intercept = sum(targets) / n
+        centered = [y - self.intercept for y in targets]
+
+        # Normal equations of ridge regression: (X'X + alpha I) w = X'y
+        gram = [[0.0] * dims for _ in range(dims)]
+        moments = [0.0] * dims
+        for x, y in zip(standardized, centered):
+            for i in range(dims):
+                if x[i]:
+                    moments[i] += x[i] * y
+                    row = gram[i]
+                    for j in range(dims):
+                        row[j] += x[i] * x[j]
+        for i in range(dims):
+            gram[i][i] += self.alpha
+        self.weights = _solve(gram, moments)
+
+        predictions = sorted(self._score(x) for x in features)
+        self.quantiles = [predictions[round(q * (n - 1) / (QUANTILE_POINTS - 1))] for q in range(QUANTILE_POINTS)]
+        return n
+
+    def fit_csv(self, path: str) -> int:
+        """Trains on a CSV export with the columns described in fit()."""
+        with open(path, newline="", encoding="utf-8") as f:
+            return self.fit(csv.DictReader(f))
+
+    def _score(self, features: list[float]) -> float:
+        return self.intercept + sum(w * (x - m) / s for w, x, m, s in zip(self.weights, features, self.means, self.scales))
+
+    def predict(self, text: str, hashtags: Optional[list[str]] = None, cta: str = "") -> float:
+        """Predicted engagement rate of a post."""
+        if not self.trained:
+            raise RuntimeError("The engagement predictor has not been trained.")
+        return self._score(extract_features(text, hashtags, cta))
+
+    def predict_many(self, candidates: list[dict]) -> list[float]:
+        """Scores a batch of candidates, each a dict with "text" and optionally "hashtags" and "cta"."""
+        return [self.predict(c["text"], c.get("hashtags"), c.get("cta", "")) for c in candidates]
+
+    def percentile(self, score: float) -> float:
+        """Share of the training posts (0-1) predicted to do worse than this score."""
+        if not self.quantiles:
+            return 0.5
+        return bisect.bisect_left(self.quantiles, score) / len(self.quantiles)
+
+    def rank(self, candidates: list[dict]) -> list[tuple[int, float]]:
+        """Returns (candidate index, score) pairs, best first."""
+        scores = self.predict_many(candidates)
+        return sorted(enumerate(scores), key=lambda item: item[1], reverse=True)
+
+    def save(self, path: str) -> None:
+        data = {"alpha": self.alpha, "features": list(FEATURE_NAMES), "weights": self.weights,
+                "intercept": self.intercept, "means": self.means, "scales": self.scales, "quantiles": self.quantiles}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+    @classmethod
+    def load(cls, path: str) -> "EngagementPredictor":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data["features"] != list(FEATURE_NAMES):
+            raise ValueError("The saved engagement model uses different features; retrain it.")
+        predictor = cls(alpha=data["alpha"])
+        predictor.weights = data["weights"]
+        predictor.intercept = data["intercept"]
+        predictor.means = data["means"]
+        predictor.scales = data["scales"]
+        predictor.quantiles = data["quantiles"]
+        return predictor
+
+
+# Example usage (for testing)
+if __name__ == '__main__':
+    predictor = EngagementPredictor()
+    predictor.fit([
+        {"text": "We shipped it! What would you build with it? 🚀", "impressions": 1000, "reactions": 80, "hashtags": "#AI"},
+        {"text": "Quarterly update. Revenue grew. Costs fell. More details in the report.", "impressions": 1000, "reactions": 12},
+        {"text": "Three lessons from hiring 50 engineers.\n\n1. Hire slowly.\n2. Onboard well.\n3. Trust people.\n\nWhat's yours?",
+         "impressions": 1000, "reactions": 95, "comments": 20, "hashtags": "#Hiring #Leadership"},
+        {"text": "Please find attached our policy document regarding procurement procedures.", "impressions": 1000, "reactions": 5},
+    ])
+    for post in ["Big news! We launched our AI helpdesk today. What do you think? 🎉",
+                 "Our organization hereby announces the commencement of operations of a helpdesk system."]:
+        score = predictor.predict(post)
+        print(f"{score:.3f} (percentile {predictor.percentile(score):.2f}): {post}")
@@ -1,14 +1,32 @@
 # sub_agents/hashtag_generator.py
-import google.generativeai as genai
 import os
-from dotenv import load_dotenv, find_dotenv
+from typing import Optional
 
-load_dotenv(find_dotenv())
+from sub_agents.hashtag_index import HashtagIndex
+from sub_agents.structured_output import StructuredOutputError, json_generation_config, parse_structured
+from sub_agents.prompting import generate_about_post, with_system_instruction
+from sub_agents.runtime import get_genai, load_env
+
+
+HASHTAG_SCHEMA = {
+    "type": "object",
+    "properties": {"hashtags": {"type": "array", "items": {"type": "string"}}},
+    "required": ["hashtags"],
+}
+
+SYSTEM_INSTRUCTION = """
+You generate hashtags for LinkedIn posts.
+Suggest a mix of popular, niche, and potentially trending hashtags related to the topic.
+Do not include hashtags that are too generic (like #post or #linkedin).
+Each hashtag starts with '#' and contains no spaces.
+"""
 
 
 class HashtagGenerator:
     """
     Generates relevant and potentially trending hashtags based on the post content.
+    When a HashtagIndex is supplied, confident local matches are used first and
+    the model is only asked to top up the remaining slots.
 
     Args:
         text: The post content.
@@ -18,15 +36,35 @@ class HashtagGenerator:
         A list of recommended hashtags.
 
     """
-    def __init__(self, api_key=None):
-        if api_key is None:
-            api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key:
-            raise ValueError("GOOGLE_API_KEY not found. Please set it or pass it.")
-        genai.configure(api_key=api_key)
-        llm = os.getenv("MODEL_NAME")
-        # print(llm)
-        self.model = genai.GenerativeModel(llm) 
+    def __init__(self, api_key=None, index: Optional[HashtagIndex] = None, min_confidence: float = 0.15, model=None):
+        # A preconfigured model (e.g. a routed one) can be injected instead
+        if model is None:
+            load_env()
+            genai = get_genai()
+            if api_key is None:
+                api_key = os.getenv("GOOGLE_API_KEY")
+            if not api_key:
+                raise ValueError("GOOGLE_API_KEY not found. Please set it or pass it.")
+            genai.configure(api_key=api_key)
+            llm = os.getenv("MODEL_NAME")
+            # print(llm)
+            model = genai.GenerativeModel(llm, system_instruction=SYSTEM_INSTRUCTION)
+        else:
+            model = with_system_instruction(model, SYSTEM_INSTRUCTION)
+        self.model = model
+        self.index = index
+        self.min_confidence = min_confidence
+        # Hashtags are short; a tight cap keeps the JSON response cheap
+        self.max_output_tokens = 128
+
+    @staticmethod
+    def _merge_unique(*groups: list[str]) -> list[str]:
+        """Merges hashtag lists, dropping case-insensitive duplicates but keeping order."""
+        seen = {}
+        for group in groups:
+            for hashtag in group:
+                seen.setdefault(hashtag.lower(), hashtag)
+        return list(seen.values())
 
     def generate_hashtags(self, text: str, num_hashtags: int = 5) -> list[str]:
         """
@@ -37,32 +75,39 @@ class HashtagGenerator:
             num_hashtags: The desired number of hashtags.
 
         Returns:
-            A list of recommended hashtags.
+            A list of recommended hashtags, most relevant first.
         """
-        prompt = f"""
-        Generate {num_hashtags} relevant hashtags for the following LinkedIn post content.
-        Suggest a mix of popular, niche, and potentially trending hashtags related to the topic.
-        Do not include hashtags that are too generic (like #post or #linkedin).
-        Provide only the hashtags, one per line, starting with '#'.
+        if num_hashtags <= 0:
+            return []
 
-        Post Content:
-        {text}
+        local_hashtags = []
+        if self.index is not None:
+            local_hashtags = [h for h, score in self.index.query(text, num_hashtags) if score >= self.min_confidence]
+            if len(local_hashtags) >= num_hashtags:
+                return local_hashtags[:num_hashtags]
 
-        Hashtags:
-        """
+        remaining = num_hashtags - len(local_hashtags)
+        exclusions = ""
+        if local_hashtags:
+            exclusions = f"Do not repeat these hashtags: {', '.join(local_hashtags)}."
+
+        task = f"Generate {remaining} relevant hashtags for the LinkedIn post. {exclusions}".strip()
         try:
-            response = self.model.generate_content(prompt)
-            if response and response.candidates and response.candidates[0].content and response.candidates[0].content.parts:
-                 hashtags_str = "".join([part.text for part in response.candidates[0].content.parts]).strip()
-                 # Split lines, filter for valid hashtags, remove duplicates
-                 hashtags = [h.strip() for h in hashtags_str.split('\n') if h.strip().startswith('#') and len(h.strip()) > 1]
-                 return list(set(hashtags))[:num_hashtags] # Return unique hashtags up to limit
-            else:
-                print("Warning: LLM response empty for hashtag generation. Returning empty list.")
-                return []
+            response = generate_about_post(
+                self.model, task, text,
+                generation_config=json_generation_config(HASHTAG_SCHEMA, self.max_output_tokens)
+            )
+            result = parse_structured(response, HASHTAG_SCHEMA)
+            # Normalize, drop invalid entries, remove duplicates while keeping the model's order
+            hashtags = ["#" + h.strip().lstrip("#").replace(" ", "") for h in result["hashtags"]]
+            hashtags = [h for h in hashtags if len(h) > 1]
+            return self._merge_unique(local_hashtags, hashtags)[:num_hashtags]
+        except StructuredOutputError as e:
+            print(f"Warning: Unusable hashtag response ({e}). Returning local matches.")
+            return local_hashtags
         except Exception as e:
-            print(f"Error generating hashtags: {e}. Returning empty list.")
-            return []
+            print(f"Error generating hashtags: {e}. Returning local matches.")
+            return local_hashtags
 
 # Example usage (for testing)
 if __name__ == '__main__':
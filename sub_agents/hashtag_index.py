@@ -0,0 +1,165 @@
+# sub_agents/hashtag_index.py
+import json
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Iterable, Optional, Union
+
+from sub_agents.text_vectorizer import split_hashtag, tokenize
+
+HASHTAG_PATTERN = re.compile(r"#\w+")
+
+
+class HashtagIndex:
+    """
+    Local TF-IDF index that maps post text to ranked hashtags without a model call.
+
+    Every hashtag gets a unit-length TF-IDF profile built from the historical
+    posts that used it plus any curated keywords. Profiles are stored as an
+    inverted index (term -> [(hashtag, weight)]), so a query only touches the
+    terms present in the draft and its score is the cosine similarity between
+    the draft and each hashtag profile (0.0 - 1.0), usable as a confidence.
+    """
+    def __init__(self):
+        self._term_counts: dict[str, Counter] = defaultdict(Counter)  # hashtag -> term counts
+        self._doc_freq: Counter = Counter()
+        self._num_docs = 0
+        self._display: dict[str, str] = {}  # lower-case key -> preferred spelling
+        self._inverted: dict[str, list[tuple[str, float]]] = {}
+        self._idf: dict[str, float] = {}
+        self._dirty = False
+        # Bumped on every change, so callers caching query results can tell when they are stale
+        self.version = 0
+
+    @staticmethod
+    def _key(hashtag: str) -> str:
+        return hashtag.lstrip("#").lower()
+
+    def _register(self, hashtag: str) -> str:
+        hashtag = "#" + hashtag.strip().lstrip("#")
+        key = self._key(hashtag)
+        self._display.setdefault(key, hashtag)
+        return key
+
+    def add_post(self, text: str, hashtags: Optional[Iterable[str]] = None) -> None:
+        """
+        Learns hashtag associations from a historical post.
+
+        Args:
+            text: The post content.
+            hashtags: Hashtags used with the post. Extracted from the text if omitted.
+        """
+        if hashtags is None:
+            hashtags = HASHTAG_PATTERN.findall(text)
+        body = HASHTAG_PATTERN.sub(" ", text)
+        terms = Counter(tokenize(body))
+        if not terms:
+            return
+
+        self._num_docs += 1
+        self._doc_freq.update(terms.keys())
+        for hashtag in hashtags:
+            key = self._register(hashtag)
+            self._term_counts[key].update(terms)
+            self._term_counts[key].update(split_hashtag(hashtag))
+        self._dirty = True
+        self.version += 1
+
+    def add_vocabulary(self, vocabulary: Union[dict[str, Iterable[str]], Iterable[str]]) -> None:
+        """
+        Adds curated hashtags, optionally with extra keywords.
+
+        Args:
+            vocabulary: Either a list of hashtags or a mapping of hashtag -> keywords.
+        """
+        items = vocabulary.items() if isinstance(vocabulary, dict) else ((h, ()) for h in vocabulary)
+        for hashtag, keywords in items:
+            key = self._register(hashtag)
+            terms = split_hashtag(hashtag)
+            for keyword in keywords:
+                terms.extend(tokenize(keyword))
+            self._term_counts[key].update(terms)
+        self._dirty = True
+        self.version += 1
+
+    def _build(self) -> None:
+        num_docs = max(self._num_docs, 1)
+        vocabulary = set()
+        for counts in self._term_counts.values():
+            vocabulary.update(counts)
+        self._idf = {t: math.log((1 + num_docs) / (1 + self._doc_freq[t])) + 1.0 for t in vocabulary}
+
+        inverted: dict[str, list[tuple[str, float]]] = defaultdict(list)
+        for key, counts in self._term_counts.items():
+            weights = {t: (1 + math.log(c)) * self._idf[t] for t, c in counts.items()}
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            for term, weight in weights.items():
+                inverted[term].append((key, weight / norm))
+        self._inverted = dict(inverted)
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._term_counts)
+
+    def query(self, text: str, top_k: int = 5) -> list[tuple[str, float]]:
+        """
+        Ranks indexed hashtags for the given text.
+
+        Args:
+            text: The post content.
+            top_k: Maximum number of hashtags to return.
+
+        Returns:
+            A list of (hashtag, confidence) tuples, best first.
+        """
+        if self._dirty:
+            self._build()
+        terms = Counter(tokenize(text))
+        if not terms:
+            return []
+
+        # Unseen terms still count towards the query norm, so a draft that only
+        # brushes against the index gets a correspondingly low confidence.
+        unseen_idf = math.log(1 + max(self._num_docs, 1)) + 1.0
+        query = {t: (1 + math.log(c)) * self._idf.get(t, unseen_idf) for t, c in terms.items()}
+        norm = math.sqrt(sum(w * w for w in query.values()))
+        scores: dict[str, float] = defaultdict(float)
+        for term, weight in query.items():
+            for key, hashtag_weight in self._inverted.get(term, ()):
+                scores[key] += weight * hashtag_weight
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [(self._display[key], score / norm) for key, score in ranked]
+
+    def save(self, path: str) -> None:
+        """Persists the index source data to a JSON file."""
+        data = {
+            "num_docs": self._num_docs,
+            "doc_freq": self._doc_freq,
+            "display": self._display,
+            "term_counts": self._term_counts,
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+    @classmethod
+    def load(cls, path: str) -> "HashtagIndex":
+        """Loads an index previously written with save()."""
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls()
+        index._num_docs = data["num_docs"]
+        index._doc_freq = Counter(data["doc_freq"])
+        index._display = data["display"]
+        index._term_counts = defaultdict(Counter, {k: Counter(v) for k, v in data["term_counts"].items()})
+        index._dirty = True
+        return index
+
+
+# Example usage (for testing)
+if __name__ == '__main__':
+    index = HashtagIndex()
+    index.add_vocabulary({"#ArtificialIntelligence": ["ai", "genai", "llm"], "#SmallBusiness": ["smb", "owners"]})
+    index.add_post("Our analytics platform turns raw data into insights for small businesses. #DataAnalytics #SmallBusiness")
+    index.add_post("How AI agents are changing customer support teams. #AI #CustomerExperience")
+    draft = "Excited to share our new AI-powered analytics platform for small businesses. It simplifies data insights."
+    print(f"Ranked hashtags: {index.query(draft, top_k=4)}")
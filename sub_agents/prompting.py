@@ -0,0 +1,48 @@
+# sub_agents/prompting.py
+
+# Shared system instruction for context-cached posts. Stage-specific
+# instructions are sent with each request, so one cached post serves every stage.
+POST_CONTEXT_INSTRUCTION = (
+    "You assist with a LinkedIn post that is provided as context. "
+    "Each request states a task about that post; follow its instructions and answer only the task."
+)
+
+
+def post_request(task: str, post: str) -> list[str]:
+    """Builds request contents with the per-call task first and the post last."""
+    return [task, f"Post Content:\n{post}"]
+
+
+class _InlineInstructionModel:
+    """Prepends a system instruction to each request for models that were built without one."""
+    def __init__(self, model, instruction: str):
+        self.model = model
+        self.instruction = instruction
+
+    def generate_content(self, contents, **kwargs):
+        if isinstance(contents, str):
+            contents = [contents]
+        return self.model.generate_content([self.instruction, *contents], **kwargs)
+
+
+def with_system_instruction(model, instruction: str):
+    """
+    Binds a stable system instruction to an injected model.
+
+    Routed models build a model with a native system instruction (so the
+    instruction can be cached as a prefix); any other model gets the
+    instruction prepended to each request.
+    """
+    if hasattr(model, "with_system_instruction"):
+        return model.with_system_instruction(instruction)
+    return _InlineInstructionModel(model, instruction)
+
+
+def generate_about_post(model, task: str, post: str, **kwargs):
+    """
+    Runs a task about a post. Routed models may serve the post from a shared
+    context cache; other models receive the post inline.
+    """
+    if hasattr(model, "generate_about_post"):
+        return model.generate_about_post(task, post, **kwargs)
+    return model.generate_content(post_request(task, post), **kwargs)
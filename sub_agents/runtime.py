@@ -0,0 +1,70 @@
+# sub_agents/runtime.py
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+_lock = threading.Lock()
+_env_loaded = False
+_genai = None
+# Reasons the result being computed in this context is a local fallback (see fallback_scope)
+_fallbacks: ContextVar[Optional[list]] = ContextVar("fallbacks", default=None)
+
+
+def load_env() -> None:
+    """
+    Loads the .env file once per process.
+
+    Modules call this right before reading configuration instead of at import
+    time, so importing the package stays cheap and the file is only searched
+    for and parsed once.
+    """
+    global _env_loaded
+    if _env_loaded:
+        return
+    with _lock:
+        if not _env_loaded:
+            from dotenv import load_dotenv, find_dotenv
+            load_dotenv(find_dotenv())
+            _env_loaded = True
+
+
+def get_genai():
+    """
+    Imports google.generativeai on first use.
+
+    The SDK (and its gRPC/protobuf dependencies) dominates import time, so
+    it is only loaded when a model is actually constructed.
+    """
+    global _genai
+    if _genai is None:
+        with _lock:
+            if _genai is None:
+                import google.generativeai as genai
+                _genai = genai
+    return _genai
+
+
+def note_fallback(reason: str) -> None:
+    """
+    Records that the current result is a local fallback rather than a model answer
+    (a failed or short-circuited call, an unusable response). Outside a
+    fallback_scope this does nothing.
+    """
+    fallbacks = _fallbacks.get()
+    if fallbacks is not None:
+        fallbacks.append(reason)
+
+
+@contextmanager
+def fallback_scope() -> Iterator[list]:
+    """
+    Collects note_fallback() reasons raised while the block runs, e.g. so a
+    pipeline stage that fell back is not memoized.
+    """
+    fallbacks = []
+    token = _fallbacks.set(fallbacks)
+    try:
+        yield fallbacks
+    finally:
+        _fallbacks.reset(token)
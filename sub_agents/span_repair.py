@@ -0,0 +1,173 @@
+# sub_agents/span_repair.py
+import os
+import re
+
+from sub_agents.structured_output import (StructuredOutputError, ValidationIssue, json_generation_config,
+                                          parse_structured)
+from sub_agents.prompting import with_system_instruction
+from sub_agents.runtime import get_genai, load_env
+
+REPAIR_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "fixes": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"id": {"type": "integer"}, "text": {"type": "string"}},
+                "required": ["id", "text"],
+            },
+        },
+    },
+    "required": ["fixes"],
+}
+
+SYSTEM_INSTRUCTION = """
+You fix individual sentences from a LinkedIn post.
+For each numbered sentence, correct only the listed issues and keep everything else (wording, tone, emojis, hashtags, line breaks) unchanged.
+Return every sentence by its id with its corrected text.
+"""
+
+# Sentence ends at ., ! or ? followed by whitespace, or at a line break
+_SENTENCE_END = re.compile(r"[.!?]+(?=\s)|\n")
+
+
+def sentence_span(text: str, start: int, end: int) -> tuple[int, int]:
+    """Expands a character span to the sentence(s) containing it."""
+    sentence_start = 0
+    for match in _SENTENCE_END.finditer(text, 0, start):
+        sentence_start = match.end()
+    # A span ending on its sentence's terminal punctuation must not run on into the next sentence
+    search_from = end - 1 if start < end and text[end - 1] in ".!?" else end
+    match = _SENTENCE_END.search(text, search_from)
+    sentence_end = match.end() if match and match.group(0) != "\n" else (match.start() if match else len(text))
+    while sentence_start < start and text[sentence_start].isspace():
+        sentence_start += 1
+    return sentence_start, max(sentence_end, end)
+
+
+def _collapse_quote(quote: str) -> str:
+    """An issue quote with surrounding quote marks stripped and whitespace collapsed (case kept)."""
+    return " ".join(quote.strip().strip('"').split())
+
+
+class SpanRepairer:
+    """
+    Fixes validation issues in place: only the sentences containing a
+    located issue are sent to the model (in one call), and the fixes are
+    spliced back into the post.
+
+    Each fix is re-checked locally before it is accepted: the quoted text
+    must be gone and the local rule checks must pass. Fixes that fail, or
+    that grow the sentence unreasonably, are discarded and the original
+    sentence is kept.
+    """
+    def __init__(self, api_key=None, model=None, rule_checker=None):
+        # A preconfigured model (e.g. a routed one) can be injected instead
+        if model is None:
+            load_env()
+            genai = get_genai()
+            if api_key is None:
+                api_key = os.getenv("GOOGLE_API_KEY")
+            if not api_key:
+                raise ValueError("GOOGLE_API_KEY not found. Please set it or pass it.")
+            genai.configure(api_key=api_key)
+            llm = os.getenv("MODEL_NAME")
+            model = genai.GenerativeModel(llm, system_instruction=SYSTEM_INSTRUCTION)
+        else:
+            model = with_system_instruction(model, SYSTEM_INSTRUCTION)
+        self.model = model
+        # Callable returning local ValidationIssues for a text, e.g. ContentValidator.rule_issues
+        self.rule_checker = rule_checker
+
+    def _group(self, text: str, issues: list[ValidationIssue]) -> list[dict]:
+        """Maps located issues to sentence spans, merging issues that share or overlap a sentence."""
+        groups = []
+        for issue in sorted((i for i in issues if i.has_span), key=lambda i: i.start):
+            start, end = sentence_span(text, issue.start, issue.end)
+            if groups and start < groups[-1]["end"]:
+                groups[-1]["end"] = max(groups[-1]["end"], end)
+                groups[-1]["issues"].append(issue)
+            else:
+                groups.append({"start": start, "end": end, "issues": [issue]})
+        return groups
+
+    def _accept(self, original: str, replacement: str, issues: list[ValidationIssue]) -> bool:
+        if not replacement.strip() or replacement == original:
+            return False
+        if len(replacement) > 2 * len(original) + 40:
+            return False
+        # The quoted text must be gone exactly; a fix that only changes its case or spacing is a fix
+        collapsed = " ".join(replacement.split())
+        if any(quote and quote in collapsed for quote in (_collapse_quote(issue.quote) for issue in issues)):
+            return False
+        if self.rule_checker is not None and self.rule_checker(replacement):
+            return False
+        return True
+
+    def repair(self, text: str, issues: list[ValidationIssue]) -> tuple[str, list[dict]]:
+        """
+        Repairs the sentences containing the given issues.
+
+        Args:
+            text: The post the issues were found in.
+            issues: Issues from ContentValidator.check_post; ones without a located span are skipped.
+
+        Returns:
+            A tuple: (repaired text, one report per sentence with "original",
+            "replacement", "issues" and "resolved").
+        """
+        groups = self._group(text, issues)
+        if not groups:
+            return text, []
+
+        lines = []
+        for i, group in enumerate(groups):
+            problems = "; ".join(f"{issue.category}: {issue.message} (\"{issue.quote}\")" for issue in group["issues"])
+            lines.append(f"[{i}] {text[group['start']:group['end']]}\nIssues: {problems}")
+        prompt = "Fix these sentences:\n\n" + "\n\n".join(lines)
+        # Fixed sentences are about as long as the originals; leave room for JSON and ids
+        span_chars = sum(group["end"] - group["start"] for group in groups)
+        max_output_tokens = span_chars // 3 + 32 * len(groups) + 64
+
+        fixes = {}
+        try:
+            response = self.model.generate_content(
+                prompt,
+                generation_config=json_generation_config(REPAIR_SCHEMA, max_output_tokens)
+            )
+            fixes = {fix["id"]: fix["text"] for fix in parse_structured(response, REPAIR_SCHEMA)["fixes"]}
+        except StructuredOutputError as e:
+            print(f"Warning: Unusable repair response ({e}). Keeping the post unchanged.")
+        except Exception as e:
+            print(f"Error repairing post: {e}. Keeping the post unchanged.")
+
+        reports = []
+        # Splice from the end so earlier offsets stay valid
+        for i in reversed(range(len(groups))):
+            group = groups[i]
+            original = text[group["start"]:group["end"]]
+            replacement = fixes.get(i, "").strip()
+            resolved = self._accept(original, replacement, group["issues"])
+            if resolved:
+                text = text[:group["start"]] + replacement + text[group["end"]:]
+            reports.append({
+                "original": original,
+                "replacement": replacement if resolved else original,
+                "issues": [str(issue) for issue in group["issues"]],
+                "resolved": resolved,
+            })
+        reports.reverse()
+        return text, reports
+
+
+# Example usage (for testing)
+if __name__ == '__main__':
+    from sub_agents.content_validator import ContentValidator
+    validator = ContentValidator()
+    repairer = SpanRepairer(rule_checker=validator.rule_issues)
+    post = "We are exited to anounce our new partnership. lol this is big!!! It will help our customers."
+    issues = validator.check_post(post, "Professional")
+    print(f"Issues: {[str(issue) for issue in issues]}")
+    repaired, reports = repairer.repair(post, issues)
+    print(f"Repaired:\n{repaired}\n\nReports: {reports}")
@@ -0,0 +1,113 @@
+# sub_agents/structured_output.py
+import json
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from sub_agents.runtime import note_fallback
+
+_TYPE_CHECKS = {
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "string": lambda v: isinstance(v, str),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+}
+
+
+class StructuredOutputError(ValueError):
+    """Raised when a model response is not valid JSON for the requested schema."""
+
+
+@dataclass
+class ValidationIssue:
+    """
+    A single issue reported by the ContentValidator.
+
+    start/end are the character span of the quote in the checked text
+    (-1 when the issue has no quote or the quote could not be located).
+    """
+    category: str
+    message: str
+    quote: str = ""
+    start: int = -1
+    end: int = -1
+
+    @property
+    def has_span(self) -> bool:
+        return 0 <= self.start < self.end
+
+    def __str__(self) -> str:
+        if self.quote:
+            return f"{self.category.capitalize()}: {self.message} (\"{self.quote}\")"
+        return f"{self.category.capitalize()}: {self.message}"
+
+
+def response_text(response) -> Optional[str]:
+    """Joins the text parts of the first candidate, or returns None if the response is empty."""
+    if response and response.candidates and response.candidates[0].content and response.candidates[0].content.parts:
+        return "".join([part.text for part in response.candidates[0].content.parts])
+    return None
+
+
+def json_generation_config(schema: dict, max_output_tokens: int, **overrides: Any) -> dict:
+    """Builds a generation config that constrains the model to JSON matching the schema."""
+    config = {
+        "temperature": 0.2,
+        "max_output_tokens": max_output_tokens,
+        "response_mime_type": "application/json",
+        "response_schema": schema,
+    }
+    config.update(overrides)
+    return config
+
+
+def validate(value: Any, schema: dict, path: str = "$") -> Any:
+    """
+    Checks a decoded JSON value against the subset of OpenAPI schema used for
+    Gemini response schemas (type, properties, required, items, enum).
+
+    Returns:
+        The value, unchanged.
+
+    Raises:
+        StructuredOutputError: If the value does not match.
+    """
+    expected = schema.get("type")
+    if expected and not _TYPE_CHECKS[expected](value):
+        raise StructuredOutputError(f"{path}: expected {expected}, got {type(value).__name__}")
+    if "enum" in schema and value not in schema["enum"]:
+        raise StructuredOutputError(f"{path}: {value!r} is not one of {schema['enum']}")
+    if expected == "object":
+        for name in schema.get("required", ()):
+            if name not in value:
+                raise StructuredOutputError(f"{path}: missing required property '{name}'")
+        for name, sub_schema in schema.get("properties", {}).items():
+            if name in value:
+                validate(value[name], sub_schema, f"{path}.{name}")
+    elif expected == "array" and "items" in schema:
+        for i, item in enumerate(value):
+            validate(item, schema["items"], f"{path}[{i}]")
+    return value
+
+
+def parse_structured(response, schema: dict) -> Any:
+    """
+    Decodes and validates a JSON model response.
+
+    Raises:
+        StructuredOutputError: If the response is empty, not JSON, or does not match the schema.
+            The caller's result is then a fallback, which is recorded with note_fallback.
+    """
+    try:
+        text = response_text(response)
+        if not text:
+            raise StructuredOutputError("Empty model response.")
+        try:
+            value = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise StructuredOutputError(f"Response is not valid JSON: {e}") from e
+        return validate(value, schema)
+    except StructuredOutputError as e:
+        note_fallback(f"unusable response: {e}")
+        raise
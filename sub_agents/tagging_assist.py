@@ -1,27 +1,75 @@
 # sub_agents/tagging_assist.py
-import google.generativeai as genai
 import os
 import re
-from dotenv import load_dotenv, find_dotenv
+from typing import Optional
+
+from sub_agents.connections_directory import ConnectionsDirectory
+from sub_agents.structured_output import StructuredOutputError, json_generation_config, parse_structured
+from sub_agents.prompting import generate_about_post, with_system_instruction
+from sub_agents.runtime import get_genai, load_env
+
+
+TAG_SCHEMA = {
+    "type": "object",
+    "properties": {"tags": {"type": "array", "items": {"type": "string"}}},
+    "required": ["tags"],
+}
+
+RERANK_SCHEMA = {
+    "type": "object",
+    "properties": {"order": {"type": "array", "items": {"type": "integer"}}},
+    "required": ["order"],
+}
+
+SYSTEM_INSTRUCTION = """
+You suggest relevant professional roles or expertise areas to tag in LinkedIn posts.
+These should be generic placeholders, not actual people's names.
+
+For example: @AI_Expert, @Marketing_Leader, @Startup_Founder
+
+Each tag starts with '@' and uses underscores instead of spaces.
+When asked to order a numbered list of people instead, return only their numbers.
+"""
 
-load_dotenv(find_dotenv())
 
 class TaggingAssist:
     """
     Suggests relevant people to tag in the LinkedIn post.
-    This is a placeholder class that generates tag suggestions.
-    In a real implementation, this would connect to LinkedIn's API
-    or use a database of connections.
+
+    With a ConnectionsDirectory, tags are real connections whose expertise
+    matches the post, found locally; the model is only used to re-rank the
+    matches (if rerank is set) or, when nobody matches, to suggest generic
+    placeholders such as @AI_Expert. Without a directory only placeholders
+    are suggested.
+
+    Args:
+        directory: Connections to match against.
+        min_score: Minimum match score (0-1) for a connection to be suggested.
+        rerank: Let the model reorder the local matches by relevance.
     """
-    def __init__(self, api_key=None):
-        if api_key is None:
-            api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key:
-            raise ValueError("GOOGLE_API_KEY not found. Please set it or pass it.")
-        genai.configure(api_key=api_key)
-        llm = os.getenv("MODEL_NAME")
-        self.model = genai.GenerativeModel(llm)
+    def __init__(self, api_key=None, model=None, directory: Optional[ConnectionsDirectory] = None,
+                 min_score: float = 0.2, rerank: bool = False):
+        self.directory = directory
+        self.min_score = min_score
+        self.rerank = rerank
+        # A preconfigured model (e.g. a routed one) can be injected instead
+        if model is None:
+            load_env()
+            genai = get_genai()
+            if api_key is None:
+                api_key = os.getenv("GOOGLE_API_KEY")
+            if not api_key:
+                raise ValueError("GOOGLE_API_KEY not found. Please set it or pass it.")
+            genai.configure(api_key=api_key)
+            llm = os.getenv("MODEL_NAME")
+            model = genai.GenerativeModel(llm, system_instruction=SYSTEM_INSTRUCTION)
+        else:
+            model = with_system_instruction(model, SYSTEM_INSTRUCTION)
+        self.model = model
         
+        # Tag placeholders are short; a tight cap keeps the JSON response cheap
+        self.max_output_tokens = 96
+
         # Safety settings to ensure appropriate content
         self.safety_settings = [
             {
@@ -42,6 +90,46 @@ class TaggingAssist:
             }
         ]
 
+    def suggest_connections(self, text: str, max_tags: int = 3) -> list[tuple]:
+        """
+        Finds connections from the directory to tag in the post.
+
+        Args:
+            text: The post content.
+            max_tags: Maximum number of connections to return.
+
+        Returns:
+            A list of (Connection, score) tuples, best first; empty without a directory.
+        """
+        if self.directory is None:
+            return []
+        # Re-ranking gets a wider shortlist to choose from
+        shortlist = max_tags * 3 if self.rerank else max_tags
+        matches = [(c, score) for c, score in self.directory.match(text, shortlist) if score >= self.min_score]
+        if self.rerank and len(matches) > max_tags:
+            matches = self._rerank(text, matches)
+        return matches[:max_tags]
+
+    def _rerank(self, text: str, matches: list[tuple]) -> list[tuple]:
+        """Asks the model to order the shortlist by relevance; keeps the local order on failure."""
+        candidates = "\n".join(f"[{i}] {c.name}: {', '.join(c.expertise)}" for i, (c, _) in enumerate(matches))
+        task = ("Order these people by how relevant their expertise is to the LinkedIn post, most relevant first. "
+                f"Return their numbers as \"order\".\n{candidates}")
+        try:
+            response = generate_about_post(
+                self.model, task, text,
+                generation_config=json_generation_config(RERANK_SCHEMA, self.max_output_tokens)
+            )
+            order = [i for i in parse_structured(response, RERANK_SCHEMA)["order"] if 0 <= i < len(matches)]
+            order = list(dict.fromkeys(order))
+            # Anyone the model left out keeps its local rank after the reordered ones
+            return [matches[i] for i in order] + [m for i, m in enumerate(matches) if i not in order]
+        except StructuredOutputError as e:
+            print(f"Warning: Unusable re-rank response ({e}). Keeping local order.")
+        except Exception as e:
+            print(f"Error re-ranking tags: {e}. Keeping local order.")
+        return matches
+
     def suggest_tags(self, text: str, max_tags: int = 3) -> list[str]:
         """
         Suggests relevant people to tag based on the post content.
@@ -51,44 +139,32 @@ class TaggingAssist:
             max_tags: Maximum number of tags to suggest.
             
         Returns:
-            A list of tag placeholders (e.g., "@AI_Expert", "@Marketing_Leader").
-        """
-        prompt = f"""
-        Based on the following LinkedIn post content, suggest {max_tags} relevant professional roles or expertise areas 
-        that would be good to tag. These should be generic placeholders, not actual people's names.
-        
-        For example: @AI_Expert, @Marketing_Leader, @Startup_Founder
-        
-        Provide only the tag placeholders, one per line, starting with '@'.
-        
-        Post Content:
-        {text}
-        
-        Tag Suggestions:
+            A list of tags: mentions of matching connections (e.g. "@jane-doe") or,
+            without matches, placeholders (e.g., "@AI_Expert", "@Marketing_Leader").
         """
+        matches = self.suggest_connections(text, max_tags)
+        if matches:
+            return [connection.mention for connection, _ in matches]
+
+        task = f"Suggest {max_tags} roles or expertise areas that would be good to tag in the LinkedIn post."
         
         try:
-            generation_config = {
-                "temperature": 0.2,
-                "top_p": 0.8,
-                "top_k": 40,
-                "max_output_tokens": 256,
-            }
+            generation_config = json_generation_config(TAG_SCHEMA, self.max_output_tokens, top_p=0.8, top_k=40)
             
-            response = self.model.generate_content(
-                prompt,
+            response = generate_about_post(
+                self.model, task, text,
                 generation_config=generation_config,
                 safety_settings=self.safety_settings
             )
             
-            if response and response.candidates and response.candidates[0].content and response.candidates[0].content.parts:
-                tags_str = "".join([part.text for part in response.candidates[0].content.parts]).strip()
-                # Split lines, filter for valid tags, remove duplicates
-                tags = [t.strip() for t in tags_str.split('\n') if t.strip().startswith('@') and len(t.strip()) > 1]
-                return list(set(tags))[:max_tags]  # Return unique tags up to limit
-            else:
-                print("Warning: LLM response empty for tag suggestion. Returning empty list.")
-                return []
+            result = parse_structured(response, TAG_SCHEMA)
+            # Normalize, drop invalid entries, remove duplicates while keeping the model's order
+            tags = ["@" + t.strip().lstrip("@").replace(" ", "_") for t in result["tags"]]
+            tags = list(dict.fromkeys(t for t in tags if len(t) > 1))
+            return tags[:max_tags]
+        except StructuredOutputError as e:
+            print(f"Warning: Unusable tag response ({e}). Returning empty list.")
+            return []
         except Exception as e:
             print(f"Error suggesting tags: {e}. Returning empty list.")
             return []
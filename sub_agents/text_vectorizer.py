@@ -0,0 +1,94 @@
+# sub_agents/text_vectorizer.py
+import hashlib
+import math
+import re
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z0-9]+)*")
+CAMEL_CASE_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have
+having he her here hers herself him himself his how i if in into is it its itself just let me more
+most my myself no nor not now of off on once only or other our ours ourselves out over own same she
+should so some such than that the their theirs them themselves then there these they this those
+through to too under until up very was we were what when where which while who whom why will with
+would you your yours yourself yourselves new us get got also really like one way make
+""".split())
+
+
+def tokenize(text: str, drop_stopwords: bool = True) -> list[str]:
+    """
+    Lower-cases text and splits it into word tokens.
+
+    Args:
+        text: The input text.
+        drop_stopwords: Whether to remove common English stopwords.
+
+    Returns:
+        A list of tokens in their original order.
+    """
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    if drop_stopwords:
+        return [t for t in tokens if t not in STOPWORDS and len(t) > 1]
+    return tokens
+
+
+def stem(token: str) -> str:
+    """Strips a few common English suffixes so simple inflections share a feature."""
+    for suffix in ("ing", "ed", "es", "s"):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[:-len(suffix)]
+    return token
+
+
+def split_hashtag(hashtag: str) -> list[str]:
+    """Splits a CamelCase hashtag such as '#MachineLearning' into lower-case words."""
+    return [part.lower() for part in CAMEL_CASE_PATTERN.findall(hashtag.lstrip("#@"))]
+
+
+class HashingVectorizer:
+    """
+    Stateless text vectorizer that hashes features into a fixed-size sparse space.
+
+    Features are stemmed word unigrams, word bigrams and character n-grams of
+    each word, so inflections such as "launch"/"launching" still overlap. Vectors are sparse
+    dicts of {bucket: weight} normalised to unit length, so the dot product of two
+    vectors is their cosine similarity. No fitting or vocabulary is needed.
+    """
+    def __init__(self, n_features: int = 1 << 18, char_ngram: int = 3):
+        self.n_features = n_features
+        self.char_ngram = char_ngram
+
+    def _bucket(self, feature: str) -> int:
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "little") % self.n_features
+
+    def features(self, text: str) -> list[str]:
+        tokens = [stem(t) for t in tokenize(text)]
+        features = [f"w:{t}" for t in tokens]
+        features.extend(f"b:{a} {b}" for a, b in zip(tokens, tokens[1:]))
+        n = self.char_ngram
+        for token in tokens:
+            padded = f"<{token}>"
+            features.extend(f"c:{padded[i:i + n]}" for i in range(len(padded) - n + 1))
+        return features
+
+    def transform(self, text: str) -> dict[int, float]:
+        """Returns the unit-length sparse vector for the text."""
+        vector: dict[int, float] = {}
+        for feature in self.features(text):
+            bucket = self._bucket(feature)
+            vector[bucket] = vector.get(bucket, 0.0) + 1.0
+        norm = math.sqrt(sum(w * w for w in vector.values()))
+        if norm:
+            for bucket in vector:
+                vector[bucket] /= norm
+        return vector
+
+
+def cosine(a: dict[int, float], b: dict[int, float]) -> float:
+    """Cosine similarity of two unit-length sparse vectors."""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b.get(bucket, 0.0) for bucket, weight in a.items())
@@ -1,9 +1,22 @@
 # sub_agents/tone_style_selector.py
-import google.generativeai as genai
 import os
-from dotenv import load_dotenv, find_dotenv
 
-load_dotenv(find_dotenv())
+from sub_agents.structured_output import StructuredOutputError, json_generation_config, parse_structured
+from sub_agents.prompting import generate_about_post, with_system_instruction
+from sub_agents.runtime import get_genai, load_env
+
+REWRITE_SCHEMA = {
+    "type": "object",
+    "properties": {"text": {"type": "string"}},
+    "required": ["text"],
+}
+
+SYSTEM_INSTRUCTION = """
+You rewrite LinkedIn post drafts in a requested tone.
+Focus on adjusting vocabulary, sentence structure, and formality without losing the core message.
+Return only the rewritten post as "text".
+"""
+
 
 class ToneStyleSelector:
     """
@@ -18,15 +31,24 @@ class ToneStyleSelector:
         The text adjusted to the specified tone and style.
 
     """
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, model=None):
         # Initialize the Generative AI model
-        if api_key is None:
-            api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key:
-            raise ValueError("GOOGLE_API_KEY not found. Please set it or pass it.")
-        genai.configure(api_key=api_key)
-        llm = os.getenv("MODEL_NAME")
-        self.model = genai.GenerativeModel(llm)
+        # A preconfigured model (e.g. a routed one) can be injected instead
+        if model is None:
+            load_env()
+            genai = get_genai()
+            if api_key is None:
+                api_key = os.getenv("GOOGLE_API_KEY")
+            if not api_key:
+                raise ValueError("GOOGLE_API_KEY not found. Please set it or pass it.")
+            genai.configure(api_key=api_key)
+            llm = os.getenv("MODEL_NAME")
+            model = genai.GenerativeModel(llm, system_instruction=SYSTEM_INSTRUCTION)
+        else:
+            model = with_system_instruction(model, SYSTEM_INSTRUCTION)
+        self.model = model
+        # Enough for a full-length (~3000 character) post
+        self.max_output_tokens = 2048
 
     def apply_tone_style(self, text: str, tone: str) -> str:
         """
@@ -39,24 +61,20 @@ class ToneStyleSelector:
         Returns:
             The text adjusted to the specified tone and style.
         """
-        prompt = f"""
-        Rewrite the following text in a {tone} tone suitable for a LinkedIn post.
-        Focus on adjusting vocabulary, sentence structure, and formality without losing the core message.
-        make sure you only the converted text content in the output and no additional text.
-
-        Original Text:
-        {text}
-
-        Rewritten Text ({tone} Tone):
-        """
+        task = f"Rewrite the post in a {tone} tone suitable for LinkedIn."
         try:
-            response = self.model.generate_content(prompt)
-            # Accessing text from Content object response
-            if response and response.candidates and response.candidates[0].content and response.candidates[0].content.parts:
-                 return "".join([part.text for part in response.candidates[0].content.parts])
-            else:
-                print(f"Warning: LLM response empty for tone adjustment. Returning original text.")
-                return text
+            response = generate_about_post(
+                self.model, task, text,
+                generation_config=json_generation_config(REWRITE_SCHEMA, self.max_output_tokens, temperature=0.5)
+            )
+            rewritten = parse_structured(response, REWRITE_SCHEMA)["text"].strip()
+            if rewritten:
+                return rewritten
+            print(f"Warning: LLM response empty for tone adjustment. Returning original text.")
+            return text
+        except StructuredOutputError as e:
+            print(f"Warning: Unusable tone adjustment response ({e}). Returning original text.")
+            return text
         except Exception as e:
             print(f"Error applying tone '{tone}': {e}. Returning original text.")
             return text
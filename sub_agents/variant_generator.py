@@ -0,0 +1,135 @@
+# sub_agents/variant_generator.py
+import os
+import re
+from typing import Optional
+
+from sub_agents.charachter_formater import SURFACE_LIMITS, CharacterFormatter
+from sub_agents.structured_output import StructuredOutputError, json_generation_config, parse_structured
+from sub_agents.prompting import generate_about_post, with_system_instruction
+from sub_agents.runtime import get_genai, load_env
+
+VARIANT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "comment": {"type": "string"},
+        "headline": {"type": "string"},
+    },
+    "required": ["comment", "headline"],
+}
+
+SYSTEM_INSTRUCTION = f"""
+You adapt LinkedIn posts to other LinkedIn surfaces.
+"comment": a teaser comment that sums up the post and invites readers to it, at most {SURFACE_LIMITS["comment"]} characters.
+"headline": a single-line headline for the post, at most {SURFACE_LIMITS["headline"]} characters, without hashtags.
+Keep the post's tone and facts. Do not invent new claims.
+"""
+
+_FIRST_SENTENCE = re.compile(r"^.+?[.!?](?=\s|$)", re.S)
+
+
+class VariantGenerator:
+    """
+    Produces the comment and headline variants of a finished post in one
+    structured call and fits every surface to its limit locally.
+
+    The post itself is the post variant, so the hashtags, tags and
+    validation already computed for it are shared with the other surfaces:
+    hashtags are appended where they fit, and validation issues carry over
+    to every variant that still contains the quoted text.
+    """
+    def __init__(self, api_key=None, model=None, formatter: Optional[CharacterFormatter] = None):
+        # A preconfigured model (e.g. a routed one) can be injected instead
+        if model is None:
+            load_env()
+            genai = get_genai()
+            if api_key is None:
+                api_key = os.getenv("GOOGLE_API_KEY")
+            if not api_key:
+                raise ValueError("GOOGLE_API_KEY not found. Please set it or pass it.")
+            genai.configure(api_key=api_key)
+            llm = os.getenv("MODEL_NAME")
+            model = genai.GenerativeModel(llm, system_instruction=SYSTEM_INSTRUCTION)
+        else:
+            model = with_system_instruction(model, SYSTEM_INSTRUCTION)
+        self.model = model
+        # Local fitting only; the formatter's own model is never called
+        self.formatter = formatter or CharacterFormatter(model=model)
+        # Both variants together are at most ~1500 characters
+        self.max_output_tokens = (SURFACE_LIMITS["comment"] + SURFACE_LIMITS["headline"]) // 3 + 64
+
+    def _draft_variants(self, post: str) -> dict[str, str]:
+        task = "Write the comment and headline variants of the LinkedIn post."
+        try:
+            response = generate_about_post(
+                self.model, task, post,
+                generation_config=json_generation_config(VARIANT_SCHEMA, self.max_output_tokens)
+            )
+            return parse_structured(response, VARIANT_SCHEMA)
+        except StructuredOutputError as e:
+            print(f"Warning: Unusable variant response ({e}). Deriving variants locally.")
+        except Exception as e:
+            print(f"Error generating variants: {e}. Deriving variants locally.")
+        # Local fallback: the opening sentence as headline, the start of the post as comment
+        first = _FIRST_SENTENCE.match(post.strip())
+        return {"comment": post, "headline": (first.group(0) if first else post).replace("\n", " ")}
+
+    def _with_hashtags(self, text: str, hashtags: list[str], limit: int) -> tuple[str, list[str]]:
+        """Appends as many hashtags as fit within the limit, in their suggested order."""
+        used = []
+        for hashtag in hashtags:
+            line = " ".join(used + [hashtag])
+            if len(text) + 2 + len(line) > limit:
+                break
+            used.append(hashtag)
+        return (f"{text}\n\n{' '.join(used)}" if used else text), used
+
+    def generate_variants(self, post: str, hashtags: Optional[list[str]] = None, tags: Optional[list[str]] = None,
+                          validation_issues: Optional[list] = None) -> dict[str, dict]:
+        """
+        Builds the post, comment and headline variants of a post.
+
+        Args:
+            post: The finished post (already within the post limit).
+            hashtags: Hashtags suggested for the post; appended to the post and comment where they fit.
+            tags: Tag suggestions for the post, shared by all variants.
+            validation_issues: ValidationIssues found in the post.
+
+        Returns:
+            A dict per surface with "text", "character_count", "limit", "hashtags",
+            "tags" and "validation_issues" (those without a quote or whose quote the variant
+            still contains).
+        """
+        hashtags = hashtags or []
+        drafts = self._draft_variants(post)
+        texts = {"post": post, "comment": drafts["comment"], "headline": drafts["headline"].replace("\n", " ")}
+
+        variants = {}
+        for surface, text in texts.items():
+            limit = self.formatter.max_chars if surface == "post" else SURFACE_LIMITS[surface]
+            text = self.formatter.fit_surface(text, surface)
+            if surface == "comment" and hashtags:
+                # The comment is written for the variant; shorten it to leave room for the hashtags
+                text = self.formatter.trim_locally(text, limit - 2 - len(" ".join(hashtags)))
+            used = []
+            if surface != "headline":
+                text, used = self._with_hashtags(text, hashtags, limit)
+            issues = [issue for issue in validation_issues or [] if not issue.quote or issue.quote in text]
+            variants[surface] = {
+                "text": text,
+                "character_count": len(text),
+                "limit": limit,
+                "hashtags": used,
+                "tags": list(tags or []),
+                "validation_issues": [str(issue) for issue in issues],
+            }
+        return variants
+
+
+# Example usage (for testing)
+if __name__ == '__main__':
+    generator = VariantGenerator()
+    post = ("We just launched an AI-powered support assistant. It answers customer questions in seconds "
+            "and hands complex cases to our team with full context. Early pilots cut response times by 60%.")
+    variants = generator.generate_variants(post, hashtags=["#AI", "#CustomerSupport"], tags=["@Support_Leader"])
+    for surface, variant in variants.items():
+        print(f"{surface} ({variant['character_count']}/{variant['limit']}):\n{variant['text']}\n")
@@ -0,0 +1,91 @@
+# tests/conftest.py
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model_router import STAGES, ModelRouter  # noqa: E402
+
+
+class _Part:
+    def __init__(self, text):
+        self.text = text
+
+
+class _Content:
+    def __init__(self, text):
+        self.parts = [_Part(text)]
+
+
+class _Candidate:
+    def __init__(self, text):
+        self.content = _Content(text)
+        self.finish_reason = "STOP"
+
+
+class _Usage:
+    def __init__(self, prompt_tokens, output_tokens):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+
+
+class FakeResponse:
+    """Minimal GenerateContentResponse: one candidate and usage metadata."""
+    def __init__(self, text: str):
+        self.text = text
+        self.candidates = [_Candidate(text)] if text else []
+        self.usage_metadata = _Usage(100, max(1, len(text) // 4))
+
+
+def default_handler(stage, contents, kwargs):
+    """Answers each stage with a plausible response (JSON for structured stages)."""
+    text = contents if isinstance(contents, str) else json.dumps(contents, default=str)
+    schema = (kwargs.get("generation_config") or {}).get("response_schema")
+    if schema is None:
+        if stage == "draft":
+            return "We launched an AI support tool. It answers customer questions instantly."
+        return "Traduction."
+    props = schema["properties"]
+    if "hashtags" in props:
+        return json.dumps({"hashtags": ["#AI", "#Support"]})
+    if "tags" in props:
+        return json.dumps({"tags": ["@AI_Expert"]})
+    if "cta" in props:
+        return json.dumps({"cta": "How would your team use AI support?"})
+    if "issues" in props:
+        return json.dumps({"issues": []})
+    if "text" in props:
+        return json.dumps({"text": text.split("Original Text:")[-1].strip()[:500]})
+    return "{}"
+
+
+class StubModel:
+    """Stand-in for genai.GenerativeModel that answers through its router's handler."""
+    def __init__(self, router, name):
+        self.router = router
+        self.model_name = name
+        self.stage = name.removeprefix("stub-")
+
+    def generate_content(self, contents, **kwargs):
+        self.router.calls.append(self.stage)
+        return FakeResponse(self.router.handler(self.stage, contents, kwargs))
+
+
+class StubRouter(ModelRouter):
+    """ModelRouter whose models are StubModels named after their stage, so the handler knows the caller."""
+    def __init__(self, handler=default_handler, **kwargs):
+        super().__init__(stage_models={stage: f"stub-{stage}" for stage in STAGES}, fallback_models=[],
+                         api_key="test", **kwargs)
+        self.handler = handler
+        self.calls = []
+
+    def get_model(self, name, system_instruction=None, api_key=None):
+        return StubModel(self, name)
+
+
+@pytest.fixture
+def stub_router():
+    return StubRouter()
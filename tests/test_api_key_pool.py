@@ -0,0 +1,40 @@
+# tests/test_api_key_pool.py
+import pytest
+
+from api_key_pool import ApiKeyPool, bind_client
+from model_router import ModelRouter
+
+
+class FakeClient:
+    """Records requests and answers like GenerativeServiceClient.generate_content."""
+    def __init__(self, key):
+        self.key = key
+        self.requests = []
+
+    def generate_content(self, request, **kwargs):
+        from google.generativeai import protos
+        self.requests.append(request)
+        return protos.GenerateContentResponse(candidates=[
+            protos.Candidate(content=protos.Content(parts=[protos.Part(text=f"answered with {self.key}")], role="model"),
+                             finish_reason=protos.Candidate.FinishReason.STOP)
+        ])
+
+
+def test_sdk_model_uses_the_bound_per_key_client():
+    # Guards the private GenerativeModel._client hook that bind_client relies on
+    pytest.importorskip("google.generativeai")
+    pool = ApiKeyPool(["key-one", "key-two"])
+    clients = {}
+    pool.client = lambda key: clients.setdefault(key, FakeClient(key))
+    router = ModelRouter(stage_models={"draft": "gemini-test"}, key_pool=pool)
+
+    response = router.get_model("gemini-test", api_key="key-two").generate_content("Write a post.")
+    assert response.text == "answered with key-two"
+    assert len(clients["key-two"].requests) == 1
+    assert clients["key-two"].requests[0].model == "models/gemini-test"
+
+
+def test_bind_client_rejects_models_without_a_client_hook():
+    pytest.importorskip("google.generativeai")
+    with pytest.raises(RuntimeError, match="_client"):
+        bind_client(object(), FakeClient("key-one"))
@@ -0,0 +1,69 @@
+# tests/test_circuit_breaker.py
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, BreakerRegistry, CircuitBreaker, CircuitOpenError
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_opens_after_threshold_and_short_circuits(clock):
+    breaker = CircuitBreaker("draft", failure_threshold=2, recovery_timeout=30)
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.check()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    assert breaker.snapshot()["short_circuited_calls"] == 1
+
+
+def test_success_resets_consecutive_failures(clock):
+    breaker = CircuitBreaker("draft", failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_trial_closes_on_success(clock):
+    breaker = CircuitBreaker("draft", failure_threshold=1, recovery_timeout=30, half_open_max_calls=1)
+    breaker.record_failure()
+    clock[0] += 29
+    assert breaker.state == OPEN
+    clock[0] += 1
+    assert breaker.state == HALF_OPEN
+    breaker.check()  # the one trial call
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    breaker.check()
+
+
+def test_half_open_trial_reopens_on_failure(clock):
+    breaker = CircuitBreaker("draft", failure_threshold=3, recovery_timeout=30)
+    for _ in range(3):
+        breaker.record_failure()
+    clock[0] += 30
+    breaker.check()
+    breaker.record_failure()  # a single failure is enough while half-open
+    assert breaker.state == OPEN
+    assert breaker.snapshot()["times_opened"] == 2
+    clock[0] += 29
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+
+def test_registry_applies_overrides_and_reports_open_stages(clock):
+    registry = BreakerRegistry(failure_threshold=3, overrides={"draft": {"failure_threshold": 1}})
+    registry.get("draft").record_failure()
+    registry.get("cta").record_failure()
+    assert registry.get("draft") is registry.get("draft")
+    assert registry.open_stages() == ["draft"]
@@ -0,0 +1,50 @@
+# tests/test_context_cache.py
+import types
+
+import context_cache
+from context_cache import ContextCacheManager
+
+
+class FakeGenai:
+    """Stands in for google.generativeai: caching.CachedContent.create fails while failures remain."""
+    def __init__(self, failures):
+        self.failures = failures
+        self.uploads = 0
+        fake = self
+
+        class CachedContent:
+            @staticmethod
+            def create(**kwargs):
+                fake.uploads += 1
+                if fake.failures:
+                    fake.failures -= 1
+                    raise RuntimeError("429 Resource exhausted")
+                return types.SimpleNamespace(name=f"cachedContents/{fake.uploads}")
+
+        class GenerativeModel:
+            @staticmethod
+            def from_cached_content(cached_content):
+                return ("model", cached_content.name)
+
+        self.caching = types.SimpleNamespace(CachedContent=CachedContent)
+        self.GenerativeModel = GenerativeModel
+
+
+def test_failed_upload_is_retried_after_cooldown(monkeypatch):
+    now = [1000.0]
+    genai = FakeGenai(failures=1)
+    monkeypatch.setattr(context_cache.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(context_cache, "get_genai", lambda: genai)
+    cache = ContextCacheManager(min_tokens=0, failure_cooldown=60)
+
+    assert cache.acquire("gemini-test", "A post.") is None
+    assert not cache._key_locks  # the failed key keeps no lock behind
+    now[0] += 59
+    assert cache.acquire("gemini-test", "A post.") is None
+    assert genai.uploads == 1  # still cooling down: served inline without another upload
+
+    now[0] += 1
+    assert cache.acquire("gemini-test", "A post.") == ("model", "cachedContents/2")
+    assert cache.acquire("gemini-test", "A post.") == ("model", "cachedContents/2")
+    assert genai.uploads == 2
+    assert cache.stats()["failures"] == 1 and cache.stats()["hits"] == 1
@@ -0,0 +1,132 @@
+# tests/test_main_agent.py
+from conftest import StubRouter, default_handler
+from main_agent import DRAFT_ERROR, LinkedInPostGenerator
+
+
+def test_fallback_results_are_not_memoized():
+    failures = {"draft": 1}
+
+    def flaky(stage, contents, kwargs):
+        if failures.get(stage):
+            failures[stage] -= 1
+            raise RuntimeError("backend unavailable")
+        return default_handler(stage, contents, kwargs)
+
+    generator = LinkedInPostGenerator(api_key="test", model_router=StubRouter(flaky))
+    first = generator.generate_linkedin_post("AI support launch")
+    assert DRAFT_ERROR in first["final_post"]
+
+    # The backend recovered: the same request must not be served the memoized fallback
+    second = generator.generate_linkedin_post("AI support launch")
+    assert DRAFT_ERROR not in second["final_post"]
+    assert "draft" not in second["cached_stages"]
+
+    third = generator.generate_linkedin_post("AI support launch")
+    assert "draft" in third["cached_stages"]
+    assert third["final_post"] == second["final_post"]
+
+
+def test_unusable_structured_response_is_not_memoized():
+    responses = {"cta": ["not json"]}
+
+    def handler(stage, contents, kwargs):
+        if responses.get(stage):
+            return responses[stage].pop()
+        return default_handler(stage, contents, kwargs)
+
+    generator = LinkedInPostGenerator(api_key="test", model_router=StubRouter(handler))
+    generator.generate_linkedin_post("AI support launch")
+    second = generator.generate_linkedin_post("AI support launch")
+    assert "cta" not in second["cached_stages"]
+    assert second["suggested_cta"] == "How would your team use AI support?"
+
+
+def test_fallback_output_is_not_cached_or_recorded(tmp_path):
+    from history_store import HistoryStore
+    from semantic_cache import SemanticCache
+
+    failures = {"draft": 1}
+
+    def flaky(stage, contents, kwargs):
+        if failures.get(stage):
+            failures[stage] -= 1
+            raise RuntimeError("backend unavailable")
+        return default_handler(stage, contents, kwargs)
+
+    cache = SemanticCache()
+    history = HistoryStore(str(tmp_path / "history.db"))
+    generator = LinkedInPostGenerator(api_key="test", model_router=StubRouter(flaky),
+                                      semantic_cache=cache, history_store=history)
+    first = generator.generate_linkedin_post("AI support launch")
+    assert first["fallback_stages"] == ["draft"]
+    assert len(cache) == 0 and history.count() == 0
+    assert "history_id" not in first
+
+    second = generator.generate_linkedin_post("AI support launch")
+    assert second["fallback_stages"] == []
+    assert "semantic_cache" not in second
+    assert len(cache) == 1 and history.count() == 1
+    history.close()
+
+
+def test_stages_reading_stores_see_updates():
+    from sub_agents.engagement_history import EngagementHistory
+    from sub_agents.hashtag_index import HashtagIndex
+
+    history = EngagementHistory()
+    index = HashtagIndex()
+    generator = LinkedInPostGenerator(api_key="test", model_router=StubRouter(),
+                                      engagement_history=history, hashtag_index=index)
+    first = generator.generate_linkedin_post("AI support launch")
+    assert "hashtags" in generator.generate_linkedin_post("AI support launch")["cached_stages"]
+
+    history.add_row("2024-05-07T10:00:00", "general", 1000, 90)
+    index.add_post("Our AI support tool answers customer questions.", ["#CustomerSupport"])
+    updated = generator.generate_linkedin_post("AI support launch")
+    assert updated["timing_advice"] != first["timing_advice"]
+    assert "Tuesday 10:00-11:00" in updated["timing_advice"]
+    assert "hashtags" not in updated["cached_stages"]
+    assert "draft" in updated["cached_stages"]
+
+
+def test_concurrent_generations_report_their_own_usage():
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    barrier = threading.Barrier(2, timeout=5)
+
+    def overlapping(stage, contents, kwargs):
+        if stage == "draft":
+            barrier.wait()  # both requests are inside the pipeline at once
+        return default_handler(stage, contents, kwargs)
+
+    generator = LinkedInPostGenerator(api_key="test", model_router=StubRouter(overlapping))
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        outputs = list(executor.map(generator.generate_linkedin_post, ["AI support launch", "Quarterly hiring update"]))
+    for output in outputs:
+        assert output["token_usage"]["draft"]["calls"] == 1
+        assert output["models_used"]["draft"] == "stub-draft"
+
+
+def test_topic_cta_is_only_replaced_by_a_clearly_better_common_one():
+    from sub_agents.engagement_predictor import EngagementPredictor
+
+    class FixedPredictor(EngagementPredictor):
+        def __init__(self, scores):
+            super().__init__()
+            self.scores = scores
+            self.quantiles = [i / 100 for i in range(101)]
+
+        def predict(self, text, hashtags=None, cta=""):
+            return self.scores.get(cta, 0.0)
+
+    topic_cta = "Which support queue would you hand to AI first?"
+    generator = LinkedInPostGenerator(api_key="test", model_router=StubRouter(),
+                                      engagement_predictor=FixedPredictor({topic_cta: 0.50, "What's your take?": 0.60}))
+    assert generator._rank_cta("We launched an AI support tool.", topic_cta) == topic_cta
+
+    generator.engagement_predictor.scores["What's your take?"] = 0.70
+    assert generator._rank_cta("We launched an AI support tool.", topic_cta) == "What's your take?"
+
+    generator.cta_replace_margin = 0.25
+    assert generator._rank_cta("We launched an AI support tool.", topic_cta) == topic_cta
@@ -0,0 +1,106 @@
+# tests/test_pipeline_dag.py
+import threading
+
+import pytest
+
+from pipeline_dag import StageGraph
+from sub_agents.runtime import fallback_scope, note_fallback
+
+
+def _graph(calls, **kwargs):
+    graph = StageGraph(max_workers=4, **kwargs)
+
+    def stage(name, fn):
+        def run(**inputs):
+            calls.append(name)
+            return fn(**inputs)
+        return run
+
+    graph.add_stage("double", stage("double", lambda x: 2 * x), ["x"], ["doubled"])
+    graph.add_stage("square", stage("square", lambda x: x * x), ["x"], ["squared"])
+    graph.add_stage("sum", stage("sum", lambda doubled, squared, offset: doubled + squared + offset),
+                    ["doubled", "squared", "offset"], ["total"])
+    return graph
+
+
+def test_stages_run_after_their_dependencies():
+    calls, finished = [], []
+    values, report = _graph(calls).run({"x": 3, "offset": 1}, on_stage=lambda name, outputs, _: finished.append(name))
+    assert values["total"] == 6 + 9 + 1
+    assert calls[-1] == "sum" and finished[-1] == "sum"
+    assert sorted(finished) == ["double", "square", "sum"]
+    assert not any(r["cached"] for r in report.values())
+
+
+def test_independent_stages_run_concurrently():
+    graph = StageGraph(max_workers=2)
+    barrier = threading.Barrier(2, timeout=5)
+
+    def meet(x):
+        barrier.wait()  # times out if the stages run one after another
+        return x
+
+    graph.add_stage("a", meet, ["x"], ["a"])
+    graph.add_stage("b", meet, ["x"], ["b"])
+    values, _ = graph.run({"x": 7})
+    assert values["a"] == values["b"] == 7
+
+
+def test_cycle_and_missing_inputs_are_rejected():
+    graph = StageGraph()
+    graph.add_stage("a", lambda b: b, ["b"], ["a"])
+    graph.add_stage("b", lambda a: a, ["a"], ["b"])
+    with pytest.raises(ValueError, match="cyclic"):
+        graph.run({})
+
+    graph = StageGraph()
+    graph.add_stage("a", lambda missing: missing, ["missing"], ["a"])
+    with pytest.raises(ValueError, match="missing inputs"):
+        graph.run({})
+
+    with pytest.raises(ValueError, match="already produced"):
+        graph.add_stage("other", lambda: 1, [], ["a"])
+
+
+def test_memo_is_invalidated_only_downstream_of_changed_inputs():
+    calls = []
+    graph = _graph(calls)
+    graph.run({"x": 3, "offset": 1})
+    calls.clear()
+
+    values, report = graph.run({"x": 3, "offset": 2})
+    assert calls == ["sum"] and values["total"] == 17
+    assert report["double"]["cached"] and report["square"]["cached"]
+
+    calls.clear()
+    graph.run({"x": 4, "offset": 2})
+    assert sorted(calls) == ["double", "square", "sum"]
+
+    calls.clear()
+    graph.run({"x": 4, "offset": 2}, use_memo=False)
+    assert sorted(calls) == ["double", "square", "sum"]
+
+
+def test_unmemoized_and_degraded_stages_rerun():
+    calls = []
+    fail = [True]
+
+    def flaky(x):
+        calls.append("flaky")
+        if fail[0]:
+            note_fallback("backend down")
+            return -1
+        return x
+
+    graph = StageGraph(fallback_scope=fallback_scope)
+    graph.add_stage("flaky", flaky, ["x"], ["y"])
+    graph.add_stage("local", lambda x: calls.append("local") or x, ["x"], ["z"], memoize=False)
+
+    _, report = graph.run({"x": 5})
+    assert report["flaky"]["degraded"]
+    fail[0] = False
+    values, report = graph.run({"x": 5})
+    assert values["y"] == 5 and not report["flaky"]["cached"] and not report["flaky"]["degraded"]
+    _, report = graph.run({"x": 5})
+    assert report["flaky"]["cached"] and not report["local"]["cached"]
+    assert calls.count("flaky") == 2 and calls.count("local") == 3
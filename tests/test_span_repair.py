@@ -0,0 +1,49 @@
+# tests/test_span_repair.py
+import json
+
+from conftest import FakeResponse
+from sub_agents.content_validator import locate_quote
+from sub_agents.span_repair import SpanRepairer, sentence_span
+from sub_agents.structured_output import ValidationIssue
+
+
+class FixedModel:
+    def __init__(self, fixes):
+        self.fixes = fixes
+
+    def generate_content(self, contents, **kwargs):
+        return FakeResponse(json.dumps({"fixes": [{"id": i, "text": text} for i, text in enumerate(self.fixes)]}))
+
+
+def _issue(text, quote):
+    start, end = locate_quote(text, quote)
+    return ValidationIssue("tone", "Too informal.", quote, start, end)
+
+
+def test_span_ending_at_terminal_punctuation_stays_in_its_sentence():
+    text = "We shipped it lol. Next we hire. Then more!"
+    start = text.index("shipped")
+    assert text[slice(*sentence_span(text, start, text.index(".") + 1))] == "We shipped it lol."
+    assert text[slice(*sentence_span(text, start, start + 7))] == "We shipped it lol."
+    last = text.index("Then")
+    assert text[slice(*sentence_span(text, last, len(text)))] == "Then more!"
+
+
+def test_fix_still_containing_the_quote_is_rejected():
+    text = "We shipped it lol. Next we hire."
+    issue = _issue(text, ' "shipped it  lol" ')
+    repaired, reports = SpanRepairer(model=FixedModel(["We  shipped it lol!"])).repair(text, [issue])
+    assert repaired == text and not reports[0]["resolved"]
+
+    repaired, reports = SpanRepairer(model=FixedModel(["We shipped it."])).repair(text, [issue])
+    assert repaired == "We shipped it. Next we hire." and reports[0]["resolved"]
+
+
+def test_capitalization_only_fix_is_accepted():
+    text = "i think we shipped it. We use linkedin daily."
+    issues = [_issue(text, "i think"), _issue(text, "linkedin")]
+    issues[1].category = "spelling"
+    fixes = ["I think we shipped it.", "We use LinkedIn daily."]
+    repaired, reports = SpanRepairer(model=FixedModel(fixes)).repair(text, issues)
+    assert repaired == "I think we shipped it. We use LinkedIn daily."
+    assert all(report["resolved"] for report in reports)
@@ -0,0 +1,32 @@
+# tests/test_traffic_recorder.py
+import pytest
+
+from conftest import FakeResponse
+from traffic_recorder import ReplayError, TrafficRecorder, TrafficReplay
+
+
+def _record(path):
+    recorder = TrafficRecorder(str(path))
+    for stage, text in [("draft", "A recorded draft."), ("hashtags", '{"hashtags": ["#AI"]}')]:
+        recorder.record_model_call(stage, "gemini-test", f"{stage} prompt", {}, 0.0, 0.0, FakeResponse(text))
+    recorder.close()
+
+
+def test_diverged_request_falls_back_within_its_stage(tmp_path):
+    path = tmp_path / "traffic.jsonl"
+    _record(path)
+    replay = TrafficReplay(str(path), time_scale=0)
+
+    assert replay.model("gemini-test", "hashtags").generate_content("a changed prompt").text == '{"hashtags": ["#AI"]}'
+    assert replay.model("gemini-test", "draft").generate_content("a changed prompt").text == "A recorded draft."
+    # The exact request is still matched whatever the stage
+    assert replay.generate("gemini-test", "draft prompt", "hashtags").text == "A recorded draft."
+
+
+def test_no_fallback_across_stages(tmp_path):
+    path = tmp_path / "traffic.jsonl"
+    _record(path)
+    with pytest.raises(ReplayError, match="stage 'cta'"):
+        TrafficReplay(str(path), time_scale=0).generate("gemini-test", "a changed prompt", "cta")
+    with pytest.raises(ReplayError):
+        TrafficReplay(str(path), time_scale=0, strict=True).generate("gemini-test", "a changed prompt", "draft")
@@ -0,0 +1,12 @@
+# tests/test_translation_memory.py
+from translation_memory import TranslationMemory
+
+
+def test_reuse_requires_same_words_and_punctuation():
+    memory = TranslationMemory(":memory:")
+    memory.add("You agree with the new policy.", "Estás de acuerdo con la nueva política.", "Spanish")
+
+    assert memory.lookup("you agree with the new  policy. 👍", "Spanish")["reusable"]
+    question = memory.lookup("You agree with the new policy?", "Spanish")
+    assert question is not None and not question["reusable"]
+    assert not memory.lookup("You agree with the old policy.", "Spanish")["reusable"]
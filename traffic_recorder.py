@@ -0,0 +1,348 @@
+# traffic_recorder.py
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterator, Optional
+
+
+def _open(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=repr)
+
+
+def prompt_fingerprint(model_name: str, contents: Any) -> str:
+    """Stable hash of a model request, used to match replayed calls."""
+    return hashlib.sha256(_dumps([model_name, contents]).encode("utf-8")).hexdigest()[:32]
+
+
+def _response_text(response) -> str:
+    if response and response.candidates and response.candidates[0].content and response.candidates[0].content.parts:
+        return "".join([part.text for part in response.candidates[0].content.parts])
+    return ""
+
+
+def _usage(response) -> Optional[dict]:
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return None
+    return {
+        "prompt_tokens": getattr(usage, "prompt_token_count", 0),
+        "output_tokens": getattr(usage, "candidates_token_count", 0),
+        "cached_tokens": getattr(usage, "cached_content_token_count", 0),
+    }
+
+
+class TrafficRecorder:
+    """
+    Appends model calls, LinkedIn HTTP exchanges and top-level requests to a
+    compact JSON-lines log (gzip-compressed when the path ends in .gz).
+
+    Every entry carries "t", the offset in seconds since the recorder started,
+    and "duration", so a replay can reproduce the original timing.
+    """
+    def __init__(self, path: str, store_prompts: bool = True):
+        self.path = path
+        self.store_prompts = store_prompts
+        self._file = _open(path, "a")
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+
+    def _write(self, entry: dict) -> None:
+        line = _dumps(entry)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def offset(self) -> float:
+        return time.monotonic() - self._start
+
+    def record_model_call(self, stage: Optional[str], model_name: str, contents: Any, kwargs: dict,
+                          started: float, duration: float, response=None, error: Optional[Exception] = None) -> None:
+        entry = {
+            "kind": "model",
+            "t": started,
+            "duration": duration,
+            "stage": stage,
+            "model": model_name,
+            "key": prompt_fingerprint(model_name, contents),
+            "config": kwargs.get("generation_config"),
+        }
+        if self.store_prompts:
+            entry["contents"] = contents
+        if error is not None:
+            entry["error"] = str(error)
+        else:
+            entry["text"] = _response_text(response)
+            entry["usage"] = _usage(response)
+        self._write(entry)
+
+    def record_http(self, method: str, url: str, request_body: Any, started: float, duration: float,
+                    status_code: Optional[int] = None, response_body: Optional[str] = None,
+                    error: Optional[Exception] = None) -> None:
+        entry = {"kind": "http", "t": started, "duration": duration, "method": method, "url": url, "request": request_body}
+        if error is not None:
+            entry["error"] = str(error)
+        else:
+            entry["status"] = status_code
+            entry["body"] = response_body
+        self._write(entry)
+
+    def record_request(self, params: dict, started: float, duration: float) -> None:
+        self._write({"kind": "request", "t": started, "duration": duration, "params": params})
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RecordingModel:
+    """Wraps a genai.GenerativeModel and records each generate_content call."""
+    def __init__(self, model, model_name: str, recorder: TrafficRecorder, stage: Optional[str] = None):
+        self.model = model
+        self.model_name = model_name
+        self.recorder = recorder
+        self.stage = stage
+
+    def generate_content(self, contents, **kwargs):
+        started = self.recorder.offset()
+        start = time.perf_counter()
+        try:
+            response = self.model.generate_content(contents, **kwargs)
+        except Exception as e:
+            self.recorder.record_model_call(self.stage, self.model_name, contents, kwargs, started,
+                                            time.perf_counter() - start, error=e)
+            raise
+        self.recorder.record_model_call(self.stage, self.model_name, contents, kwargs, started,
+                                        time.perf_counter() - start, response=response)
+        return response
+
+
+class RecordingSession:
+    """Wraps requests (or a requests.Session) and records each HTTP exchange."""
+    def __init__(self, recorder: TrafficRecorder, session=None):
+        if session is None:
+            import requests
+            session = requests
+        self.session = session
+        self.recorder = recorder
+
+    def request(self, method: str, url: str, **kwargs):
+        started = self.recorder.offset()
+        start = time.perf_counter()
+        body = kwargs.get("json", kwargs.get("data"))
+        if isinstance(body, (bytes, bytearray)) or hasattr(body, "read"):
+            body = f"<{len(body)} bytes>"
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except Exception as e:
+            self.recorder.record_http(method, url, body, started, time.perf_counter() - start, error=e)
+            raise
+        self.recorder.record_http(method, url, body, started, time.perf_counter() - start,
+                                  status_code=response.status_code, response_body=response.text)
+        return response
+
+    def post(self, url: str, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: str, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def get(self, url: str, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+
+# --- Replay ---
+
+class _ReplayPart:
+    def __init__(self, text):
+        self.text = text
+
+
+class _ReplayContent:
+    def __init__(self, text):
+        self.parts = [_ReplayPart(text)]
+
+
+class _ReplayCandidate:
+    def __init__(self, text):
+        self.content = _ReplayContent(text)
+
+
+class _ReplayUsage:
+    def __init__(self, usage: Optional[dict]):
+        usage = usage or {}
+        self.prompt_token_count = usage.get("prompt_tokens", 0)
+        self.candidates_token_count = usage.get("output_tokens", 0)
+        self.cached_content_token_count = usage.get("cached_tokens", 0)
+        self.total_token_count = self.prompt_token_count + self.candidates_token_count
+
+
+class ReplayResponse:
+    """Minimal stand-in for a GenerateContentResponse built from a log entry."""
+    def __init__(self, text: str, usage: Optional[dict] = None):
+        self.candidates = [_ReplayCandidate(text)] if text else []
+        self.text = text
+        self.usage_metadata = _ReplayUsage(usage)
+
+
+class ReplayHTTPResponse:
+    """Minimal stand-in for requests.Response built from a log entry."""
+    def __init__(self, status_code: int, body: Optional[str]):
+        self.status_code = status_code
+        self.text = body or ""
+        self.content = self.text.encode("utf-8")
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class ReplayError(RuntimeError):
+    """Raised when a replayed call has no matching entry in the log, or replays a recorded failure."""
+
+
+class TrafficReplay:
+    """
+    Serves recorded model responses and HTTP exchanges from a traffic log.
+
+    Model calls are matched on (model, request contents); repeated identical
+    requests are served in recorded order. Without strict, a request whose
+    contents diverged from the recording is served the next response recorded
+    for the same model and pipeline stage; responses are never served across
+    stages, since another stage's answer has the wrong shape. Each call sleeps for its recorded
+    duration multiplied by time_scale (0 disables waiting), so the pipeline
+    sees production-shaped latency without touching the network.
+    """
+    def __init__(self, path: str, time_scale: float = 1.0, strict: bool = False):
+        self.time_scale = time_scale
+        self.strict = strict
+        self._model_entries: dict[str, deque] = defaultdict(deque)
+        self._model_fallback: dict[tuple[str, Optional[str]], deque] = defaultdict(deque)  # (model, stage)
+        self._http_entries: dict[tuple[str, str], deque] = defaultdict(deque)
+        self.requests: list[dict] = []
+        self._lock = threading.Lock()
+        for entry in self.read(path):
+            if entry["kind"] == "model":
+                self._model_entries[entry["key"]].append(entry)
+                self._model_fallback[(entry["model"], entry.get("stage"))].append(entry)
+            elif entry["kind"] == "http":
+                self._http_entries[(entry["method"], entry["url"])].append(entry)
+            elif entry["kind"] == "request":
+                self.requests.append(entry)
+
+    @staticmethod
+    def read(path: str) -> Iterator[dict]:
+        """Yields the entries of a traffic log."""
+        with _open(path, "r") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def _wait(self, entry: dict) -> None:
+        if self.time_scale > 0:
+            time.sleep(entry.get("duration", 0.0) * self.time_scale)
+
+    def _next_model_entry(self, model_name: str, contents: Any, stage: Optional[str] = None) -> dict:
+        with self._lock:
+            queue = self._model_entries.get(prompt_fingerprint(model_name, contents))
+            if queue:
+                entry = queue.popleft()
+                queue.append(entry)  # keep it available for further identical requests
+                return entry
+            if self.strict:
+                raise ReplayError(f"No recorded response for model '{model_name}' and this request.")
+            if not self._model_fallback.get((model_name, stage)):
+                raise ReplayError(f"No recorded response for model '{model_name}' and this request, "
+                                  f"and none recorded for stage '{stage}' to fall back to.")
+            # Inputs diverged from the recording (e.g. a changed prompt); serve the next response for the model and stage
+            queue = self._model_fallback[(model_name, stage)]
+            entry = queue.popleft()
+            queue.append(entry)
+            return entry
+
+    def generate(self, model_name: str, contents: Any, stage: Optional[str] = None) -> ReplayResponse:
+        entry = self._next_model_entry(model_name, contents, stage)
+        self._wait(entry)
+        if "error" in entry:
+            raise ReplayError(entry["error"])
+        return ReplayResponse(entry.get("text", ""), entry.get("usage"))
+
+    def model(self, model_name: str, stage: Optional[str] = None) -> "ReplayModel":
+        return ReplayModel(self, model_name, stage)
+
+    def http_session(self) -> "ReplaySession":
+        return ReplaySession(self)
+
+    def next_http(self, method: str, url: str) -> ReplayHTTPResponse:
+        with self._lock:
+            queue = self._http_entries.get((method, url))
+            if not queue:
+                raise ReplayError(f"No recorded HTTP exchange for {method} {url}.")
+            entry = queue.popleft()
+            queue.append(entry)
+        self._wait(entry)
+        if "error" in entry:
+            raise ReplayError(entry["error"])
+        return ReplayHTTPResponse(entry["status"], entry.get("body"))
+
+    def replay_requests(self, generator, max_workers: int = 8) -> list[dict]:
+        """
+        Re-issues the recorded top-level requests against a generator, keeping
+        their original (scaled) arrival times and running them concurrently.
+
+        Returns:
+            The generator results, in recorded order.
+        """
+        start = time.monotonic()
+
+        def issue(entry):
+            delay = entry["t"] * self.time_scale - (time.monotonic() - start)
+            if delay > 0:
+                time.sleep(delay)
+            return generator.generate_linkedin_post(**entry["params"])
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(issue, self.requests))
+
+
+class ReplayModel:
+    """Stand-in for genai.GenerativeModel that answers from a TrafficReplay."""
+    def __init__(self, replay: TrafficReplay, model_name: str, stage: Optional[str] = None):
+        self.replay = replay
+        self.model_name = model_name
+        self.stage = stage
+
+    def generate_content(self, contents, **kwargs):
+        return self.replay.generate(self.model_name, contents, self.stage)
+
+
+class ReplaySession:
+    """Stand-in for requests that answers from a TrafficReplay."""
+    def __init__(self, replay: TrafficReplay):
+        self.replay = replay
+
+    def request(self, method: str, url: str, **kwargs):
+        return self.replay.next_http(method, url)
+
+    def post(self, url: str, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: str, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def get(self, url: str, **kwargs):
+        return self.request("GET", url, **kwargs)
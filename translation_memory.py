@@ -0,0 +1,228 @@
+# translation_memory.py
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    language TEXT NOT NULL,
+    source_key TEXT NOT NULL,
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    gram_count INTEGER NOT NULL,
+    uses INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    UNIQUE (language, source_key)
+);
+CREATE TABLE IF NOT EXISTS segment_grams (
+    language TEXT NOT NULL,
+    gram TEXT NOT NULL,
+    segment_id INTEGER NOT NULL REFERENCES segments(id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS segment_grams_lookup ON segment_grams(language, gram);
+"""
+
+# A segment ends at ., ! or ? followed by whitespace; line breaks always separate segments
+_SEGMENT = re.compile(r"(.+?(?:[.!?][\"')\]]*(?=\s)|$))(\s*)", re.S)
+# Lines made only of hashtags, mentions, URLs and symbols are kept as they are
+_UNTRANSLATABLE = re.compile(r"^(?:[#@]\w[\w-]*|https?://\S+|[^\w\s]+|\s)+$")
+# Fuzzy candidates fetched from the n-gram index before exact scoring
+MAX_CANDIDATES = 5
+# Punctuation that can change a sentence's meaning or mood ("You agree." vs "You agree?")
+_PUNCTUATION = re.compile(r"[.,;:!?¡¿…'\"()\[\]%&/-]")
+
+
+def split_segments(text: str) -> list[tuple[str, str]]:
+    """
+    Splits text into sentence segments, keeping the whitespace after each one
+    so the text can be rebuilt exactly.
+
+    Returns:
+        A list of (segment, trailing whitespace) tuples.
+    """
+    segments = []
+    for line in re.split(r"(\n+)", text):
+        if not line:
+            continue
+        if line.startswith("\n"):
+            if segments:
+                segments[-1] = (segments[-1][0], segments[-1][1] + line)
+            else:
+                segments.append(("", line))
+            continue
+        segments.extend((match.group(1), match.group(2)) for match in _SEGMENT.finditer(line) if match.group(1))
+    return segments
+
+
+def is_translatable(segment: str) -> bool:
+    return bool(segment.strip()) and not _UNTRANSLATABLE.match(segment)
+
+
+def normalize(segment: str) -> str:
+    return " ".join(segment.lower().split())
+
+
+def words(segment: str) -> list[str]:
+    """The segment's words, ignoring case, punctuation and emojis."""
+    return re.findall(r"\w+", segment.lower())
+
+
+def punctuation(segment: str) -> list[str]:
+    """The segment's punctuation marks, in order."""
+    return _PUNCTUATION.findall(segment)
+
+
+def char_grams(segment: str, n: int = 3) -> set[str]:
+    """Character n-grams of the normalized segment, padded at the ends."""
+    padded = f" {normalize(segment)} "
+    return {padded[i:i + n] for i in range(max(len(padded) - n + 1, 1))}
+
+
+class TranslationMemory:
+    """
+    Persistent sentence-level translation memory, one store per target language.
+
+    Segments are looked up exactly (by normalized text) and then fuzzily:
+    character trigrams are kept in an indexed table, so a lookup only reads
+    the segments sharing grams with the query, and candidates are scored by
+    the Dice coefficient of their trigram sets.
+
+    A fuzzy match is reused as it is only when its words and punctuation
+    are the same (it differs in casing, spacing or emojis); any other change
+    could alter the meaning ("10%" vs "20%", "You agree." vs "You agree?"), so matches above
+    hint_threshold are instead offered to the model as reference translations.
+
+    Args:
+        path: SQLite database file (":memory:" for a temporary store).
+        hint_threshold: Minimum similarity (0-1) to pass a stored translation as a hint.
+    """
+    def __init__(self, path: str = "translation_memory.db", hint_threshold: float = 0.6):
+        self.path = path
+        self.hint_threshold = hint_threshold
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(SCHEMA)
+
+    @staticmethod
+    def _key(segment: str) -> str:
+        return hashlib.sha256(normalize(segment).encode("utf-8")).hexdigest()
+
+    def _language(self, language: str) -> str:
+        return language.strip().lower()
+
+    def lookup(self, segment: str, language: str) -> Optional[dict]:
+        """
+        Finds the best stored translation of a segment.
+
+        Returns:
+            None, or a dict with "target", "source", "score" (1.0 for exact matches)
+            and "reusable" (whether the translation can be used without the model).
+        """
+        language = self._language(language)
+        with self._lock:
+            row = self._conn.execute("SELECT id, source, target FROM segments WHERE language = ? AND source_key = ?",
+                                     (language, self._key(segment))).fetchone()
+            if row is not None:
+                return {"id": row["id"], "source": row["source"], "target": row["target"], "score": 1.0,
+                        "reusable": True}
+            grams = char_grams(segment)
+            placeholders = ",".join("?" * len(grams))
+            rows = self._conn.execute(
+                "SELECT s.id, s.source, s.target, s.gram_count, count(*) AS shared FROM segment_grams g"
+                " JOIN segments s ON s.id = g.segment_id"
+                f" WHERE g.language = ? AND g.gram IN ({placeholders})"
+                " GROUP BY g.segment_id ORDER BY shared DESC LIMIT ?",
+                [language, *grams, MAX_CANDIDATES]).fetchall()
+        best = None
+        for row in rows:
+            score = 2 * row["shared"] / (len(grams) + row["gram_count"])
+            if best is None or score > best["score"]:
+                best = {"id": row["id"], "source": row["source"], "target": row["target"], "score": round(score, 4)}
+        if best is None or best["score"] < self.hint_threshold:
+            return None
+        best["reusable"] = (words(best["source"]) == words(segment)
+                            and punctuation(best["source"]) == punctuation(segment))
+        return best
+
+    def add(self, source: str, target: str, language: str) -> None:
+        """Stores (or replaces) the translation of one segment."""
+        language = self._language(language)
+        grams = char_grams(source)
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO segments (language, source_key, source, target, gram_count, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (language, source_key) DO UPDATE SET target = excluded.target,"
+                " updated_at = excluded.updated_at RETURNING id",
+                (language, self._key(source), source.strip(), target.strip(), len(grams), time.time()))
+            segment_id = cursor.fetchone()[0]
+            self._conn.execute("DELETE FROM segment_grams WHERE segment_id = ?", (segment_id,))
+            self._conn.executemany("INSERT INTO segment_grams (language, gram, segment_id) VALUES (?, ?, ?)",
+                                   [(language, gram, segment_id) for gram in grams])
+
+    def seed(self, pairs: dict[str, str], language: str) -> None:
+        """
+        Adds known translations, e.g. of company taglines or common CTAs.
+
+        Posts are looked up sentence by sentence, so a multi-sentence pair is
+        stored per sentence when source and target split into the same number
+        of segments (and as a whole otherwise).
+        """
+        for source, target in pairs.items():
+            source_segments = [segment for segment, _ in split_segments(source) if is_translatable(segment)]
+            target_segments = [segment for segment, _ in split_segments(target) if is_translatable(segment)]
+            if len(source_segments) > 1 and len(source_segments) == len(target_segments):
+                for source_segment, target_segment in zip(source_segments, target_segments):
+                    self.add(source_segment, target_segment, language)
+            else:
+                self.add(source, target, language)
+
+    def mark_used(self, segment_ids: list[int]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany("UPDATE segments SET uses = uses + 1 WHERE id = ?", [(i,) for i in segment_ids])
+
+    def record(self, exact: int = 0, fuzzy: int = 0, translated: int = 0) -> None:
+        """Counts how segments of translated posts were served."""
+        with self._lock:
+            self._counts.update(exact=exact, fuzzy=fuzzy, translated=translated)
+
+    def count(self, language: Optional[str] = None) -> int:
+        with self._lock:
+            if language is None:
+                return self._conn.execute("SELECT count(*) FROM segments").fetchone()[0]
+            return self._conn.execute("SELECT count(*) FROM segments WHERE language = ?",
+                                      (self._language(language),)).fetchone()[0]
+
+    def stats(self) -> dict:
+        """Returns stored segments and how translated segments were served (exact, fuzzy or by the model)."""
+        with self._lock:
+            served = sum(self._counts.values())
+            reused = self._counts["exact"] + self._counts["fuzzy"]
+            stats = dict(self._counts, reuse_rate=round(reused / served, 3) if served else 0.0)
+        stats["segments"] = self.count()
+        return stats
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# Example usage (for testing)
+if __name__ == '__main__':
+    memory = TranslationMemory(":memory:")
+    memory.seed({"What do you think? Share your thoughts below.": "¿Qué opinas? Comparte tu opinión abajo."}, "Spanish")
+    post = "We launched a tool. It helps!\n\nWhat do you think? Share your thoughts below."
+    print(f"Segments: {split_segments(post)}")
+    print(f"Exact: {memory.lookup('What do you think?  Share your thoughts below.', 'spanish')}")
+    print(f"Fuzzy: {memory.lookup('What do you think? Share your thoughts below!', 'Spanish')}")